@@ -0,0 +1,258 @@
+# ---------------------------------------------------------------------------
+# app/admission.py
+# Controle de admissão das execuções de crews: limite de execuções simultâneas
+# ajustado por AIMD a partir da latência observada, com uma fila de espera
+# curta e limitada, dividida de forma justa entre tenants (app/fair_scheduler.py).
+# Acima disso a requisição é recusada de imediato (503, ou 429 para excessos de
+# um único tenant).
+# ---------------------------------------------------------------------------
+import asyncio
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Optional
+
+from app.fair_scheduler import FairShareQueue
+from app.settings import api_settings
+from crew.metrics import metrics_registry
+from crew.rate_limit import RateLimitExceeded
+
+logger_admission = logging.getLogger(__name__)
+
+admission_rejected_total = metrics_registry.counter(
+    "crew_admission_rejected_total",
+    "Requisições recusadas pelo controle de admissão, por motivo (queue_full, queue_timeout, tenant_queue_full, tenant_rate_limited).",
+    ("reason",),
+)
+admission_wait_seconds = metrics_registry.histogram(
+    "crew_admission_wait_seconds", "Espera na fila do controle de admissão antes de executar."
+)
+
+
+class AdmissionRejectedError(Exception):
+    """
+    Sem vaga a tempo: limite global atingido com a fila cheia ou expirada (HTTP 503),
+    ou o tenant passou do seu limite de taxa ou de requisições na fila (HTTP 429).
+    """
+
+    def __init__(self, reason: str, retry_after_seconds: int):
+        if reason.startswith("tenant_"):
+            message = "Limite de requisições deste usuário atingido, tente novamente mais tarde."
+        else:
+            message = "Servidor no limite de execuções simultâneas de crews, tente novamente mais tarde."
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after_seconds = retry_after_seconds
+
+    @property
+    def status_code(self) -> int:
+        return 429 if self.reason.startswith("tenant_") else 503
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limite de concorrência AIMD. A latência de cada execução concluída é comparada
+    com uma linha de base (média móvel exponencial lenta das latências):
+
+    - acima de latency_tolerance vezes a linha de base, o limite é multiplicado por
+      backoff_ratio (redução multiplicativa: o provedor está saturando);
+    - abaixo, e com o limite em uso (em andamento >= metade do limite), o limite
+      sobe 1/limite (aumento aditivo de ~1 a cada "rodada" de execuções).
+
+    A linha de base acompanha mudanças duradouras de latência (ex.: outro modelo),
+    então o limite volta a subir depois que a nova latência se estabiliza. Execuções
+    com erro ou canceladas não alimentam o ajuste.
+
+    As vagas que liberam são distribuídas pela FairShareQueue entre os tenants
+    que aguardam, respeitando os limites de cada tenant.
+
+    Execuções em segundo plano (background=True: itens de batch e jobs, que já são
+    limitados pela concorrência do batch e pelos workers de jobs) esperam a vaga e a
+    ficha do limite de taxa sem prazo e sem ocupar a fila das requisições síncronas,
+    então não são recusadas nem fazem as síncronas receberem 503/429.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        latency_tolerance: float = 2.0,
+        backoff_ratio: float = 0.9,
+        baseline_alpha: float = 0.05,
+        queue_size: int = 0,
+        queue_timeout_seconds: float = 0.0,
+        tenant_queue: Optional[FairShareQueue] = None,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.baseline_alpha = baseline_alpha
+        self.queue_size = queue_size
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self._clock = clock
+        self.baseline_latency: Optional[float] = None
+        self.in_flight = 0
+        self.tenants = tenant_queue if tenant_queue is not None else FairShareQueue(clock=clock)
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.tenants)
+
+    def on_sample(self, latency_seconds: float, in_flight: int) -> None:
+        """Ajusta o limite com a latência de uma execução concluída (in_flight: em andamento quando ela começou)."""
+        if self.baseline_latency is None:
+            self.baseline_latency = latency_seconds
+        previous_limit = self.limit
+        if latency_seconds > self.baseline_latency * self.latency_tolerance:
+            self._limit = max(self.min_limit, self._limit * self.backoff_ratio)
+        elif in_flight * 2 >= self._limit:
+            self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+        self.baseline_latency += self.baseline_alpha * (latency_seconds - self.baseline_latency)
+        if self.limit != previous_limit:
+            logger_admission.info(
+                "Limite de concorrência de crews: %d -> %d (latência %.2fs, linha de base %.2fs).",
+                previous_limit, self.limit, latency_seconds, self.baseline_latency,
+                extra={"limit": self.limit, "latency_seconds": round(latency_seconds, 3)},
+            )
+        self._wake_waiters()
+
+    def _retry_after_seconds(self) -> int:
+        return max(1, math.ceil(self.baseline_latency or 1.0))
+
+    def _reject(self, reason: str, retry_after_seconds: Optional[int] = None) -> AdmissionRejectedError:
+        admission_rejected_total.inc(reason=reason)
+        return AdmissionRejectedError(reason, retry_after_seconds or self._retry_after_seconds())
+
+    def _release(self, tenant: str) -> None:
+        self.in_flight -= 1
+        self.tenants.finished(tenant)
+
+    def _wake_waiters(self) -> None:
+        # Passa as vagas livres para a fila, na ordem da FairShareQueue (a vaga é ocupada aqui).
+        while self.in_flight < self.limit:
+            waiter = self.tenants.pop_next()
+            if waiter is None:
+                break
+            self.in_flight += 1
+            if waiter.future.done():
+                self._release(waiter.tenant)
+                continue
+            waiter.future.set_result(None)
+
+    async def _take_rate_token(self, tenant: str, background: bool) -> None:
+        while True:
+            try:
+                self.tenants.take_rate_token(tenant)
+                return
+            except RateLimitExceeded as e:
+                if not background:
+                    raise self._reject("tenant_rate_limited", max(1, math.ceil(e.wait_seconds))) from None
+                await asyncio.sleep(e.wait_seconds)
+
+    async def _acquire(self, tenant: str, background: bool) -> None:
+        await self._take_rate_token(tenant, background)
+        # Sem vaga global, ou com o tenant no seu limite, a requisição entra na fila.
+        if self.in_flight < self.limit and self.tenants.can_start(tenant):
+            self.in_flight += 1
+            self.tenants.started(tenant)
+            return
+        if not background:
+            if not self.tenants.can_enqueue(tenant):
+                raise self._reject("tenant_queue_full")
+            if self.tenants.foreground_queued >= self.queue_size:
+                raise self._reject("queue_full")
+
+        waiter = self.tenants.push(tenant, asyncio.get_running_loop().create_future(), background=background)
+        wait_started_at = self._clock()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=None if background else self.queue_timeout_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # A vaga chegou junto com o timeout/cancelamento: devolve para o próximo da fila.
+                self._release(tenant)
+                self._wake_waiters()
+            else:
+                waiter.future.cancel()
+                self.tenants.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject("queue_timeout") from None
+            raise
+        finally:
+            admission_wait_seconds.observe(self._clock() - wait_started_at)
+
+    @asynccontextmanager
+    async def admit(self, tenant: str = "", background: bool = False) -> AsyncIterator[None]:
+        """
+        Ocupa uma vaga durante o bloco; lança AdmissionRejectedError se não houver vaga a
+        tempo (com background=True, espera até haver vaga).
+        """
+        await self._acquire(tenant, background)
+        in_flight_at_start = self.in_flight
+        started_at = self._clock()
+        succeeded = False
+        try:
+            yield
+            succeeded = True
+        finally:
+            self._release(tenant)
+            if succeeded:
+                self.on_sample(self._clock() - started_at, in_flight_at_start)
+            else:
+                self._wake_waiters()
+
+
+def create_admission_limiter() -> AdaptiveConcurrencyLimiter:
+    return AdaptiveConcurrencyLimiter(
+        initial_limit=api_settings.admission_initial_limit,
+        min_limit=api_settings.admission_min_limit,
+        max_limit=api_settings.admission_max_limit,
+        latency_tolerance=api_settings.admission_latency_tolerance,
+        backoff_ratio=api_settings.admission_backoff_ratio,
+        queue_size=api_settings.admission_queue_size,
+        queue_timeout_seconds=api_settings.admission_queue_timeout_seconds,
+        tenant_queue=FairShareQueue(
+            weights=api_settings.tenant_weights,
+            max_concurrency_per_tenant=api_settings.tenant_max_concurrency,
+            max_queued_per_tenant=api_settings.tenant_max_queued,
+            rate_per_second=api_settings.tenant_rate_limit_per_second,
+            rate_burst=api_settings.tenant_rate_limit_burst,
+        ),
+    )
+
+
+# Limitador das execuções de crews (síncronas, streaming, batch e jobs; um por worker).
+admission_limiter = create_admission_limiter()
+
+metrics_registry.callback(
+    "crew_admission_limit", "Limite atual de execuções simultâneas de crews.", "gauge", (),
+    lambda: [((), admission_limiter.limit)],
+)
+metrics_registry.callback(
+    "crew_admission_in_flight", "Execuções admitidas em andamento.", "gauge", (),
+    lambda: [((), admission_limiter.in_flight)],
+)
+metrics_registry.callback(
+    "crew_admission_queue_depth", "Requisições aguardando vaga no controle de admissão.", "gauge", (),
+    lambda: [((), admission_limiter.queue_depth)],
+)
+metrics_registry.callback(
+    "crew_tenant_in_flight", "Execuções em andamento por tenant (user_id de tenant_weights, demais em 'other'), só tenants ativos.", "gauge", ("tenant",),
+    lambda: admission_limiter.tenants.samples("in_flight"),
+)
+metrics_registry.callback(
+    "crew_tenant_queue_depth", "Requisições na fila por tenant (user_id de tenant_weights, demais em 'other'), só tenants ativos.", "gauge", ("tenant",),
+    lambda: admission_limiter.tenants.samples("queued"),
+)
+metrics_registry.callback(
+    "crew_tenant_oldest_wait_seconds", "Espera da requisição mais antiga na fila de cada tenant (user_id de tenant_weights, demais em 'other').", "gauge", ("tenant",),
+    lambda: admission_limiter.tenants.samples("oldest_wait_seconds"),
+)
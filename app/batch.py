@@ -0,0 +1,74 @@
+# ---------------------------------------------------------------------------
+# app/batch.py
+# Execução de lotes de mensagens de crew com concorrência limitada: itens da
+# mesma sessão rodam em sequência e os resultados saem em ordem de conclusão.
+# ---------------------------------------------------------------------------
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Sequence, TypeVar
+
+from crew.metrics import metrics_registry
+
+T = TypeVar("T")
+
+batch_items_total = metrics_registry.counter(
+    "crew_batch_items_total", "Itens processados pelo endpoint de batch, por resultado.", ("outcome",)
+)
+batch_items_in_flight = metrics_registry.gauge(
+    "crew_batch_items_in_flight", "Itens de batch em execução."
+)
+
+
+@dataclass
+class BatchItemOutcome(Generic[T]):
+    index: int
+    item: T
+    result: Any = None
+    error: Optional[BaseException] = None
+
+
+async def iter_batch_results(
+    items: Sequence[T],
+    group_key: Callable[[T], Hashable],
+    run_item: Callable[[T], Awaitable[Any]],
+    concurrency: int,
+) -> AsyncIterator[BatchItemOutcome[T]]:
+    """
+    Executa os itens com no máximo `concurrency` em paralelo e produz cada
+    resultado assim que fica pronto.
+
+    Itens com a mesma chave de grupo (a session_id) formam uma fila e rodam na
+    ordem enviada, por um único worker: o histórico da sessão fica na ordem
+    esperada e os itens não disputam o lock da sessão. Falhas de um item viram
+    BatchItemOutcome.error e não interrompem os demais. Fechar o gerador (ex.:
+    cliente desconectou) cancela os itens em andamento.
+    """
+    groups: Dict[Hashable, List[int]] = {}
+    for index, item in enumerate(items):
+        groups.setdefault(group_key(item), []).append(index)
+    pending_groups = deque(groups.values())
+    outcomes: "asyncio.Queue[BatchItemOutcome[T]]" = asyncio.Queue()
+
+    async def worker() -> None:
+        while pending_groups:
+            for index in pending_groups.popleft():
+                outcome = BatchItemOutcome(index=index, item=items[index])
+                batch_items_in_flight.inc()
+                try:
+                    outcome.result = await run_item(items[index])
+                except Exception as e:
+                    outcome.error = e
+                finally:
+                    batch_items_in_flight.dec()
+                batch_items_total.inc(outcome="error" if outcome.error is not None else "success")
+                outcomes.put_nowait(outcome)
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(groups)))]
+    try:
+        for _ in range(len(items)):
+            yield await outcomes.get()
+    finally:
+        for worker_task in workers:
+            worker_task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,113 @@
+# ---------------------------------------------------------------------------
+# app/cancellation.py
+# Encerra execuções de crew cujo resultado ninguém vai receber: cliente que
+# desconectou antes da resposta ou prazo total da requisição expirado.
+# ---------------------------------------------------------------------------
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from starlette.requests import Request
+
+from crew.metrics import metrics_registry
+
+T = TypeVar("T")
+
+logger_cancellation = logging.getLogger(__name__)
+
+crew_requests_cancelled_total = metrics_registry.counter(
+    "crew_requests_cancelled_total",
+    "Requisições de crew encerradas antes do fim, por motivo (client_disconnected, deadline_exceeded).",
+    ("reason",),
+)
+crew_requests_cancelled_after_seconds = metrics_registry.histogram(
+    "crew_requests_cancelled_after_seconds", "Tempo de execução já decorrido quando a requisição foi encerrada.", ("reason",)
+)
+
+
+class RequestDeadlineExceeded(Exception):
+    """O prazo total da requisição expirou antes do fim da execução (HTTP 504)."""
+
+
+class ClientDisconnected(Exception):
+    """O cliente desconectou antes da resposta (HTTP 499, que ele não chega a ver)."""
+
+
+def parse_request_deadline(header_value: Optional[str], default_seconds: float) -> Optional[float]:
+    """
+    Prazo efetivo em segundos a partir do header X-Request-Deadline (relativo ao
+    recebimento) e do padrão da configuração (0 = sem prazo). Com os dois, vale o
+    menor. Lança ValueError (HTTP 400) para valores que não são um número positivo.
+    """
+    deadlines = [default_seconds] if default_seconds > 0 else []
+    if header_value is not None:
+        try:
+            header_seconds = float(header_value)
+        except ValueError:
+            raise ValueError(f"X-Request-Deadline inválido: '{header_value}' (esperado um número de segundos).") from None
+        if not header_seconds > 0 or header_seconds == float("inf"):
+            raise ValueError(f"X-Request-Deadline deve ser um número positivo de segundos, recebido '{header_value}'.")
+        deadlines.append(header_seconds)
+    return min(deadlines) if deadlines else None
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    # O corpo já foi lido pelo FastAPI: a próxima mensagem do ASGI é o http.disconnect.
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+def _discard_result(task: "asyncio.Task[Any]") -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+async def run_until_disconnect_or_deadline(
+    request: Request,
+    work: Awaitable[T],
+    deadline_seconds: Optional[float],
+    keep_running: Callable[[], bool] = lambda: False,
+) -> T:
+    """
+    Aguarda `work` enquanto o cliente estiver conectado e dentro do prazo.
+
+    Se o cliente desconectar ou o prazo expirar, a execução é cancelada (o que
+    cancela as chamadas pendentes à Zep e o kickoff do crew, ver
+    crew/run_cancellation.py) e ClientDisconnected ou RequestDeadlineExceeded é
+    lançada. Quando keep_running() é True (ex.: outras requisições aguardam o mesmo
+    resultado via idempotência), a execução continua em segundo plano.
+    """
+    work_task = asyncio.ensure_future(work)
+    disconnect_task = asyncio.create_task(_wait_for_disconnect(request))
+    started_at = time.perf_counter()
+    detached = False
+    try:
+        done, _ = await asyncio.wait(
+            {work_task, disconnect_task}, timeout=deadline_seconds, return_when=asyncio.FIRST_COMPLETED
+        )
+        if work_task in done:
+            return work_task.result()
+
+        reason = "client_disconnected" if disconnect_task in done else "deadline_exceeded"
+        elapsed = time.perf_counter() - started_at
+        if keep_running():
+            detached = True
+            work_task.add_done_callback(_discard_result)
+            logger_cancellation.info("Requisição encerrada (%s); a execução continua para outras requisições aguardando.", reason)
+        else:
+            crew_requests_cancelled_total.inc(reason=reason)
+            crew_requests_cancelled_after_seconds.observe(elapsed, reason=reason)
+            logger_cancellation.info("Requisição encerrada (%s) após %.1fs; execução cancelada.", reason, elapsed, extra={"reason": reason})
+        if reason == "client_disconnected":
+            raise ClientDisconnected("O cliente desconectou antes da resposta.")
+        raise RequestDeadlineExceeded(f"Prazo da requisição ({deadline_seconds:g}s) expirado antes do fim da execução.")
+    finally:
+        disconnect_task.cancel()
+        if not detached and not work_task.done():
+            work_task.cancel()
+            # Aguarda o cancelamento se propagar (locks liberados, kickoff sinalizado) sem repassar o resultado.
+            await asyncio.wait({work_task})
+            _discard_result(work_task)
@@ -0,0 +1,197 @@
+# ---------------------------------------------------------------------------
+# app/fair_scheduler.py
+# Fila de espera do controle de admissão com divisão justa entre tenants
+# (user_id): enfileiramento justo ponderado, limite de execuções simultâneas
+# e de requisições na fila por tenant e limite de taxa por tenant.
+# ---------------------------------------------------------------------------
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Mapping, Optional, Tuple
+
+from crew.rate_limit import TokenBucket
+
+
+@dataclass
+class TenantWaiter:
+    tenant: str
+    future: "asyncio.Future[None]"
+    start_tag: float
+    enqueued_at: float
+    background: bool = False
+
+
+@dataclass
+class _TenantState:
+    in_flight: int = 0
+    finish_tag: float = 0.0
+    waiters: Deque[TenantWaiter] = field(default_factory=deque)
+    background_waiters: int = 0
+
+
+class FairShareQueue:
+    """
+    Enfileiramento justo por tenant (start-time fair queuing): cada requisição
+    recebe a etiqueta S = max(V, F do tenant) e avança F do tenant em 1/peso; a
+    próxima vaga vai para a menor etiqueta entre os tenants abaixo do limite de
+    concorrência, e V passa a ser a etiqueta atendida. Um tenant que manda
+    centenas de mensagens só fica à frente dos demais na proporção do seu peso,
+    e tenants ociosos não acumulam crédito.
+
+    Requisições em segundo plano (itens de batch e jobs) disputam as vagas pela
+    mesma ordem, mas não contam nos limites de fila (tenant_max_queued e o
+    tamanho da fila do limitador), que valem só para as requisições síncronas.
+
+    Não é seguro entre threads: usado só no event loop, pelo AdaptiveConcurrencyLimiter.
+    """
+
+    def __init__(
+        self,
+        weights: Optional[Mapping[str, float]] = None,
+        max_concurrency_per_tenant: int = 0,
+        max_queued_per_tenant: int = 0,
+        rate_per_second: float = 0.0,
+        rate_burst: int = 1,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self.weights = dict(weights or {})
+        self.max_concurrency_per_tenant = max_concurrency_per_tenant
+        self.max_queued_per_tenant = max_queued_per_tenant
+        self.rate_per_second = rate_per_second
+        self.rate_burst = rate_burst
+        self._clock = clock
+        self._virtual_time = 0.0
+        self._tenants: Dict[str, _TenantState] = {}
+        self._buckets: Dict[str, Tuple[TokenBucket, float]] = {}
+        self._buckets_swept_at = clock()
+        self._queued = 0
+        self._background_queued = 0
+
+    def __len__(self) -> int:
+        return self._queued
+
+    @property
+    def foreground_queued(self) -> int:
+        """Requisições síncronas na fila (as em segundo plano não contam no limite da fila)."""
+        return self._queued - self._background_queued
+
+    def _state(self, tenant: str) -> _TenantState:
+        state = self._tenants.get(tenant)
+        if state is None:
+            state = self._tenants[tenant] = _TenantState()
+        return state
+
+    def _charge(self, state: _TenantState, tenant: str) -> float:
+        start_tag = max(self._virtual_time, state.finish_tag)
+        state.finish_tag = start_tag + 1.0 / max(self.weights.get(tenant, 1.0), 1e-6)
+        return start_tag
+
+    def _forget_if_idle(self, tenant: str) -> None:
+        state = self._tenants.get(tenant)
+        if state is not None and state.in_flight == 0 and not state.waiters:
+            del self._tenants[tenant]
+
+    def take_rate_token(self, tenant: str) -> None:
+        """Consome uma ficha do token bucket do tenant; lança RateLimitExceeded se não houver."""
+        if self.rate_per_second <= 0:
+            return
+        now = self._clock()
+        # Buckets sem uso há mais de burst/rate segundos estão cheios: descartá-los equivale a recriá-los.
+        refill_seconds = self.rate_burst / self.rate_per_second
+        if now - self._buckets_swept_at > refill_seconds:
+            self._buckets = {key: entry for key, entry in self._buckets.items() if now - entry[1] <= refill_seconds}
+            self._buckets_swept_at = now
+        bucket = self._buckets[tenant][0] if tenant in self._buckets else TokenBucket(self.rate_per_second, self.rate_burst)
+        self._buckets[tenant] = (bucket, now)
+        bucket.acquire(max_wait_seconds=0.0)
+
+    def can_start(self, tenant: str) -> bool:
+        state = self._tenants.get(tenant)
+        return self.max_concurrency_per_tenant <= 0 or state is None or state.in_flight < self.max_concurrency_per_tenant
+
+    def can_enqueue(self, tenant: str) -> bool:
+        state = self._tenants.get(tenant)
+        return self.max_queued_per_tenant <= 0 or state is None or len(state.waiters) - state.background_waiters < self.max_queued_per_tenant
+
+    def started(self, tenant: str) -> None:
+        """Registra uma execução iniciada sem passar pela fila."""
+        state = self._state(tenant)
+        self._virtual_time = max(self._virtual_time, self._charge(state, tenant))
+        state.in_flight += 1
+
+    def finished(self, tenant: str) -> None:
+        state = self._tenants.get(tenant)
+        if state is not None:
+            state.in_flight -= 1
+            self._forget_if_idle(tenant)
+
+    def push(self, tenant: str, future: "asyncio.Future[None]", background: bool = False) -> TenantWaiter:
+        state = self._state(tenant)
+        waiter = TenantWaiter(tenant, future, self._charge(state, tenant), self._clock(), background)
+        state.waiters.append(waiter)
+        self._queued += 1
+        if background:
+            state.background_waiters += 1
+            self._background_queued += 1
+        return waiter
+
+    def _dequeued(self, state: _TenantState, waiter: TenantWaiter) -> None:
+        self._queued -= 1
+        if waiter.background:
+            state.background_waiters -= 1
+            self._background_queued -= 1
+
+    def remove(self, waiter: TenantWaiter) -> None:
+        state = self._tenants.get(waiter.tenant)
+        if state is None:
+            return
+        try:
+            state.waiters.remove(waiter)
+        except ValueError:
+            return
+        self._dequeued(state, waiter)
+        self._forget_if_idle(waiter.tenant)
+
+    def pop_next(self) -> Optional[TenantWaiter]:
+        """Retira (e marca como em execução) o próximo a ser atendido, ou None se nenhum tenant pode iniciar."""
+        chosen: Optional[Tuple[str, _TenantState]] = None
+        for tenant, state in self._tenants.items():
+            if state.waiters and self.can_start(tenant):
+                if chosen is None or state.waiters[0].start_tag < chosen[1].waiters[0].start_tag:
+                    chosen = (tenant, state)
+        if chosen is None:
+            return None
+        state = chosen[1]
+        waiter = state.waiters.popleft()
+        self._dequeued(state, waiter)
+        self._virtual_time = max(self._virtual_time, waiter.start_tag)
+        state.in_flight += 1
+        return waiter
+
+    def tenant_stats(self) -> Dict[str, Dict[str, float]]:
+        """Tenants com execuções ou requisições na fila: em andamento, na fila e espera do mais antigo (s)."""
+        now = self._clock()
+        return {
+            tenant: {
+                "in_flight": state.in_flight,
+                "queued": len(state.waiters),
+                "oldest_wait_seconds": (now - state.waiters[0].enqueued_at) if state.waiters else 0.0,
+            }
+            for tenant, state in list(self._tenants.items())
+        }
+
+    def samples(self, stat_name: str) -> List[Tuple[Tuple[str], float]]:
+        """
+        Amostras por label de tenant: só os tenants com peso configurado têm label
+        próprio (user_id é ilimitado); os demais são agregados em "other" (soma, ou o
+        máximo para oldest_wait_seconds).
+        """
+        aggregated: Dict[str, float] = {}
+        for tenant, stats in self.tenant_stats().items():
+            label = tenant if tenant in self.weights else "other"
+            if stat_name == "oldest_wait_seconds":
+                aggregated[label] = max(aggregated.get(label, 0.0), stats[stat_name])
+            else:
+                aggregated[label] = aggregated.get(label, 0.0) + stats[stat_name]
+        return [((label,), value) for label, value in aggregated.items()]
@@ -0,0 +1,219 @@
+# ---------------------------------------------------------------------------
+# app/idempotency.py
+# Chaves de idempotência para /v1/create_crew/: retentativas se juntam à
+# execução em andamento ou recebem o resultado já armazenado (memória ou SQLite).
+# ---------------------------------------------------------------------------
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.settings import api_settings
+from crew.ttl_cache import TTLCache
+
+logger_idempotency = logging.getLogger(__name__)
+
+
+@dataclass
+class IdempotencyRecord:
+    key: str
+    fingerprint: str
+    response: Dict[str, Any]
+    expires_at: float
+    created_at: float = field(default_factory=time.time)
+
+
+class IdempotencyKeyConflictError(Exception):
+    """A mesma Idempotency-Key foi reutilizada com um corpo de requisição diferente."""
+
+
+def request_fingerprint(payload: Dict[str, Any]) -> str:
+    """Hash estável do corpo da requisição (chaves ordenadas)."""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore(ABC):
+    """Interface de armazenamento das respostas já produzidas."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[IdempotencyRecord]:
+        ...
+
+    @abstractmethod
+    async def save(self, record: IdempotencyRecord) -> None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemoryIdempotencyStore(IdempotencyStore):
+    """Respostas em memória, limitadas por quantidade (LRU) e por TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._records: TTLCache[str, IdempotencyRecord] = TTLCache(max_size=max_entries, ttl_seconds=ttl_seconds)
+
+    async def get(self, key: str) -> Optional[IdempotencyRecord]:
+        return self._records.get(key)
+
+    async def save(self, record: IdempotencyRecord) -> None:
+        self._records.set(record.key, record, ttl_seconds=max(0.0, record.expires_at - time.time()))
+
+
+class SQLiteIdempotencyStore(IdempotencyStore):
+    """Respostas em um arquivo SQLite local, compartilhável entre workers e reinícios."""
+
+    def __init__(self, path: str, max_entries: int):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS idempotency ("
+                "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idempotency_created_at ON idempotency (created_at)")
+
+    def _get_sync(self, key: str) -> Optional[IdempotencyRecord]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT fingerprint, response, created_at, expires_at FROM idempotency WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        fingerprint, response, created_at, expires_at = row
+        return IdempotencyRecord(key=key, fingerprint=fingerprint, response=json.loads(response), expires_at=expires_at, created_at=created_at)
+
+    def _save_sync(self, record: IdempotencyRecord) -> None:
+        response = json.dumps(record.response, ensure_ascii=False, default=str)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO idempotency (key, fingerprint, response, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (record.key, record.fingerprint, response, record.created_at, record.expires_at),
+            )
+            self._connection.execute("DELETE FROM idempotency WHERE expires_at <= ?", (time.time(),))
+            self._connection.execute(
+                "DELETE FROM idempotency WHERE key IN "
+                "(SELECT key FROM idempotency ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self._max_entries,),
+            )
+
+    async def get(self, key: str) -> Optional[IdempotencyRecord]:
+        return await asyncio.to_thread(self._get_sync, key)
+
+    async def save(self, record: IdempotencyRecord) -> None:
+        await asyncio.to_thread(self._save_sync, record)
+
+    async def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class IdempotencyManager:
+    """
+    Deduplica execuções pela chave de idempotência:
+
+    - se já existe uma resposta armazenada para a chave, ela é devolvida (replay);
+    - se uma execução com a mesma chave está em andamento, a requisição aguarda
+      e recebe o mesmo resultado (ou a mesma exceção);
+    - caso contrário, executa e armazena a resposta por ttl_seconds.
+
+    Apenas respostas de sucesso são armazenadas; após um erro a retentativa executa de novo.
+    """
+
+    def __init__(self, store_factory: Callable[[], IdempotencyStore], ttl_seconds: float):
+        self._store_factory = store_factory
+        self.store: Optional[IdempotencyStore] = None
+        self._ttl_seconds = ttl_seconds
+        self._in_flight: Dict[str, Tuple[str, "asyncio.Future[Dict[str, Any]]"]] = {}
+        self._waiters: Dict[str, int] = {}
+
+    async def start(self) -> None:
+        self.store = self._store_factory()
+
+    async def stop(self) -> None:
+        if self.store is not None:
+            await self.store.close()
+            self.store = None
+
+    async def run(
+        self,
+        key: str,
+        fingerprint: str,
+        fn: Callable[[], Awaitable[Dict[str, Any]]],
+        ttl_seconds: Optional[float] = None,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Retorna (resposta, replayed). replayed é True quando a resposta não foi produzida por esta requisição."""
+        if self.store is None:
+            return await fn(), False
+
+        if key in self._in_flight:
+            return await self._attach(key, fingerprint), True
+
+        stored = await self.store.get(key)
+        if stored is not None:
+            if stored.fingerprint != fingerprint:
+                raise IdempotencyKeyConflictError("Esta Idempotency-Key já foi usada com um corpo de requisição diferente.")
+            logger_idempotency.info(f"Resposta armazenada devolvida para a chave '{key}'.")
+            return stored.response, True
+
+        # Reavaliado após o await do store: outra requisição pode ter começado nesse meio tempo.
+        if key in self._in_flight:
+            return await self._attach(key, fingerprint), True
+
+        future: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = (fingerprint, future)
+        try:
+            response = await fn()
+        except BaseException as e:
+            self._in_flight.pop(key, None)
+            if isinstance(e, asyncio.CancelledError):
+                future.set_exception(RuntimeError("A execução original desta chave de idempotência foi cancelada."))
+            else:
+                future.set_exception(e)
+            future.exception()  # Marca como consumida caso ninguém esteja aguardando.
+            raise
+
+        future.set_result(response)
+        ttl = self._ttl_seconds if ttl_seconds is None else min(ttl_seconds, self._ttl_seconds)
+        try:
+            await self.store.save(IdempotencyRecord(key=key, fingerprint=fingerprint, response=response, expires_at=time.time() + ttl))
+        except Exception as e_store:
+            logger_idempotency.error(f"Falha ao armazenar a resposta da chave de idempotência '{key}': {e_store}", exc_info=True)
+        finally:
+            # Só sai de "em andamento" depois de armazenada, para não abrir uma janela sem nenhum dos dois.
+            self._in_flight.pop(key, None)
+        return response, False
+
+    def has_waiters(self, key: str) -> bool:
+        """Indica se outras requisições aguardam a execução em andamento da chave."""
+        return self._waiters.get(key, 0) > 0
+
+    async def _attach(self, key: str, fingerprint: str) -> Dict[str, Any]:
+        in_flight_fingerprint, future = self._in_flight[key]
+        if in_flight_fingerprint != fingerprint:
+            raise IdempotencyKeyConflictError("Esta Idempotency-Key já está em uso por uma requisição com corpo diferente.")
+        logger_idempotency.info(f"Requisição com a chave '{key}' aguardando a execução em andamento.")
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+
+def create_idempotency_store() -> IdempotencyStore:
+    if api_settings.idempotency_store == "sqlite":
+        return SQLiteIdempotencyStore(api_settings.idempotency_store_sqlite_path, api_settings.idempotency_max_entries)
+    return InMemoryIdempotencyStore(api_settings.idempotency_max_entries, api_settings.idempotency_ttl_seconds)
@@ -0,0 +1,325 @@
+# ---------------------------------------------------------------------------
+# app/jobs.py
+# Execução assíncrona de crews: fila em processo, pool limitado de workers,
+# backpressure e armazenamento plugável dos jobs (memória ou SQLite).
+# ---------------------------------------------------------------------------
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Optional
+
+from app.settings import api_settings
+
+logger_jobs = logging.getLogger(__name__)
+
+JobStatus = Literal["queued", "running", "succeeded", "failed", "cancelled"]
+FINISHED_JOB_STATUSES = ("succeeded", "failed", "cancelled")
+
+JobRunner = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+@dataclass
+class JobRecord:
+    job_id: str
+    status: JobStatus
+    request: Dict[str, Any]
+    result: Optional[Any] = None
+    error: Optional[Dict[str, Any]] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # Processo (worker) que enfileirou e executa o job.
+    worker_pid: Optional[int] = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in FINISHED_JOB_STATUSES
+
+    def mark_interrupted(self) -> None:
+        """Finaliza como falha um job que o processo não vai mais executar (shutdown ou reinício)."""
+        self.status = "failed"
+        self.error = {"error_type": "interrupted", "error_message": "Job interrompido pelo encerramento do worker."}
+        self.finished_at = time.time()
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueueFullError(Exception):
+    """A fila de jobs atingiu a profundidade máxima configurada."""
+
+    def __init__(self, retry_after_seconds: int):
+        super().__init__("Fila de jobs cheia, tente novamente mais tarde.")
+        self.retry_after_seconds = retry_after_seconds
+
+
+class JobStore(ABC):
+    """Interface de armazenamento de jobs."""
+
+    @abstractmethod
+    async def save(self, job: JobRecord) -> None:
+        ...
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[JobRecord]:
+        ...
+
+    async def fail_interrupted_jobs(self) -> int:
+        """Marca como falha os jobs não finalizados de processos que já terminaram; retorna quantos."""
+        return 0
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemoryJobStore(JobStore):
+    """Tabela de jobs em memória; jobs finalizados expiram após o TTL."""
+
+    def __init__(self, ttl_seconds: float):
+        self._ttl_seconds = ttl_seconds
+        self._jobs: "OrderedDict[str, JobRecord]" = OrderedDict()
+
+    def _prune(self) -> None:
+        expire_before = time.time() - self._ttl_seconds
+        expired = [job_id for job_id, job in self._jobs.items() if job.is_finished and job.finished_at < expire_before]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def save(self, job: JobRecord) -> None:
+        self._jobs[job.job_id] = job
+        self._prune()
+
+    async def get(self, job_id: str) -> Optional[JobRecord]:
+        return self._jobs.get(job_id)
+
+
+class SQLiteJobStore(JobStore):
+    """Tabela de jobs em um arquivo SQLite local, sobrevivendo a reinícios do processo."""
+
+    def __init__(self, path: str, ttl_seconds: float):
+        self._ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, payload TEXT NOT NULL, finished_at REAL)"
+            )
+
+    def _save_sync(self, job: JobRecord) -> None:
+        payload = json.dumps(asdict(job), ensure_ascii=False, default=str)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, status, payload, finished_at) VALUES (?, ?, ?, ?)",
+                (job.job_id, job.status, payload, job.finished_at),
+            )
+            self._connection.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (time.time() - self._ttl_seconds,),
+            )
+
+    def _get_sync(self, job_id: str) -> Optional[JobRecord]:
+        with self._lock:
+            row = self._connection.execute("SELECT payload FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return JobRecord(**json.loads(row[0])) if row else None
+
+    def _fail_interrupted_jobs_sync(self) -> int:
+        with self._lock:
+            rows = self._connection.execute("SELECT payload FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+        interrupted = [job for job in (JobRecord(**json.loads(row[0])) for row in rows) if not _process_alive(job.worker_pid)]
+        for job in interrupted:
+            job.mark_interrupted()
+            self._save_sync(job)
+        return len(interrupted)
+
+    async def save(self, job: JobRecord) -> None:
+        await asyncio.to_thread(self._save_sync, job)
+
+    async def get(self, job_id: str) -> Optional[JobRecord]:
+        return await asyncio.to_thread(self._get_sync, job_id)
+
+    async def fail_interrupted_jobs(self) -> int:
+        return await asyncio.to_thread(self._fail_interrupted_jobs_sync)
+
+    async def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class JobManager:
+    """
+    Fila de jobs com um número fixo de workers. Limita quantos crews rodam ao
+    mesmo tempo e rejeita novos jobs (JobQueueFullError) quando a fila enche.
+
+    A fila é do processo: com o store SQLite e o servidor pre-fork, qualquer worker
+    consulta e cancela um job, mas só o worker que o recebeu o executa. Cancelado
+    por outro worker, o job em execução segue até o fim e o resultado é descartado.
+    Jobs não finalizados de processos encerrados são marcados como falha
+    (error_type "interrupted") no shutdown e no startup.
+    """
+
+    def __init__(self, store_factory: Callable[[], JobStore], runner: JobRunner, workers: int, max_queue_depth: int):
+        self._store_factory = store_factory
+        self.store: Optional[JobStore] = None
+        self._runner = runner
+        self._workers_count = workers
+        self._max_queue_depth = max_queue_depth
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._running_jobs: Dict[str, asyncio.Task] = {}
+        # Jobs na fila deste processo e, entre eles, os cancelados (limitados à profundidade da fila).
+        self._queued_job_ids: set = set()
+        self._cancelled_job_ids: set = set()
+        # Jobs aceitos por submit ainda sendo gravados no store (contam como lugar na fila).
+        self._reserved_slots = 0
+        # Média móvel da duração dos jobs, usada para estimar o Retry-After
+        self._avg_job_seconds = 30.0
+
+    async def start(self) -> None:
+        self.store = self._store_factory()
+        interrupted = await self.store.fail_interrupted_jobs()
+        if interrupted:
+            logger_jobs.warning(f"{interrupted} job(s) deixados por um processo encerrado marcados como falha (interrupted).")
+        self._queue = asyncio.Queue(maxsize=self._max_queue_depth)
+        self._workers = [asyncio.create_task(self._worker_loop(i)) for i in range(self._workers_count)]
+        logger_jobs.info(f"JobManager iniciado com {self._workers_count} workers e fila máxima de {self._max_queue_depth}.")
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._queue is None:
+            return
+        while not self._queue.empty():
+            job = self._queue.get_nowait()
+            if job.job_id not in self._cancelled_job_ids:
+                job.mark_interrupted()
+                await self.store.save(job)
+        self._queued_job_ids.clear()
+        self._cancelled_job_ids.clear()
+        await self.store.close()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def _estimate_retry_after(self) -> int:
+        return max(1, int(self._avg_job_seconds * (self.queue_depth + 1) / max(1, self._workers_count)))
+
+    async def submit(self, request: Dict[str, Any]) -> JobRecord:
+        if self._queue is None or self.store is None:
+            raise RuntimeError("JobManager não foi iniciado.")
+        if self._queue.qsize() + self._reserved_slots >= self._max_queue_depth:
+            raise JobQueueFullError(self._estimate_retry_after())
+        job = JobRecord(job_id=uuid.uuid4().hex, status="queued", request=request, worker_pid=os.getpid())
+        # Grava antes de enfileirar: o "running" salvo pelo worker não pode ser sobrescrito pelo "queued".
+        self._reserved_slots += 1
+        try:
+            await self.store.save(job)
+        finally:
+            self._reserved_slots -= 1
+        self._queue.put_nowait(job)
+        self._queued_job_ids.add(job.job_id)
+        return job
+
+    async def get(self, job_id: str) -> Optional[JobRecord]:
+        return await self.store.get(job_id)
+
+    async def cancel(self, job_id: str) -> Optional[JobRecord]:
+        job = await self.store.get(job_id)
+        if job is None or job.is_finished:
+            return job
+        running_task = self._running_jobs.get(job_id)
+        if running_task:
+            running_task.cancel()
+        elif job_id in self._queued_job_ids:
+            # Ainda na fila deste processo: o worker descarta o job quando retirá-lo da fila.
+            # Na fila de outro worker, o cancelamento gravado no store basta.
+            self._cancelled_job_ids.add(job_id)
+        job.status = "cancelled"
+        job.finished_at = time.time()
+        await self.store.save(job)
+        return job
+
+    async def _worker_loop(self, worker_index: int) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run_job(job)
+            except Exception as e:
+                logger_jobs.error(f"Worker {worker_index} falhou ao processar o job {job.job_id}: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: JobRecord) -> None:
+        job_id = job.job_id
+        self._queued_job_ids.discard(job_id)
+        if job_id in self._cancelled_job_ids:
+            self._cancelled_job_ids.discard(job_id)
+            return
+        if await self._cancelled_elsewhere(job_id):
+            return
+
+        job.status = "running"
+        job.started_at = time.time()
+        run_task = asyncio.create_task(self._runner(job.request))
+        self._running_jobs[job_id] = run_task
+        status: JobStatus = "failed"
+        result, error = None, None
+        try:
+            await self.store.save(job)
+            result = await run_task
+            status = "succeeded"
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                # O próprio worker foi cancelado (shutdown): o job não termina neste processo.
+                run_task.cancel()
+                job.mark_interrupted()
+                await self.store.save(job)
+                raise
+            status = "cancelled"
+        except Exception as e:
+            logger_jobs.error(f"Job {job_id} falhou: {e}", exc_info=True)
+            error = {"error_type": type(e).__name__, "error_message": str(e)}
+        finally:
+            self._running_jobs.pop(job_id, None)
+
+        finished_at = time.time()
+        self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * (finished_at - job.started_at)
+        if status != "cancelled" and await self._cancelled_elsewhere(job_id):
+            return
+        job.status, job.result, job.error, job.finished_at = status, result, error, finished_at
+        await self.store.save(job)
+
+    async def _cancelled_elsewhere(self, job_id: str) -> bool:
+        # Cancelado por outro worker (store compartilhado): mantém o status gravado por ele.
+        stored = await self.store.get(job_id)
+        if stored is not None and stored.status == "cancelled":
+            logger_jobs.info(f"Job {job_id} foi cancelado por outro worker; resultado descartado.")
+            return True
+        return False
+
+
+def create_job_store() -> JobStore:
+    if api_settings.job_store == "sqlite":
+        return SQLiteJobStore(api_settings.job_store_sqlite_path, api_settings.job_result_ttl_seconds)
+    return InMemoryJobStore(api_settings.job_result_ttl_seconds)
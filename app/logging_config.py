@@ -0,0 +1,188 @@
+# ---------------------------------------------------------------------------
+# app/logging_config.py
+# Configuração do logging da aplicação: registros vão para uma fila em
+# memória e são formatados (JSON ou texto) e escritos por uma thread em
+# segundo plano, com nível por logger e amostragem de registros ruidosos.
+# ---------------------------------------------------------------------------
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import List, Mapping, Optional
+
+from crew.metrics import metrics_registry
+
+log_records_dropped_total = metrics_registry.counter(
+    "log_records_dropped_total", "Registros de log descartados, por motivo (sampled, queue_full).", ("reason",)
+)
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Atributos padrão do LogRecord (e a cópia com cores ANSI que o uvicorn anexa);
+# o restante veio de extra= e vira campo do JSON.
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "color_message"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro: timestamp, nível, logger, mensagem, campos de extra= e exceção."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exception"] = record.exc_text
+        if record.stack_info:
+            payload["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Mantém só uma fração dos registros DEBUG/INFO dos loggers configurados (o
+    prefixo mais específico vale, ex.: "crew" cobre "crew.zep_context").
+    WARNING ou acima nunca são amostrados.
+    """
+
+    def __init__(self, sample_rates: Mapping[str, float], rng: Optional[random.Random] = None):
+        super().__init__()
+        self._sample_rates = dict(sample_rates)
+        self._random = (rng or random.Random()).random
+
+    def _rate_for(self, logger_name: str) -> float:
+        name = logger_name
+        while True:
+            rate = self._sample_rates.get(name)
+            if rate is not None:
+                return rate
+            if "." not in name:
+                return 1.0
+            name = name.rsplit(".", 1)[0]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self._sample_rates:
+            return True
+        rate = self._rate_for(record.name)
+        if rate >= 1.0 or self._random() < rate:
+            return True
+        log_records_dropped_total.inc(reason="sampled")
+        return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que não formata no thread de quem loga: só resolve a mensagem
+    (args podem mudar depois) e deixa traceback e JSON para a thread do listener.
+    Com a fila cheia, descarta o registro em vez de bloquear o event loop.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped_total.inc(reason="queue_full")
+
+
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_output_handlers: List[logging.Handler] = []
+_queue_size = 0
+_fork_hook_registered = False
+
+
+def _start_listener() -> None:
+    global _listener
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=_queue_size)
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_output_handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_listener_after_fork() -> None:
+    # A thread do listener não sobrevive ao fork (workers do app.server): cada
+    # processo filho precisa da sua, com uma fila nova (a antiga pode ter locks presos).
+    if _queue_handler is not None:
+        _start_listener()
+
+
+def create_output_handler(log_format: str) -> logging.Handler:
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+def configure_logging(
+    log_format: str = "json",
+    level: str = "INFO",
+    logger_levels: Optional[Mapping[str, str]] = None,
+    sample_rates: Optional[Mapping[str, float]] = None,
+    queue_size: int = 10000,
+    handlers: Optional[List[logging.Handler]] = None,
+) -> None:
+    """
+    Substitui os handlers do logger raiz por um NonBlockingQueueHandler e inicia o
+    listener que escreve nos handlers de saída (stderr por padrão). Pode ser chamada
+    de novo para reconfigurar.
+    """
+    global _queue_handler, _output_handlers, _queue_size, _fork_hook_registered
+    stop_logging()
+    _output_handlers = list(handlers) if handlers is not None else [create_output_handler(log_format)]
+    _queue_size = queue_size
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    if sample_rates:
+        _queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    root_logger = logging.getLogger()
+    for existing_handler in list(root_logger.handlers):
+        root_logger.removeHandler(existing_handler)
+    root_logger.addHandler(_queue_handler)
+    root_logger.setLevel(level)
+    for logger_name, logger_level in (logger_levels or {}).items():
+        logging.getLogger(logger_name).setLevel(logger_level.upper())
+
+    _start_listener()
+    if not _fork_hook_registered:
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=_restart_listener_after_fork)
+        atexit.register(stop_logging)
+        _fork_hook_registered = True
+
+
+def stop_logging() -> None:
+    """Escreve os registros ainda na fila e encerra a thread do listener."""
+    global _listener
+    if _listener is not None:
+        listener, _listener = _listener, None
+        listener.stop()
+        for output_handler in _output_handlers:
+            try:
+                output_handler.flush()
+            except (ValueError, OSError):
+                # No atexit o stream já pode ter sido fechado (ex.: captura do pytest).
+                pass
+
+
+def _queue_depth_samples():
+    return [((), _queue_handler.queue.qsize() if _queue_handler is not None else 0)]
+
+
+metrics_registry.callback("log_queue_depth", "Registros de log aguardando a thread de escrita.", "gauge", (), _queue_depth_samples)
@@ -3,6 +3,9 @@
 # Ponto de entrada da aplicação FastAPI, configuração de middlewares e rotas.
 # ---------------------------------------------------------------------------
 import os
+import asyncio
+import time
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -10,11 +13,25 @@ from starlette.middleware.cors import CORSMiddleware
 from app.routes.v1_router import v1_router
 from app.settings import api_settings
 from app.routes.health import health_router
+from app.routes.metrics import metrics_router, multiprocess_metrics
+from app.routes.agents import idempotency_manager
+from app.routes.jobs import job_manager
+from app.logging_config import configure_logging
+from app.warmup import run_warmup, warmup_state
+from crew.metrics import metrics_registry
+from crew.llm_cache import close_completion_store
+from crew.zep_client import close_zep_client
+from crew.zep_context import zep_write_behind
 import logging
 
-# Configuração de logging centralizada (exemplo básico)
-# Para configurações mais avançadas (formatos, handlers), considere um módulo dedicado.
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Configuração de logging centralizada: fila + thread de escrita (ver app/logging_config.py).
+configure_logging(
+    log_format=api_settings.log_format,
+    level=api_settings.log_level,
+    logger_levels=api_settings.log_levels,
+    sample_rates=api_settings.log_sample_rates,
+    queue_size=api_settings.log_queue_size,
+)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
@@ -27,7 +44,11 @@ if BEARER_TOKEN:
 else:
     logger.warning("BEARER_TOKEN não está configurado - a autenticação falhará")
 
-def verify_token(authorization: HTTPAuthorizationCredentials = Depends(security)):
+auth_duration_seconds = metrics_registry.histogram(
+    "api_auth_duration_seconds", "Duração da verificação do token Bearer, por resultado.", ("outcome",)
+)
+
+def _check_token(authorization: HTTPAuthorizationCredentials):
     if not BEARER_TOKEN:
         logger.error("Variável de ambiente BEARER_TOKEN não está configurada")
         raise HTTPException(
@@ -44,6 +65,48 @@ def verify_token(authorization: HTTPAuthorizationCredentials = Depends(security)
     
     return authorization.credentials
 
+def verify_token(authorization: HTTPAuthorizationCredentials = Depends(security)):
+    start = time.perf_counter()
+    outcome = "success"
+    try:
+        return _check_token(authorization)
+    except HTTPException as e:
+        outcome = "misconfigured" if e.status_code == 500 else "invalid"
+        raise
+    finally:
+        auth_duration_seconds.observe(time.perf_counter() - start, outcome=outcome)
+
+@asynccontextmanager
+async def lifespan(app_instance: FastAPI):
+    if multiprocess_metrics is not None:
+        multiprocess_metrics.start()
+    # Warm-up: importa o executor (crewai etc.), compila os templates dos crews (YAML,
+    # agentes, ferramentas, LLMs) uma única vez e abre a conexão com a Zep.
+    warmup_task = None
+    if api_settings.warmup_mode == "blocking":
+        await run_warmup()
+    elif api_settings.warmup_mode == "background":
+        warmup_task = asyncio.create_task(run_warmup())
+    else:
+        # Sem warm-up, tudo é carregado sob demanda na primeira requisição.
+        warmup_state.status = "ready"
+    if api_settings.zep_write_behind_enabled:
+        zep_write_behind.start()
+    await idempotency_manager.start()
+    await job_manager.start()
+    yield
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    await job_manager.stop()
+    await idempotency_manager.stop()
+    # Depois dos jobs: respostas de jobs finalizados no shutdown ainda entram no flush.
+    await zep_write_behind.stop(timeout=api_settings.zep_write_behind_shutdown_timeout_seconds)
+    # Por último: o flush da fila write-behind ainda usa o pool de conexões.
+    await close_zep_client()
+    close_completion_store()
+    if multiprocess_metrics is not None:
+        await multiprocess_metrics.stop()
+
 def create_app() -> FastAPI:
     app_instance: FastAPI = FastAPI(
         title=api_settings.title,
@@ -51,10 +114,12 @@ def create_app() -> FastAPI:
         docs_url="/docs" if api_settings.docs_enabled else None,
         redoc_url="/redoc" if api_settings.docs_enabled else None,
         openapi_url="/openapi.json" if api_settings.docs_enabled else None,
+        lifespan=lifespan,
     )
     
-    # Health check não requer autenticação
+    # Health check e métricas não requerem autenticação
     app_instance.include_router(health_router, tags=["Health"])
+    app_instance.include_router(metrics_router, tags=["Metrics"])
     
     # Rotas protegidas requerem autenticação
     app_instance.include_router(v1_router, dependencies=[Depends(verify_token)])
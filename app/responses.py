@@ -0,0 +1,130 @@
+# ---------------------------------------------------------------------------
+# app/responses.py
+# Resposta de /v1/create_crew/: projeção dos campos do CrewOutput (?fields=),
+# serialização com orjson (json da biblioteca padrão se ausente) e compressão
+# gzip/brotli conforme o Accept-Encoding do cliente.
+# ---------------------------------------------------------------------------
+import asyncio
+import gzip
+import json
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from starlette.responses import Response
+
+from app.settings import api_settings
+from crew.metrics import metrics_registry
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson vem com as dependências do crewai
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Campos do CrewOutput, na ordem em que aparecem na resposta.
+CREW_RESULT_FIELDS: Tuple[str, ...] = ("raw", "pydantic", "json_dict", "tasks_output", "token_usage")
+
+crew_response_bytes = metrics_registry.histogram(
+    "crew_response_bytes", "Tamanho do corpo de /v1/create_crew/ enviado, por codificação.", ("encoding",),
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576),
+)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Lê ?fields=raw,token_usage. None mantém todos os campos; nomes desconhecidos lançam ValueError (HTTP 400)."""
+    if fields is None:
+        return None
+    requested = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in CREW_RESULT_FIELDS]
+    if unknown or not requested:
+        raise ValueError(f"Parâmetro 'fields' inválido: {fields!r}. Campos disponíveis: {', '.join(CREW_RESULT_FIELDS)}.")
+    return requested
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, list):
+        return [_encode_value(item) for item in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return jsonable_encoder(value)
+
+
+def crew_result_to_dict(result: Any, fields: Optional[Sequence[str]] = None) -> Any:
+    """
+    Converte o retorno do kickoff (CrewOutput) em dict com só os campos pedidos
+    (todos por padrão). Campos não pedidos, como tasks_output, nem são serializados.
+    """
+    if not all(hasattr(result, name) for name in CREW_RESULT_FIELDS):
+        return jsonable_encoder(result)
+    return {name: _encode_value(getattr(result, name)) for name in (fields or CREW_RESULT_FIELDS)}
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def _accepted_encodings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    accepted: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    return accepted
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """'br' (se o pacote brotli estiver instalado) ou 'gzip', conforme o Accept-Encoding; None sem compressão."""
+    accepted = _accepted_encodings(accept_encoding)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best = max(candidates, key=lambda coding: accepted.get(coding, accepted.get("*", 0.0)))
+    return best if accepted.get(best, accepted.get("*", 0.0)) > 0 else None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=api_settings.response_compression_level)
+    return gzip.compress(body, compresslevel=api_settings.response_compression_level)
+
+
+async def json_response(
+    content: Any,
+    accept_encoding: Optional[str] = None,
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    """
+    Resposta JSON compacta. Corpos a partir de api_settings.response_compression_min_bytes
+    (0 desabilita) são comprimidos se o cliente aceitar; a partir de
+    response_compression_offload_min_bytes, em uma thread, para não segurar o event loop.
+    """
+    body = dumps(content)
+    response_headers = dict(headers or {})
+    encoding = None
+    min_bytes = api_settings.response_compression_min_bytes
+    if min_bytes > 0 and len(body) >= min_bytes:
+        response_headers["Vary"] = "Accept-Encoding"
+        encoding = choose_encoding(accept_encoding)
+        if encoding:
+            if len(body) >= api_settings.response_compression_offload_min_bytes:
+                body = await asyncio.to_thread(_compress, body, encoding)
+            else:
+                body = _compress(body, encoding)
+            response_headers["Content-Encoding"] = encoding
+    crew_response_bytes.observe(len(body), encoding=encoding or "identity")
+    return Response(content=body, status_code=status_code, headers=response_headers, media_type="application/json")
@@ -2,10 +2,21 @@
 # app/routes/agents.py
 # Define as rotas da API relacionadas aos agentes/crews.
 # ---------------------------------------------------------------------------
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field # Alterado de PydanticField para Field
-from crew.crew_executor import execute_crew, ZepSearchScope, ZepReranker # Importa tipos para Zep params
-from typing import Optional
+from app.admission import AdmissionRejectedError, admission_limiter
+from app.batch import BatchItemOutcome, iter_batch_results
+from app.cancellation import ClientDisconnected, RequestDeadlineExceeded, parse_request_deadline, run_until_disconnect_or_deadline
+from app.idempotency import IdempotencyKeyConflictError, IdempotencyManager, create_idempotency_store, request_fingerprint
+from app.responses import crew_result_to_dict, json_response, parse_fields
+from app.settings import api_settings
+from app.warmup import load_crew_executor
+from crew.zep_context import ZepSearchScope, ZepReranker # Importa tipos para Zep params
+from crew.session_ordering import SessionBusyError
+from contextlib import aclosing, nullcontext
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+import json
 import logging
 import traceback # Adicionado para obter o traceback completo
 
@@ -23,13 +34,52 @@ class CreateCrewRequest(BaseModel):
     zep_graph_search_limit_override: Optional[int] = Field(None, ge=1, le=20, description="Override para o limite de resultados da busca no grafo Zep.")
 
 
+class CrewResult(BaseModel):
+    """Saída do crew (CrewOutput). Com ?fields=, só os campos pedidos aparecem."""
+    raw: Optional[str] = Field(None, description="Texto final da resposta.")
+    pydantic: Optional[Dict[str, Any]] = None
+    json_dict: Optional[Dict[str, Any]] = None
+    tasks_output: Optional[List[Dict[str, Any]]] = Field(None, description="Saída de cada tarefa (a maior parte do corpo).")
+    token_usage: Optional[Dict[str, Any]] = None
+
+
+class CreateCrewResponse(BaseModel):
+    status: str
+    message: str
+    result: CrewResult
+
+
+class CreateCrewBatchRequest(BaseModel):
+    items: List[CreateCrewRequest] = Field(..., min_length=1, description="Mensagens a executar; itens da mesma session_id rodam na ordem enviada.")
+    concurrency: Optional[int] = Field(None, ge=1, description="Itens executados em paralelo (limitado por api_settings.batch_max_concurrency).")
+
+
 agents_router = APIRouter()
 
-@agents_router.post("/create_crew/")
-async def create_crew_endpoint(request: CreateCrewRequest):
-    logger_agents.info(f"Recebida requisição para /create_crew/: crew_name='{request.crew_name}', user_id='{request.user_id}', session_id='{request.session_id}'")
-    try:
-        result = await execute_crew(
+# Respostas de /create_crew/ por chave de idempotência (iniciado/encerrado no lifespan da aplicação).
+idempotency_manager = IdempotencyManager(
+    store_factory=create_idempotency_store,
+    ttl_seconds=api_settings.idempotency_ttl_seconds,
+)
+
+
+def _admission(request: CreateCrewRequest, background: bool = False):
+    if not api_settings.admission_enabled:
+        return nullcontext()
+    # Tenant = user_id: a fila e os limites por tenant dividem a capacidade entre usuários.
+    return admission_limiter.admit(request.user_id, background=background)
+
+
+async def run_crew_request(request: CreateCrewRequest, background: bool = False):
+    """
+    Executa o crew descrito por uma CreateCrewRequest com uma vaga do controle de
+    admissão (usado pelo endpoint síncrono, pelo batch e pelos jobs). Com
+    background=True (batch e jobs), espera a vaga sem prazo e fora da fila das
+    requisições síncronas.
+    """
+    crew_executor = await load_crew_executor()
+    async with _admission(request, background):
+        return await crew_executor.execute_crew(
             crew_name=request.crew_name,
             inputs={"message": request.message},
             user_id=request.user_id,
@@ -39,27 +89,122 @@ async def create_crew_endpoint(request: CreateCrewRequest):
             zep_graph_search_reranker_override=request.zep_graph_search_reranker_override,
             zep_graph_search_limit_override=request.zep_graph_search_limit_override
         )
-        logger_agents.info(f"Crew '{request.crew_name}' para user_id='{request.user_id}', session_id='{request.session_id}' finalizado com sucesso.")
-        return {
-            "status": "success",
-            "message": f"Crew '{request.crew_name}' executado com sucesso com memória Zep!",
-            "result": result
-        }
+
+async def _run_crew_response(request: CreateCrewRequest, fields: Optional[Tuple[str, ...]] = None, background: bool = False) -> Dict[str, Any]:
+    result = await run_crew_request(request, background)
+    logger_agents.info(
+        "Crew '%s' para user_id='%s', session_id='%s' finalizado com sucesso.", request.crew_name, request.user_id, request.session_id,
+        extra={"crew_name": request.crew_name, "user_id": request.user_id, "session_id": request.session_id},
+    )
+    return {
+        "status": "success",
+        "message": f"Crew '{request.crew_name}' executado com sucesso com memória Zep!",
+        "result": crew_result_to_dict(result, fields),
+    }
+
+
+async def _not_replayed(response: Awaitable[Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+    return await response, False
+
+
+@agents_router.post(
+    "/create_crew/",
+    # O corpo é montado por json_response (projeção de ?fields= e compressão), sem validação do response_model.
+    response_class=JSONResponse,
+    responses={200: {"model": CreateCrewResponse, "description": "Resultado do crew (campos de 'result' conforme ?fields=)."}},
+)
+async def create_crew_endpoint(
+    request: CreateCrewRequest,
+    raw_request: Request,
+    fields: Optional[str] = Query(None, description="Campos de 'result' separados por vírgula (ex.: raw,token_usage); padrão: todos."),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    request_deadline: Optional[str] = Header(None, alias="X-Request-Deadline"),
+):
+    """
+    Executa o crew e retorna o resultado.
+
+    Com o header Idempotency-Key (ou, sem ele e se habilitado, para requisições idênticas
+    dentro de api_settings.idempotency_derived_key_window_seconds), retentativas se juntam
+    à execução em andamento ou recebem a resposta armazenada, com Idempotent-Replayed: true.
+
+    Se o cliente desconectar ou o prazo (X-Request-Deadline em segundos, limitado por
+    api_settings.request_deadline_seconds) expirar, a execução é cancelada, a menos
+    que retentativas estejam aguardando a mesma chave de idempotência. Acima do limite
+    adaptativo de execuções simultâneas (app/admission.py), responde 503 com Retry-After;
+    acima dos limites do usuário (tenant), 429.
+
+    ?fields= limita os campos de 'result' (os demais nem são serializados); corpos
+    grandes são comprimidos (gzip, ou brotli se instalado) conforme o Accept-Encoding.
+    """
+    logger_agents.info(
+        "Recebida requisição para /create_crew/: crew_name='%s', user_id='%s', session_id='%s'", request.crew_name, request.user_id, request.session_id,
+        extra={"crew_name": request.crew_name, "user_id": request.user_id, "session_id": request.session_id},
+    )
+    try:
+        deadline_seconds = parse_request_deadline(request_deadline, api_settings.request_deadline_seconds)
+        result_fields = parse_fields(fields)
+        fingerprint_payload = request.model_dump(mode="json")
+        if result_fields is not None:
+            # A resposta armazenada para a chave já vem projetada.
+            fingerprint_payload["fields"] = list(result_fields)
+        fingerprint = request_fingerprint(fingerprint_payload)
+        scoped_idempotency_key: Optional[str] = None
+        if api_settings.idempotency_enabled and idempotency_key:
+            # Escopo por usuário: chaves geradas por clientes diferentes não colidem.
+            scoped_idempotency_key = f"key:{request.user_id}:{idempotency_key}"
+            work = idempotency_manager.run(scoped_idempotency_key, fingerprint, lambda: _run_crew_response(request, result_fields))
+        elif api_settings.idempotency_enabled and api_settings.idempotency_derived_key_window_seconds > 0:
+            scoped_idempotency_key = f"derived:{fingerprint}"
+            work = idempotency_manager.run(
+                scoped_idempotency_key, fingerprint, lambda: _run_crew_response(request, result_fields),
+                ttl_seconds=api_settings.idempotency_derived_key_window_seconds,
+            )
+        else:
+            work = _not_replayed(_run_crew_response(request, result_fields))
+        body, replayed = await run_until_disconnect_or_deadline(
+            raw_request, work, deadline_seconds,
+            keep_running=lambda: scoped_idempotency_key is not None and idempotency_manager.has_waiters(scoped_idempotency_key),
+        )
+        return await json_response(body, raw_request.headers.get("accept-encoding"), headers={"Idempotent-Replayed": "true"} if replayed else None)
+    except ClientDisconnected as cd:
+        logger_agents.info(
+            "Cliente desconectou antes do fim do crew '%s' (session_id='%s').", request.crew_name, request.session_id,
+            extra={"crew_name": request.crew_name, "user_id": request.user_id, "session_id": request.session_id},
+        )
+        raise HTTPException(status_code=499, detail=str(cd))
+    except AdmissionRejectedError as are:
+        logger_agents.warning(
+            "Crew '%s' recusado pelo controle de admissão (%s, limite=%d).", request.crew_name, are.reason, admission_limiter.limit,
+            extra={"crew_name": request.crew_name, "user_id": request.user_id, "reason": are.reason},
+        )
+        return JSONResponse(status_code=are.status_code, content={"detail": str(are)}, headers={"Retry-After": str(are.retry_after_seconds)})
+    except RequestDeadlineExceeded as rde:
+        logger_agents.warning(f"Prazo expirado ao executar crew '{request.crew_name}': {rde}")
+        raise HTTPException(status_code=504, detail=str(rde))
+    except IdempotencyKeyConflictError as ike:
+        logger_agents.warning(f"Conflito de chave de idempotência no crew '{request.crew_name}': {ike}")
+        raise HTTPException(status_code=422, detail=str(ike))
     except ValueError as ve:
         logger_agents.warning(f"Erro de valor ao tentar executar crew '{request.crew_name}': {ve}")
         raise HTTPException(status_code=400, detail=str(ve))
+    except SessionBusyError as sbe:
+        logger_agents.warning(f"Sessão ocupada ao tentar executar crew '{request.crew_name}': {sbe}")
+        raise HTTPException(status_code=429, detail=str(sbe))
     except Exception as e:
-        # Modificação para depuração: incluir mais detalhes do erro na resposta
-        tb_str = traceback.format_exc()
-        logger_agents.error(f"Erro ao executar crew '{request.crew_name}' para user_id='{request.user_id}', session_id='{request.session_id}': {str(e)}\nTraceback: {tb_str}", exc_info=True) # exc_info=True já loga o traceback
-        
+        # O traceback completo vai para o log via exc_info (formatado na thread de logging).
+        logger_agents.error(
+            "Erro ao executar crew '%s' para user_id='%s', session_id='%s': %s", request.crew_name, request.user_id, request.session_id, e,
+            exc_info=True, extra={"crew_name": request.crew_name, "user_id": request.user_id, "session_id": request.session_id},
+        )
+
         # Preparar detalhes do erro para a resposta HTTP.
         # Em produção, evite expor tracebacks completos ao cliente.
         # Isto é apenas para fins de depuração durante o desenvolvimento.
         detailed_error_info = {
             "error_type": type(e).__name__,
             "error_message": str(e),
-            "traceback_snippet": tb_str.splitlines()[-5:] # Apenas as últimas 5 linhas para não poluir muito o output do teste
+            # Apenas as últimas 5 linhas (formatando só os frames finais) para não poluir muito o output do teste
+            "traceback_snippet": "".join(traceback.format_exception(e, limit=-2)).splitlines()[-5:]
         }
         # O traceback completo ainda será logado no servidor pela linha logger_agents.error acima.
         
@@ -67,3 +212,130 @@ async def create_crew_endpoint(request: CreateCrewRequest):
             status_code=500, 
             detail=f"Erro interno ao processar sua solicitação para o crew '{request.crew_name}'. Detalhes de depuração: {detailed_error_info}"
         )
+
+
+def _batch_item_line(outcome: BatchItemOutcome[CreateCrewRequest]) -> Dict[str, Any]:
+    request = outcome.item
+    line = {"index": outcome.index, "crew_name": request.crew_name, "user_id": request.user_id, "session_id": request.session_id}
+    if outcome.error is None:
+        return {**line, "status_code": 200, **outcome.result}
+    error = outcome.error
+    if isinstance(error, ValueError):
+        status_code = 400
+    elif isinstance(error, SessionBusyError):
+        status_code = 429
+    else:
+        status_code = 500
+        logger_agents.error(
+            f"Erro no item {outcome.index} do batch (crew '{request.crew_name}', session_id='{request.session_id}'): {error}",
+            exc_info=error,
+        )
+    return {**line, "status": "error", "status_code": status_code, "error_type": type(error).__name__, "error_message": str(error)}
+
+
+@agents_router.post("/create_crew/batch")
+async def create_crew_batch_endpoint(batch: CreateCrewBatchRequest):
+    """
+    Executa vários itens de /create_crew/ em uma única chamada, com concorrência limitada.
+
+    A resposta é NDJSON: uma linha por item, em ordem de conclusão, com "index"
+    (posição no pedido) e o status_code que o item teria isoladamente; a última
+    linha traz o resumo do lote. Consultas à Zep do mesmo usuário (usuário,
+    sessão, busca no grafo) são compartilhadas entre itens concorrentes. Cada item
+    ocupa uma vaga do controle de admissão como execução em segundo plano: espera
+    a vaga (dividida entre os tenants) em vez de receber 503/429.
+    """
+    if len(batch.items) > api_settings.batch_max_items:
+        raise HTTPException(status_code=400, detail=f"O batch aceita no máximo {api_settings.batch_max_items} itens.")
+    concurrency = min(batch.concurrency or api_settings.batch_default_concurrency, api_settings.batch_max_concurrency)
+    logger_agents.info(f"Recebido batch para /create_crew/batch com {len(batch.items)} itens (concorrência {concurrency}).")
+    await load_crew_executor()
+
+    async def ndjson_lines():
+        status_counts: Dict[str, int] = {}
+        outcomes = iter_batch_results(
+            batch.items, lambda item: item.session_id, lambda item: _run_crew_response(item, background=True), concurrency
+        )
+        async with aclosing(outcomes):
+            async for outcome in outcomes:
+                line = _batch_item_line(outcome)
+                status_counts[str(line["status_code"])] = status_counts.get(str(line["status_code"]), 0) + 1
+                yield json.dumps(line, ensure_ascii=False, default=str) + "\n"
+        summary = {"summary": {"total": len(batch.items), "succeeded": status_counts.get("200", 0), "status_counts": status_counts}}
+        yield json.dumps(summary, ensure_ascii=False) + "\n"
+        logger_agents.info(f"Batch de {len(batch.items)} itens finalizado: {status_counts}.")
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+def _format_sse(event_name: str, data: Dict[str, Any]) -> str:
+    return f"event: {event_name}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@agents_router.post("/create_crew/stream")
+async def create_crew_stream_endpoint(request: CreateCrewRequest, http_request: Request):
+    """
+    Variante em streaming (Server-Sent Events) de /create_crew/.
+    Eventos: context_ready, crew_started, tool_call, token, result e error.
+    A vaga do controle de admissão é obtida antes de abrir o stream (recusas
+    retornam 503/429 com Retry-After) e liberada quando ele termina.
+    """
+    logger_agents.info(
+        "Recebida requisição para /create_crew/stream: crew_name='%s', user_id='%s', session_id='%s'", request.crew_name, request.user_id, request.session_id,
+        extra={"crew_name": request.crew_name, "user_id": request.user_id, "session_id": request.session_id},
+    )
+    crew_executor = await load_crew_executor()
+    # Valida antes de abrir o stream, para que erros de requisição ainda retornem HTTP 400.
+    try:
+        crew_executor.validate_crew_request(request.crew_name)
+    except ValueError as ve:
+        logger_agents.warning(f"Erro de valor ao tentar executar crew '{request.crew_name}': {ve}")
+        raise HTTPException(status_code=400, detail=str(ve))
+
+    async def event_source():
+        async with _admission(request):
+            # Primeiro passo: só ocupa a vaga (consumido abaixo, antes de abrir o stream).
+            yield ""
+            events = crew_executor.stream_crew(
+                crew_name=request.crew_name,
+                inputs={"message": request.message},
+                user_id=request.user_id,
+                session_id=request.session_id,
+                history_limit=request.history_limit,
+                zep_graph_search_scope_override=request.zep_graph_search_scope_override,
+                zep_graph_search_reranker_override=request.zep_graph_search_reranker_override,
+                zep_graph_search_limit_override=request.zep_graph_search_limit_override
+            )
+            try:
+                async with aclosing(events):
+                    async for event_name, data in events:
+                        if await http_request.is_disconnected():
+                            logger_agents.info(f"Cliente desconectou do stream do crew '{request.crew_name}' (session_id='{request.session_id}').")
+                            break
+                        if event_name == "keepalive":
+                            yield ": keep-alive\n\n"
+                            continue
+                        yield _format_sse(event_name, data)
+                logger_agents.info("Stream do crew '%s' para user_id='%s', session_id='%s' finalizado.", request.crew_name, request.user_id, request.session_id)
+            except ValueError as ve:
+                logger_agents.warning(f"Erro de valor ao executar crew '{request.crew_name}' em streaming: {ve}")
+                yield _format_sse("error", {"error_type": type(ve).__name__, "error_message": str(ve)})
+            except Exception as e:
+                logger_agents.error(f"Erro ao executar crew '{request.crew_name}' em streaming para user_id='{request.user_id}', session_id='{request.session_id}': {str(e)}", exc_info=True)
+                yield _format_sse("error", {"error_type": type(e).__name__, "error_message": str(e)})
+
+    source = event_source()
+    try:
+        await source.__anext__()
+    except AdmissionRejectedError as are:
+        logger_agents.warning(
+            "Stream do crew '%s' recusado pelo controle de admissão (%s, limite=%d).", request.crew_name, are.reason, admission_limiter.limit,
+            extra={"crew_name": request.crew_name, "user_id": request.user_id, "reason": are.reason},
+        )
+        return JSONResponse(status_code=are.status_code, content={"detail": str(are)}, headers={"Retry-After": str(are.retry_after_seconds)})
+    # Se a resposta nunca for iterada, o gerador é fechado pelo finalizador do asyncio e libera a vaga.
+    return StreamingResponse(
+        source,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,11 +1,17 @@
 # ---------------------------------------------------------------------------
 # app/routes/health.py
-# Define a rota de health check da API.
+# Define as rotas de health check (liveness) e readiness da API.
 # ---------------------------------------------------------------------------
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.warmup import warmup_state
 
 health_router = APIRouter()
 
 @health_router.get("/health", summary="Verifica a saúde da API")
 def get_health():
-    return {"status": "API está operacional"}
\ No newline at end of file
+    return {"status": "API está operacional"}
+
+@health_router.get("/ready", summary="Verifica se o worker terminou o warm-up e pode receber tráfego")
+def get_ready():
+    return JSONResponse(status_code=200 if warmup_state.ready else 503, content=warmup_state.to_dict())
@@ -0,0 +1,92 @@
+# ---------------------------------------------------------------------------
+# app/routes/jobs.py
+# Define as rotas da API de jobs assíncronos (submit/poll/cancel de crews).
+# ---------------------------------------------------------------------------
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from app.jobs import JobManager, JobQueueFullError, JobRecord, create_job_store
+from app.responses import crew_result_to_dict
+from app.routes.agents import CreateCrewRequest, run_crew_request
+from app.settings import api_settings
+from crew.metrics import metrics_registry
+from typing import Any, Dict
+import logging
+
+logger_jobs_routes = logging.getLogger(__name__)
+
+
+async def _run_crew_job(request_payload: Dict[str, Any]) -> Dict[str, Any]:
+    request = CreateCrewRequest(**request_payload)
+    # Em segundo plano: o job espera a vaga de admissão em vez de ser recusado.
+    result = await run_crew_request(request, background=True)
+    # Mesmo formato do endpoint síncrono (CreateCrewResponse), com todos os campos do resultado.
+    return {
+        "status": "success",
+        "message": f"Crew '{request.crew_name}' executado com sucesso com memória Zep!",
+        "result": crew_result_to_dict(result),
+    }
+
+
+job_manager = JobManager(
+    store_factory=create_job_store,
+    runner=_run_crew_job,
+    workers=api_settings.job_workers,
+    max_queue_depth=api_settings.job_max_queue_depth,
+)
+
+metrics_registry.callback(
+    "crew_job_queue_depth", "Jobs aguardando um worker livre.", "gauge", (), lambda: [((), job_manager.queue_depth)]
+)
+
+jobs_router = APIRouter()
+
+
+def _job_to_response(job: JobRecord) -> Dict[str, Any]:
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+@jobs_router.post("/jobs", status_code=202)
+async def submit_job_endpoint(request: CreateCrewRequest):
+    try:
+        job = await job_manager.submit(request.model_dump())
+    except JobQueueFullError as e:
+        logger_jobs_routes.warning(f"Fila de jobs cheia; requisição para o crew '{request.crew_name}' rejeitada (Retry-After={e.retry_after_seconds}s).")
+        return JSONResponse(
+            status_code=429,
+            content={"detail": str(e)},
+            headers={"Retry-After": str(e.retry_after_seconds)},
+        )
+    logger_jobs_routes.info(f"Job {job.job_id} enfileirado: crew_name='{request.crew_name}', user_id='{request.user_id}', session_id='{request.session_id}'")
+    return JSONResponse(
+        status_code=202,
+        content=_job_to_response(job),
+        headers={"Location": f"/v1/jobs/{job.job_id}"},
+    )
+
+
+@jobs_router.get("/jobs/{job_id}")
+async def get_job_endpoint(job_id: str):
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' não encontrado.")
+    return _job_to_response(job)
+
+
+@jobs_router.delete("/jobs/{job_id}")
+async def cancel_job_endpoint(job_id: str):
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' não encontrado.")
+    if job.is_finished:
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' já foi finalizado com status '{job.status}'.")
+    job = await job_manager.cancel(job_id)
+    logger_jobs_routes.info(f"Job {job_id} cancelado.")
+    return _job_to_response(job)
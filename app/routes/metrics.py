@@ -0,0 +1,25 @@
+# ---------------------------------------------------------------------------
+# app/routes/metrics.py
+# Define a rota de métricas no formato de exposição do Prometheus.
+# ---------------------------------------------------------------------------
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.settings import api_settings
+from crew.metrics import MultiprocessMetrics, metrics_registry, render_prometheus_text
+
+metrics_router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Servidor pre-fork com vários workers: /metrics soma os snapshots de todos (iniciado no lifespan).
+multiprocess_metrics = (
+    MultiprocessMetrics(metrics_registry, api_settings.metrics_multiprocess_dir, api_settings.metrics_multiprocess_write_interval_seconds)
+    if api_settings.metrics_multiprocess_dir
+    else None
+)
+
+@metrics_router.get("/metrics", summary="Métricas da API no formato Prometheus", response_class=PlainTextResponse)
+def get_metrics():
+    if multiprocess_metrics is not None:
+        return PlainTextResponse(multiprocess_metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+    return PlainTextResponse(render_prometheus_text(metrics_registry), media_type=PROMETHEUS_CONTENT_TYPE)
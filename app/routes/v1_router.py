@@ -4,6 +4,8 @@
 # ---------------------------------------------------------------------------
 from fastapi import APIRouter
 from app.routes.agents import agents_router
+from app.routes.jobs import jobs_router
 
 v1_router = APIRouter(prefix="/v1")
-v1_router.include_router(agents_router, tags=["Crews"])
\ No newline at end of file
+v1_router.include_router(agents_router, tags=["Crews"])
+v1_router.include_router(jobs_router, tags=["Jobs"])
\ No newline at end of file
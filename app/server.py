@@ -0,0 +1,369 @@
+# ---------------------------------------------------------------------------
+# app/server.py
+# Servidor de produção pre-fork: o mestre pré-carrega a aplicação e os
+# templates de crew, abre o socket e faz fork dos workers uvicorn, que herdam
+# o estado somente leitura por copy-on-write. Workers que morrem ou excedem o
+# limite de memória são substituídos.
+#
+# Uso: python -m app.server
+# ---------------------------------------------------------------------------
+import gc
+import glob
+import importlib
+import logging
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import uvicorn
+from dotenv import load_dotenv
+
+from app.logging_config import stop_logging
+
+logger_server = logging.getLogger(__name__)
+
+# Um worker que sai antes disso é tratado como falha de inicialização (restart com backoff).
+_MIN_HEALTHY_UPTIME_SECONDS = 5.0
+_MAX_RESTART_DELAY_SECONDS = 30.0
+_POLL_INTERVAL_SECONDS = 0.2
+
+
+def private_memory_mib(pid: int) -> Optional[float]:
+    """
+    Memória privada do processo (Private_Clean + Private_Dirty) em MiB.
+
+    Diferente do RSS, não conta as páginas ainda compartilhadas com o mestre,
+    então mede o que o worker realmente custa. Usa o VmRSS quando smaps_rollup
+    não existe; retorna None fora do Linux ou se o processo já terminou.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as smaps:
+            private_kib = sum(int(line.split()[1]) for line in smaps if line.startswith(("Private_Clean:", "Private_Dirty:")))
+        return private_kib / 1024
+    except (FileNotFoundError, PermissionError, ProcessLookupError):
+        pass
+    try:
+        with open(f"/proc/{pid}/status", "r") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (FileNotFoundError, PermissionError, ProcessLookupError):
+        pass
+    return None
+
+
+@dataclass
+class _Worker:
+    index: int
+    pid: int
+    started_at: float
+    recycling: bool = False
+    kill_deadline: Optional[float] = None
+
+
+class PreforkServer:
+    """
+    Supervisor dos workers. O socket é aberto pelo mestre e herdado por todos os
+    workers (o kernel distribui as conexões). gc.freeze() antes do fork evita que
+    o coletor de lixo dos workers toque nos objetos pré-carregados e desfaça o
+    compartilhamento das páginas.
+    """
+
+    def __init__(
+        self,
+        app: Any,
+        host: str,
+        port: int,
+        workers: int,
+        backlog: int = 2048,
+        max_memory_mib: float = 0.0,
+        check_interval_seconds: float = 5.0,
+        graceful_timeout_seconds: float = 30.0,
+        log_level: str = "info",
+    ):
+        self._app = app
+        self._host = host
+        self._port = port
+        self._worker_count = workers
+        self._backlog = backlog
+        self._max_memory_mib = max_memory_mib
+        self._check_interval_seconds = check_interval_seconds
+        self._graceful_timeout_seconds = graceful_timeout_seconds
+        self._log_level = log_level
+        self._socket: Optional[socket.socket] = None
+        self._workers: Dict[int, _Worker] = {}
+        self._pending_restarts: List[Tuple[float, int]] = []
+        self._consecutive_failures: Dict[int, int] = {}
+        self._stopping = False
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._socket.getsockname()[:2]
+
+    def bind(self) -> socket.socket:
+        if self._socket is None:
+            family = socket.AF_INET6 if ":" in self._host else socket.AF_INET
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((self._host, self._port))
+            sock.listen(self._backlog)
+            sock.set_inheritable(True)
+            self._socket = sock
+        return self._socket
+
+    def run(self) -> int:
+        self.bind()
+        logger_server.info(f"Servidor pre-fork escutando em {self._host}:{self.address[1]} com {self._worker_count} workers.")
+        # Tudo o que foi pré-carregado até aqui vai para a geração permanente do GC.
+        gc.collect()
+        gc.freeze()
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        for index in range(self._worker_count):
+            self._spawn(index)
+
+        next_memory_check = time.monotonic() + self._check_interval_seconds
+        while not self._stopping:
+            self._reap()
+            now = time.monotonic()
+            self._run_pending_restarts(now)
+            self._enforce_kill_deadlines(now)
+            if self._max_memory_mib and now >= next_memory_check:
+                self._check_memory()
+                next_memory_check = now + self._check_interval_seconds
+            time.sleep(_POLL_INTERVAL_SECONDS)
+
+        self._shutdown()
+        return 0
+
+    def _handle_stop(self, signum, frame) -> None:
+        logger_server.info(f"Sinal {signal.Signals(signum).name} recebido; encerrando os workers.")
+        self._stopping = True
+
+    def _spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 1
+            try:
+                exit_code = self._worker_main()
+            except BaseException:
+                logger_server.exception(f"Worker {index} terminou com erro.")
+            finally:
+                # os._exit não roda o atexit: esvazia a fila de logs antes.
+                stop_logging()
+                os._exit(exit_code)
+        self._workers[pid] = _Worker(index=index, pid=pid, started_at=time.monotonic())
+        logger_server.info(f"Worker {index} iniciado (pid {pid}).")
+
+    def _worker_main(self) -> int:
+        # Os handlers do mestre não valem no worker; o uvicorn instala os seus no serve().
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        config = uvicorn.Config(
+            self._app,
+            host=self._host,
+            port=self._port,
+            lifespan="on",
+            log_level=self._log_level,
+            # Sem dictConfig próprio: os loggers do uvicorn propagam para a fila do app.logging_config.
+            log_config=None,
+            backlog=self._backlog,
+            timeout_graceful_shutdown=int(self._graceful_timeout_seconds),
+        )
+        uvicorn.Server(config).run(sockets=[self._socket])
+        return 0
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self._workers.pop(pid, None)
+            if worker is None:
+                continue
+            exit_code = os.waitstatus_to_exitcode(status)
+            if self._stopping:
+                continue
+            uptime = time.monotonic() - worker.started_at
+            if worker.recycling:
+                logger_server.info(f"Worker {worker.index} (pid {pid}) reciclado; iniciando substituto.")
+                delay = 0.0
+            elif uptime < _MIN_HEALTHY_UPTIME_SECONDS:
+                failures = self._consecutive_failures.get(worker.index, 0) + 1
+                self._consecutive_failures[worker.index] = failures
+                delay = min(_MAX_RESTART_DELAY_SECONDS, 0.5 * 2 ** (failures - 1))
+                logger_server.error(
+                    f"Worker {worker.index} (pid {pid}) saiu com código {exit_code} após {uptime:.1f}s; "
+                    f"reiniciando em {delay:.1f}s (falha consecutiva {failures})."
+                )
+            else:
+                self._consecutive_failures.pop(worker.index, None)
+                delay = 0.0
+                logger_server.warning(f"Worker {worker.index} (pid {pid}) saiu com código {exit_code}; reiniciando.")
+            self._pending_restarts.append((time.monotonic() + delay, worker.index))
+
+    def _run_pending_restarts(self, now: float) -> None:
+        due = [index for restart_at, index in self._pending_restarts if restart_at <= now]
+        self._pending_restarts = [(restart_at, index) for restart_at, index in self._pending_restarts if restart_at > now]
+        for index in due:
+            self._spawn(index)
+
+    def _check_memory(self) -> None:
+        for worker in list(self._workers.values()):
+            if worker.recycling:
+                continue
+            memory_mib = private_memory_mib(worker.pid)
+            if memory_mib is not None and memory_mib > self._max_memory_mib:
+                logger_server.warning(
+                    f"Worker {worker.index} (pid {worker.pid}) usa {memory_mib:.0f} MiB de memória privada "
+                    f"(limite {self._max_memory_mib:.0f} MiB); reciclando."
+                )
+                self._terminate(worker)
+
+    def _terminate(self, worker: _Worker) -> None:
+        worker.recycling = True
+        worker.kill_deadline = time.monotonic() + self._graceful_timeout_seconds
+        try:
+            os.kill(worker.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def _enforce_kill_deadlines(self, now: float) -> None:
+        for worker in list(self._workers.values()):
+            if worker.kill_deadline is not None and now >= worker.kill_deadline:
+                logger_server.warning(f"Worker {worker.index} (pid {worker.pid}) não encerrou a tempo; enviando SIGKILL.")
+                worker.kill_deadline = None
+                try:
+                    os.kill(worker.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def _shutdown(self) -> None:
+        for worker in list(self._workers.values()):
+            self._terminate(worker)
+        deadline = time.monotonic() + self._graceful_timeout_seconds
+        while self._workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(_POLL_INTERVAL_SECONDS)
+        for worker in list(self._workers.values()):
+            try:
+                os.kill(worker.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        while self._workers:
+            pid, _ = os.waitpid(-1, 0)
+            self._workers.pop(pid, None)
+        self._socket.close()
+        logger_server.info("Servidor pre-fork encerrado.")
+
+
+def preload_crews() -> None:
+    """Importa o executor (crewai, crewai_tools, litellm) e compila os templates no mestre, antes do fork."""
+    from crew.crew_templates import crew_templates
+
+    start = time.perf_counter()
+    try:
+        importlib.import_module("crew.crew_executor")
+        crew_templates.compile_all()
+    except Exception as e:
+        # Os workers tentam de novo no warm-up do lifespan (e /ready reflete o resultado).
+        logger_server.error(f"Falha ao pré-carregar os crews no mestre: {e}", exc_info=True)
+        return
+    logger_server.info(f"Crews pré-carregados no mestre em {time.perf_counter() - start:.2f}s: {crew_templates.names()}")
+
+
+def _has_flock() -> bool:
+    try:
+        import fcntl  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def configure_workers(workers: int) -> List[str]:
+    """
+    Ajusta as configurações ao número de workers antes de importar a aplicação
+    (locks, caches e filas em memória são criados no import e herdados no fork).
+    Com mais de um worker, o que depende de estado do processo e não foi configurado
+    explicitamente é ajustado: lock de sessão entre processos (que também mantém
+    a fila write-behind e o cache de histórico corretos entre workers), stores de
+    jobs e de idempotência em SQLite e métricas agregadas. Retorna os diretórios
+    temporários criados.
+    """
+    from app.settings import api_settings
+
+    api_settings.server_workers = workers
+    temporary_dirs: List[str] = []
+    if workers > 1 and not api_settings.session_lock_dir:
+        api_settings.session_lock_dir = tempfile.mkdtemp(prefix="crew-session-locks-")
+        temporary_dirs.append(api_settings.session_lock_dir)
+    if workers > 1 and not _has_flock():
+        # Sem o lock entre processos, a fila write-behind e o cache de histórico de um worker
+        # não veem os turnos dos demais: ficam desligados, a menos que configurados explicitamente.
+        for setting_name, disabled_value in (("zep_write_behind_enabled", False), ("session_history_cache_max_bytes", 0)):
+            if setting_name not in api_settings.model_fields_set:
+                setattr(api_settings, setting_name, disabled_value)
+                logger_server.warning(f"flock indisponível com {workers} workers: {setting_name} desligado ({disabled_value}).")
+    for store_setting in ("job_store", "idempotency_store"):
+        # Em memória, um job só seria encontrado (e uma chave de idempotência só valeria) no worker que o recebeu.
+        if workers > 1 and store_setting not in api_settings.model_fields_set and getattr(api_settings, store_setting) == "memory":
+            setattr(api_settings, store_setting, "sqlite")
+            logger_server.warning(
+                f"{store_setting}=memory não é compartilhado entre os {workers} workers; usando sqlite "
+                f"({getattr(api_settings, store_setting + '_sqlite_path')}). Defina {store_setting.upper()} para escolher explicitamente."
+            )
+    if workers > 1:
+        if not api_settings.metrics_multiprocess_dir:
+            api_settings.metrics_multiprocess_dir = tempfile.mkdtemp(prefix="crew-metrics-")
+            temporary_dirs.append(api_settings.metrics_multiprocess_dir)
+        # Snapshots de uma execução anterior somariam contadores de processos que não existem mais.
+        for stale_snapshot in glob.glob(os.path.join(api_settings.metrics_multiprocess_dir, "worker-*.json")):
+            os.remove(stale_snapshot)
+    return temporary_dirs
+
+
+def main() -> None:
+    load_dotenv()
+    from app.settings import api_settings
+
+    workers = api_settings.server_workers or os.cpu_count() or 1
+    if not hasattr(os, "fork"):
+        from app.main import app
+
+        logger_server.warning("os.fork indisponível nesta plataforma; iniciando um único processo uvicorn.")
+        uvicorn.run(app, host=api_settings.server_host, port=api_settings.server_port)
+        return
+
+    temporary_dirs = configure_workers(workers)
+    from app.main import app
+
+    preload_crews()
+    server = PreforkServer(
+        app,
+        host=api_settings.server_host,
+        port=api_settings.server_port,
+        workers=workers,
+        backlog=api_settings.server_backlog,
+        max_memory_mib=api_settings.server_worker_max_memory_mib,
+        check_interval_seconds=api_settings.server_worker_check_interval_seconds,
+        graceful_timeout_seconds=api_settings.server_graceful_timeout_seconds,
+    )
+    try:
+        exit_code = server.run()
+    finally:
+        for directory in temporary_dirs:
+            shutil.rmtree(directory, ignore_errors=True)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
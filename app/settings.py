@@ -2,7 +2,7 @@
 # app/settings.py
 # Define as configurações da aplicação usando Pydantic BaseSettings.
 # ---------------------------------------------------------------------------
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 from pydantic import Field, field_validator, ValidationInfo # Uso de Field diretamente (Pydantic v2+)
 from pydantic_settings import BaseSettings
 
@@ -12,6 +12,222 @@ class ApiSettings(BaseSettings):
     docs_enabled: bool = True
     cors_origin_list: Optional[List[str]] = Field(None, validate_default=True)
 
+    # Orçamento de tempo (em segundos) para montar o contexto Zep antes do crew.
+    # Cada etapa recebe uma fração desse orçamento; leituras lentas são descartadas.
+    # As frações de ensure e user_message só limitam quanto o contexto espera: a
+    # criação de usuário/sessão e a gravação da mensagem do usuário terminam em
+    # segundo plano, e a resposta do assistente só é gravada depois delas.
+    zep_context_deadline_seconds: float = Field(2.5, gt=0)
+    zep_ensure_budget_fraction: float = Field(0.5, gt=0, le=1)
+    zep_user_message_budget_fraction: float = Field(0.5, gt=0, le=1)
+    zep_graph_search_budget_fraction: float = Field(1.0, gt=0, le=1)
+    zep_history_budget_fraction: float = Field(0.5, gt=0, le=1)
+
+    # Cache em processo de usuários/sessões já confirmados na Zep (0 desabilita).
+    zep_entity_cache_max_size: int = Field(10000, ge=0)
+    zep_entity_cache_ttl_seconds: float = Field(3600.0, gt=0)
+
+    # Cache do contexto da busca no grafo Zep (0 desabilita). Após uma escrita na
+    # memória do usuário, as entradas dele valem no máximo stale_after_write segundos.
+    graph_search_cache_max_size: int = Field(5000, ge=0)
+    graph_search_cache_ttl_seconds: float = Field(300.0, gt=0)
+    graph_search_cache_stale_after_write_seconds: float = Field(30.0, ge=0)
+
+    # Histórico recente por sessão mantido em processo (write-through): evita buscar
+    # get_session_messages a cada turno. Limitado em turnos por sessão e em memória
+    # total (LRU entre sessões; 0 desabilita). O cache é por processo: entre workers
+    # do servidor pre-fork, o lock de sessão entre processos (session_lock_dir) conta
+    # as escritas de cada sessão e o worker descarta a entrada quando outro escreveu
+    # nela. Entre réplicas (máquinas diferentes) não há esse controle: turnos
+    # gravados por outra réplica só aparecem depois do TTL.
+    session_history_cache_max_turns: int = Field(50, ge=0)
+    session_history_cache_max_bytes: int = Field(32 * 1024 * 1024, ge=0)
+    session_history_cache_ttl_seconds: float = Field(900.0, gt=0)
+
+    # Intervalo máximo sem eventos no stream SSE antes de enviar um keep-alive.
+    sse_keepalive_seconds: float = Field(15.0, gt=0)
+
+    # API de jobs assíncronos: workers de crew, profundidade máxima da fila
+    # (acima dela o POST /v1/jobs retorna 429) e armazenamento dos jobs. Com o
+    # servidor pre-fork e mais de um worker, sem valor explícito, o store passa a
+    # "sqlite" (em memória, GET/DELETE só encontrariam o job no worker que o recebeu).
+    job_workers: int = Field(4, ge=1)
+    job_max_queue_depth: int = Field(100, ge=1)
+    job_store: Literal["memory", "sqlite"] = "memory"
+    job_store_sqlite_path: str = "jobs.sqlite3"
+    job_result_ttl_seconds: float = Field(3600.0, gt=0)
+
+    # Ordenação por sessão: máximo de mensagens aguardando a mesma session_id
+    # (acima disso a requisição recebe 429) e agrupamento opcional de mensagens pendentes
+    # (só as que têm os mesmos parâmetros: crew, history_limit e overrides da busca).
+    # O lock e a contagem de espera são por processo; session_lock_dir (arquivos de lock
+    # flock) estende a serialização entre processos e é preenchido com um diretório
+    # temporário pelo servidor pre-fork quando há mais de um worker.
+    session_max_waiters: int = Field(8, ge=0)
+    session_coalescing_enabled: bool = False
+    session_lock_dir: str = ""
+
+    # Fila write-behind das escritas na Zep: a resposta do assistente (e, opcionalmente,
+    # a mensagem do usuário) é gravada em segundo plano, em lotes por sessão. A fila é
+    # por processo: com o servidor pre-fork e mais de um worker, o lock de sessão entre
+    # processos só é liberado depois que as mensagens pendentes da sessão chegam à Zep
+    # (o cliente já recebeu a resposta), então o próximo turno, em qualquer worker, as
+    # vê. Entre réplicas não há essa garantia.
+    zep_write_behind_enabled: bool = True
+    zep_write_behind_user_messages: bool = False
+    zep_write_behind_batch_size: int = Field(20, ge=1)
+    zep_write_behind_flush_interval_seconds: float = Field(0.2, gt=0)
+    zep_write_behind_max_pending: int = Field(10000, ge=1)
+    zep_write_behind_max_retries: int = Field(5, ge=0)
+    zep_write_behind_retry_base_seconds: float = Field(0.5, gt=0)
+    zep_write_behind_shutdown_timeout_seconds: float = Field(10.0, gt=0)
+
+    # Idempotência de /v1/create_crew/: respostas guardadas por chave (header
+    # Idempotency-Key). Opcionalmente, sem o header, requisições idênticas dentro da
+    # janela derivada reaproveitam a mesma execução (0, o padrão, desabilita). Cuidado:
+    # a chave derivada não distingue um reenvio de uma mensagem repetida de propósito
+    # ("sim", "ok"), que receberia a resposta anterior sem executar nem ir para a Zep.
+    # Como nos jobs, com mais de um worker e sem valor explícito o store passa a "sqlite".
+    idempotency_enabled: bool = True
+    idempotency_store: Literal["memory", "sqlite"] = "memory"
+    idempotency_store_sqlite_path: str = "idempotency.sqlite3"
+    idempotency_ttl_seconds: float = Field(86400.0, gt=0)
+    idempotency_max_entries: int = Field(10000, ge=1)
+    idempotency_derived_key_window_seconds: float = Field(0.0, ge=0)
+
+    # Prazo total de /v1/create_crew/ em segundos (0 = sem prazo): ao expirar, ou se o
+    # cliente desconectar, a execução do crew é cancelada. O header X-Request-Deadline
+    # pode pedir um prazo menor.
+    request_deadline_seconds: float = Field(0.0, ge=0)
+
+    # Controle de admissão das execuções de crews (por worker; síncronas, streaming,
+    # batch e jobs): limite de execuções simultâneas ajustado por AIMD pela latência
+    # observada entre min e max. Acima de admission_latency_tolerance vezes a linha de
+    # base, o limite cai por admission_backoff_ratio. Com o limite atingido, até
+    # admission_queue_size requisições síncronas esperam no máximo
+    # admission_queue_timeout_seconds; as demais recebem 503. Itens de batch e jobs
+    # esperam a vaga sem prazo, fora dessa fila.
+    admission_enabled: bool = True
+    admission_initial_limit: int = Field(8, ge=1)
+    admission_min_limit: int = Field(2, ge=1)
+    admission_max_limit: int = Field(64, ge=1)
+    admission_latency_tolerance: float = Field(2.0, gt=1)
+    admission_backoff_ratio: float = Field(0.9, gt=0, lt=1)
+    admission_queue_size: int = Field(16, ge=0)
+    admission_queue_timeout_seconds: float = Field(2.0, ge=0)
+
+    # Divisão justa entre tenants (user_id) no controle de admissão: a fila é atendida
+    # por enfileiramento justo ponderado (peso 1, ou tenant_weights[user_id]); cada
+    # tenant tem até tenant_max_concurrency execuções e tenant_max_queued requisições
+    # na fila (0 = sem limite próprio) e um token bucket de tenant_rate_limit_per_second
+    # (0 desabilita). Requisições acima dos limites do tenant recebem 429. As métricas
+    # crew_tenant_* usam o user_id como label só para os tenants de tenant_weights; os
+    # demais são somados em "other".
+    tenant_weights: Dict[str, float] = Field(default_factory=dict)
+    tenant_max_concurrency: int = Field(4, ge=0)
+    tenant_max_queued: int = Field(4, ge=0)
+    tenant_rate_limit_per_second: float = Field(0.0, ge=0)
+    tenant_rate_limit_burst: int = Field(10, ge=1)
+
+    # Compressão da resposta de /v1/create_crew/ (gzip, ou brotli se o pacote estiver
+    # instalado) para corpos a partir de min_bytes, se o cliente aceitar (0 desabilita).
+    # Corpos a partir de offload_min_bytes são comprimidos em uma thread, fora do event loop.
+    response_compression_min_bytes: int = Field(1024, ge=0)
+    response_compression_level: int = Field(5, ge=1, le=9)
+    response_compression_offload_min_bytes: int = Field(65536, ge=0)
+
+    # /v1/create_crew/batch: máximo de itens por chamada e itens executados em paralelo
+    # (padrão e teto do campo "concurrency" da requisição).
+    batch_max_items: int = Field(1000, ge=1)
+    batch_default_concurrency: int = Field(4, ge=1)
+    batch_max_concurrency: int = Field(16, ge=1)
+
+    # Cliente HTTP da Zep: pool de conexões, keep-alive, HTTP/2 opcional (requer o
+    # pacote h2), timeouts (o de leitura pode ser ajustado por operação) e retentativas
+    # com backoff exponencial e jitter, apenas para leituras.
+    zep_http_max_connections: int = Field(100, ge=1)
+    zep_http_max_keepalive_connections: int = Field(20, ge=0)
+    zep_http_keepalive_expiry_seconds: float = Field(30.0, gt=0)
+    zep_http2_enabled: bool = False
+    zep_http_connect_timeout_seconds: float = Field(3.0, gt=0)
+    zep_http_read_timeout_seconds: float = Field(10.0, gt=0)
+    zep_http_write_timeout_seconds: float = Field(10.0, gt=0)
+    zep_http_pool_timeout_seconds: float = Field(2.0, gt=0)
+    zep_http_operation_read_timeouts: Dict[str, float] = Field(
+        default_factory=lambda: {
+            "user.get": 3.0,
+            "memory.get_session": 3.0,
+            "memory.get_session_messages": 3.0,
+            "graph.search": 5.0,
+        }
+    )
+    zep_http_read_max_retries: int = Field(2, ge=0)
+    zep_http_retry_base_seconds: float = Field(0.2, gt=0)
+    zep_http_retry_max_seconds: float = Field(2.0, gt=0)
+
+    # Warm-up no startup: importa o executor de crews (crewai, crewai_tools, litellm),
+    # compila os templates e abre a conexão com a Zep. "blocking" só aceita tráfego
+    # depois dele; "background" sobe logo e /ready retorna 503 até terminar;
+    # "off" deixa tudo para a primeira requisição.
+    warmup_mode: Literal["blocking", "background", "off"] = "blocking"
+    warmup_zep_timeout_seconds: float = Field(5.0, gt=0)
+
+    # Servidor de produção pre-fork (python -m app.server): o processo mestre importa a
+    # aplicação e compila os templates uma vez e faz fork dos workers (0 = um por CPU).
+    # Workers que morrem ou passam de server_worker_max_memory_mib (memória privada,
+    # 0 desabilita) são substituídos. Estado em memória (caches, idempotência, jobs)
+    # é por worker; com mais de um worker, os stores de jobs e de idempotência não
+    # configurados explicitamente passam a SQLite. As métricas
+    # são agregadas entre workers por snapshots em metrics_multiprocess_dir (gravados a
+    # cada metrics_multiprocess_write_interval_seconds), preenchido com um diretório
+    # temporário pelo servidor pre-fork quando há mais de um worker.
+    server_host: str = "0.0.0.0"
+    server_port: int = Field(8000, ge=0, le=65535)
+    server_workers: int = Field(0, ge=0)
+    server_backlog: int = Field(2048, ge=1)
+    server_worker_max_memory_mib: float = Field(0.0, ge=0)
+    server_worker_check_interval_seconds: float = Field(5.0, gt=0)
+    server_graceful_timeout_seconds: float = Field(30.0, gt=0)
+    metrics_multiprocess_dir: str = ""
+    metrics_multiprocess_write_interval_seconds: float = Field(1.0, gt=0)
+
+    # Logging: registros vão para uma fila e são formatados/escritos por uma thread
+    # em segundo plano (o event loop não bloqueia em I/O). "json" emite uma linha JSON
+    # por registro; "text" mantém o formato legível. log_levels ajusta o nível por
+    # logger; log_sample_rates mantém só uma fração dos registros DEBUG/INFO de um
+    # logger (e filhos), ex.: {"uvicorn.access": 0.1}. Com a fila cheia, registros são
+    # descartados e contados em log_records_dropped_total.
+    log_format: Literal["json", "text"] = "json"
+    log_level: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] = "INFO"
+    log_levels: Dict[str, str] = Field(default_factory=lambda: {"httpx": "WARNING", "LiteLLM": "WARNING", "alembic": "WARNING"})
+    log_sample_rates: Dict[str, float] = Field(default_factory=dict)
+    log_queue_size: int = Field(10000, ge=1)
+
+    # Cache de completions do LLM (habilitado por crew na seção 'llm_cache' do
+    # config/runtime.yaml): "sqlite" é compartilhado entre workers e reinícios;
+    # "memory" é por worker. Limitado em entradas (as mais antigas saem primeiro).
+    llm_cache_store: Literal["memory", "sqlite"] = "sqlite"
+    llm_cache_sqlite_path: str = "llm_cache.sqlite3"
+    llm_cache_max_entries: int = Field(10000, ge=1)
+
+    # Ferramentas dos crews (ex.: SerperDevTool): resultados por consulta normalizada
+    # compartilhados entre requisições por tool_cache_ttl_seconds, chamadas idênticas
+    # concorrentes em uma só execução e limite de taxa por processo ao provedor
+    # (0 desabilita); acima de max_wait a chamada falha e o erro vai para o agente.
+    tool_cache_max_entries: int = Field(5000, ge=0)
+    tool_cache_ttl_seconds: float = Field(120.0, gt=0)
+    tool_rate_limit_per_second: float = Field(5.0, ge=0)
+    tool_rate_limit_burst: int = Field(10, ge=1)
+    tool_rate_limit_max_wait_seconds: float = Field(5.0, ge=0)
+
+    # Diretório dos índices da recuperação local (seção 'knowledge' do config/runtime.yaml
+    # de cada crew). Reconstruídos na compilação do crew quando as fontes mudam.
+    knowledge_index_dir: str = "knowledge_index"
+
+    # Saída verbose do CrewAI (raciocínio completo de agentes e crews no stdout).
+    # Útil em desenvolvimento; em produção custa CPU e I/O a cada requisição.
+    crew_verbose: bool = False
+
     @field_validator("cors_origin_list", mode="before")
     @classmethod
     def set_cors_origin_list(cls, cors_origin_list, info: ValidationInfo):
@@ -0,0 +1,95 @@
+# ---------------------------------------------------------------------------
+# app/warmup.py
+# Imports preguiçosos do executor de crews e warm-up do worker (imports,
+# templates compilados e conexão com a Zep) antes de reportar /ready.
+# ---------------------------------------------------------------------------
+import asyncio
+import importlib
+import logging
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from types import ModuleType
+from typing import Dict, Literal, Optional
+
+from app.settings import api_settings
+from crew.crew_templates import crew_templates
+from crew.zep_client import get_zep_client
+
+logger_warmup = logging.getLogger(__name__)
+
+WarmupStatus = Literal["pending", "running", "ready", "failed"]
+
+_CREW_EXECUTOR_MODULE = "crew.crew_executor"
+
+
+async def load_crew_executor() -> ModuleType:
+    """
+    Retorna crew.crew_executor, importando-o na primeira chamada.
+
+    O import puxa crewai, crewai_tools, litellm e chromadb (segundos de CPU), então
+    é feito numa thread para não travar o event loop quando o warm-up está desligado.
+    """
+    module = sys.modules.get(_CREW_EXECUTOR_MODULE)
+    if module is None:
+        module = await asyncio.to_thread(importlib.import_module, _CREW_EXECUTOR_MODULE)
+    return module
+
+
+@dataclass
+class WarmupState:
+    status: WarmupStatus = "pending"
+    step_seconds: Dict[str, float] = field(default_factory=dict)
+    warnings: Dict[str, str] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+warmup_state = WarmupState()
+
+
+async def _warm_zep_connection() -> None:
+    zep_client = get_zep_client()
+    if zep_client is None:
+        raise RuntimeError("cliente Zep não configurado")
+    # Chamada barata só para abrir a conexão HTTP (TLS incluído) do pool do cliente.
+    await asyncio.wait_for(zep_client.user.list_ordered(page_size=1), timeout=api_settings.warmup_zep_timeout_seconds)
+
+
+async def run_warmup(state: WarmupState = warmup_state) -> WarmupState:
+    """
+    Executa o warm-up e atualiza o estado exposto em /ready.
+
+    Falhas no import do executor ou na compilação dos templates deixam o worker
+    em "failed" (não pronto). A conexão com a Zep é só otimização: se falhar,
+    vira um aviso e as requisições seguem com os fallbacks do contexto Zep.
+    """
+    state.status = "running"
+    steps = (
+        ("import_crew_executor", load_crew_executor, True),
+        ("compile_crew_templates", lambda: asyncio.to_thread(crew_templates.compile_all), True),
+        ("zep_connection", _warm_zep_connection, False),
+    )
+    for step_name, step, required in steps:
+        start = time.perf_counter()
+        try:
+            await step()
+        except Exception as e:
+            if required:
+                logger_warmup.error(f"Falha no warm-up (etapa '{step_name}'): {e}", exc_info=True)
+                state.error = f"{step_name}: {e}"
+                state.status = "failed"
+                return state
+            logger_warmup.warning(f"Etapa opcional do warm-up '{step_name}' falhou: {e}")
+            state.warnings[step_name] = str(e)
+        finally:
+            state.step_seconds[step_name] = time.perf_counter() - start
+    state.status = "ready"
+    logger_warmup.info(f"Warm-up concluído: {state.step_seconds}")
+    return state
@@ -0,0 +1,261 @@
+# ---------------------------------------------------------------------------
+# benchmarks/bench_create_crew.py
+# Benchmark offline de ponta a ponta de /v1/create_crew/: sobe app.main:app no
+# próprio processo com um AsyncZep falso e um LLM stub e mede throughput,
+# latência (p50/p95/p99), lag do event loop e alocações por requisição.
+#
+# Uso: python -m benchmarks.bench_create_crew [--concurrency 1,8,32] [--requests 200]
+#          [--zep-latency-ms 40] [--llm-latency-ms 500] [--output resultado.json]
+#          [--baseline baseline.json]
+# ---------------------------------------------------------------------------
+import os
+
+# Antes de importar a aplicação: sem telemetria externa e com um token conhecido.
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("BEARER_TOKEN", "benchmark-token")
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.fakes import FakeAsyncZep, FakeLatency, FakeLLM
+from crew.crew_templates import crew_templates
+from crew.zep_client import set_zep_client
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(percentile / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class EventLoopLagProbe:
+    """Mede o atraso do event loop: quanto um asyncio.sleep(interval) passa do tempo pedido."""
+
+    def __init__(self, interval_seconds: float = 0.01):
+        self._interval_seconds = interval_seconds
+        self._lags_ms: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self._interval_seconds)
+            self._lags_ms.append(max(0.0, (time.perf_counter() - start - self._interval_seconds) * 1000))
+
+    def __enter__(self) -> "EventLoopLagProbe":
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._task.cancel()
+
+    def summary(self) -> Dict[str, float]:
+        lags = sorted(self._lags_ms)
+        return {
+            "loop_lag_mean_ms": statistics.fmean(lags) if lags else 0.0,
+            "loop_lag_p99_ms": _percentile(lags, 99),
+            "loop_lag_max_ms": lags[-1] if lags else 0.0,
+        }
+
+
+def _request_body(crew_name: str, run_id: str, index: int) -> Dict[str, Any]:
+    # Mensagem, usuário e sessão únicos: nada de replay por idempotência, cache ou lock de sessão.
+    return {
+        "crew_name": crew_name,
+        "message": f"Qual o status do pedido {run_id}-{index}?",
+        "user_id": f"bench-user-{run_id}-{index}",
+        "session_id": f"bench-session-{run_id}-{index}",
+    }
+
+
+async def _post(client: httpx.AsyncClient, body: Dict[str, Any], headers: Dict[str, str]) -> tuple:
+    start = time.perf_counter()
+    try:
+        response = await client.post("/v1/create_crew/", json=body, headers=headers)
+        status = response.status_code
+    except Exception as e:
+        status = type(e).__name__
+    return time.perf_counter() - start, status
+
+
+async def _run_level(client: httpx.AsyncClient, crew_name: str, concurrency: int, total_requests: int, headers: Dict[str, str]) -> Dict[str, Any]:
+    run_id = uuid.uuid4().hex[:8]
+    bodies = iter(_request_body(crew_name, run_id, index) for index in range(total_requests))
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    async def worker() -> None:
+        for body in bodies:
+            latency, status = await _post(client, body, headers)
+            latencies.append(latency)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    with EventLoopLagProbe() as probe:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "elapsed_s": elapsed,
+        "throughput_rps": total_requests / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies_ms, 50),
+        "p95_ms": _percentile(latencies_ms, 95),
+        "p99_ms": _percentile(latencies_ms, 99),
+        "max_ms": latencies_ms[-1] if latencies_ms else 0.0,
+        "error_rate": 1 - statuses.get("200", 0) / total_requests,
+        "status_counts": statuses,
+        **probe.summary(),
+    }
+
+
+async def _measure_allocations(client: httpx.AsyncClient, crew_name: str, samples: int, headers: Dict[str, str]) -> Dict[str, float]:
+    """Passada sequencial com tracemalloc: pico alocado e memória retida por requisição."""
+    run_id = uuid.uuid4().hex[:8]
+    gc.collect()
+    tracemalloc.start()
+    peaks_kib, retained_kib = [], []
+    for index in range(samples):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await _post(client, _request_body(crew_name, run_id, index), headers)
+        _, peak = tracemalloc.get_traced_memory()
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+        peaks_kib.append((peak - before) / 1024)
+        retained_kib.append((after - before) / 1024)
+    tracemalloc.stop()
+    return {
+        "samples": samples,
+        "peak_alloc_kib_per_request": statistics.fmean(peaks_kib) if peaks_kib else 0.0,
+        "retained_kib_per_request": statistics.fmean(retained_kib) if retained_kib else 0.0,
+    }
+
+
+def _install_fakes(args: argparse.Namespace) -> FakeAsyncZep:
+    fake_zep = FakeAsyncZep(
+        latency=FakeLatency(args.zep_latency_ms / 1000, args.zep_jitter_ms / 1000, args.zep_failure_rate),
+        graph_facts=args.graph_facts,
+        seed=args.seed,
+    )
+    set_zep_client(fake_zep)
+
+    fake_llm = FakeLLM(FakeLatency(args.llm_latency_ms / 1000, args.llm_jitter_ms / 1000, args.llm_failure_rate), seed=args.seed)
+    template = crew_templates.compile(args.crew_name)
+    # O template é compilado aqui, então o lifespan não recompila e as cópias herdam o LLM falso.
+    for template_agent in template.agents:
+        template_agent.llm = fake_llm
+        template_agent.verbose = args.crew_verbose
+    template.verbose = args.crew_verbose
+    return fake_zep
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    from app.main import app
+
+    # app.main configura o logging root em INFO ao ser importado.
+    logging.getLogger().setLevel(args.log_level)
+    fake_zep = _install_fakes(args)
+    headers = {"Authorization": f"Bearer {os.environ['BEARER_TOKEN']}"}
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            # Aquecimento: imports preguiçosos, caches internos do crewai e do pydantic.
+            await _run_level(client, args.crew_name, 1, args.warmup, headers)
+            for concurrency in levels:
+                result = await _run_level(client, args.crew_name, concurrency, args.requests, headers)
+                print(
+                    f"concorrência={concurrency:>4}  {result['throughput_rps']:8.2f} req/s  "
+                    f"p50={result['p50_ms']:8.1f}ms  p95={result['p95_ms']:8.1f}ms  p99={result['p99_ms']:8.1f}ms  "
+                    f"lag p99={result['loop_lag_p99_ms']:6.1f}ms  erros={result['error_rate']:.1%}",
+                    file=sys.stderr,
+                )
+                results.append(result)
+            allocations = await _measure_allocations(client, args.crew_name, args.alloc_samples, headers)
+
+    return {
+        "benchmark": "create_crew",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count()},
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+        "allocations": allocations,
+        "zep_calls": fake_zep.calls,
+    }
+
+
+def _compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Variação relativa (atual/baseline - 1) por nível de concorrência presente nos dois relatórios."""
+    baseline_by_level = {result["concurrency"]: result for result in baseline.get("results", [])}
+    comparison = {}
+    for result in report["results"]:
+        previous = baseline_by_level.get(result["concurrency"])
+        if previous is None:
+            continue
+        comparison[str(result["concurrency"])] = {
+            metric: (result[metric] / previous[metric] - 1) if previous.get(metric) else None
+            for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "loop_lag_p99_ms")
+        }
+    previous_allocations = baseline.get("allocations", {})
+    comparison["allocations"] = {
+        metric: (value / previous_allocations[metric] - 1) if previous_allocations.get(metric) else None
+        for metric, value in report["allocations"].items()
+        if metric != "samples"
+    }
+    return comparison
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark offline de /v1/create_crew/ com Zep e LLM falsos.")
+    parser.add_argument("--crew-name", default="basic")
+    parser.add_argument("--concurrency", default="1,8,32", help="Níveis de concorrência separados por vírgula.")
+    parser.add_argument("--requests", type=int, default=200, help="Requisições por nível de concorrência.")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--alloc-samples", type=int, default=20)
+    parser.add_argument("--zep-latency-ms", type=float, default=40.0)
+    parser.add_argument("--zep-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--zep-failure-rate", type=float, default=0.0)
+    parser.add_argument("--graph-facts", type=int, default=5)
+    parser.add_argument("--llm-latency-ms", type=float, default=500.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--crew-verbose", action="store_true", help="Mantém o verbose do crew (custo de I/O de log no kickoff).")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", help="Arquivo JSON para salvar o relatório.")
+    parser.add_argument("--baseline", help="Relatório JSON anterior para comparação.")
+    args = parser.parse_args()
+
+    report = asyncio.run(_run(args))
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as baseline_file:
+            report["comparison_to_baseline"] = _compare(report, json.load(baseline_file))
+
+    rendered = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(rendered)
+    print(rendered)
+
+
+if __name__ == "__main__":
+    main()
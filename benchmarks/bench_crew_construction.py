@@ -0,0 +1,78 @@
+# ---------------------------------------------------------------------------
+# benchmarks/bench_crew_construction.py
+# Compara o custo de construção do crew por requisição: montagem completa a
+# partir dos YAMLs (comportamento antigo) versus cópia do template compilado,
+# em tempo e em pico de alocação (a comparação mostra as duas diferenças).
+#
+# Uso: python -m benchmarks.bench_crew_construction [--iterations 200]
+# ---------------------------------------------------------------------------
+import argparse
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+from crew.basic_crew.crew import BasicCrew
+from crew.crew_templates import crew_templates
+
+
+def _measure(build: Callable[[], object], iterations: int) -> Dict[str, float]:
+    # Aquecimento para não contar imports preguiçosos e caches internos do crewai.
+    for _ in range(3):
+        build()
+
+    durations_ms = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        build()
+        durations_ms.append((time.perf_counter() - start) * 1000)
+
+    # Pico de memória alocada durante cada construção (alocações transitórias incluídas).
+    gc.collect()
+    tracemalloc.start()
+    peaks_kib = []
+    for _ in range(min(iterations, 50)):
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        build()
+        _, peak = tracemalloc.get_traced_memory()
+        peaks_kib.append((peak - baseline) / 1024)
+    tracemalloc.stop()
+
+    durations_ms.sort()
+    return {
+        "mean_ms": statistics.fmean(durations_ms),
+        "p50_ms": durations_ms[len(durations_ms) // 2],
+        "p95_ms": durations_ms[int(len(durations_ms) * 0.95) - 1],
+        "peak_alloc_kib_per_build": statistics.fmean(peaks_kib),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de construção do crew por requisição.")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    crew_templates.compile_all()
+    before = _measure(lambda: BasicCrew().crew(), args.iterations)
+    after = _measure(lambda: crew_templates.instantiate("basic"), args.iterations)
+    results = {
+        "antes (BasicCrew().crew())": before,
+        "depois (crew_templates.instantiate)": after,
+        "comparacao": {
+            "speedup_mean": before["mean_ms"] / after["mean_ms"],
+            "peak_alloc_delta_kib": after["peak_alloc_kib_per_build"] - before["peak_alloc_kib_per_build"],
+            # O ganho é de tempo (sem ler YAML nem passar pelos decoradores do CrewBase).
+            # Em alocação não há ganho: o Crew.copy do crewai serializa e revalida
+            # Crew, Agents e Tasks (model_dump + construtores pydantic), e a cópia ainda
+            # copia LLM e ferramentas para não compartilhar estado entre requisições.
+            "nota": "a cópia do template reduz o tempo de construção, não as alocações por requisição",
+        },
+    }
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# ---------------------------------------------------------------------------
+# benchmarks/bench_import_time.py
+# Relatório de custo de import da aplicação: tempo por módulo e por pacote
+# (python -X importtime) e memória residente do worker após o import de
+# app.main e após o warm-up.
+#
+# Uso: python -m benchmarks.bench_import_time [--module app.main] [--top 25]
+# ---------------------------------------------------------------------------
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+# Executado em um processo limpo: memória residente (pico) após cada fase.
+_RSS_SCRIPT = """
+import asyncio, json, resource, sys, time
+def rss_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+report = {"baseline_rss_mib": rss_mib()}
+start = time.perf_counter()
+__import__(sys.argv[1])
+report["import_seconds"] = time.perf_counter() - start
+report["import_rss_mib"] = rss_mib()
+if sys.argv[2] == "1":
+    from app.warmup import WarmupState, run_warmup
+    start = time.perf_counter()
+    state = asyncio.run(run_warmup(WarmupState()))
+    report["warmup_seconds"] = time.perf_counter() - start
+    report["warmup_status"] = state.status
+    report["warmup_step_seconds"] = state.step_seconds
+    report["warmup_rss_mib"] = rss_mib()
+print(json.dumps(report))
+"""
+
+
+def _child_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("OTEL_SDK_DISABLED", "true")
+    env.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+    return env
+
+
+def _import_times(module: str) -> List[Dict[str, Any]]:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=_child_env(), check=True,
+    )
+    entries = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append({
+                "module": name,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": len(indent) // 2,
+            })
+    return entries
+
+
+def _memory(module: str, warmup: bool) -> Dict[str, Any]:
+    completed = subprocess.run(
+        [sys.executable, "-c", _RSS_SCRIPT, module, "1" if warmup else "0"],
+        capture_output=True, text=True, env=_child_env(), check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Relatório de custo de import e memória do worker.")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--warmup", action=argparse.BooleanOptionalAction, default=True, help="Mede também o warm-up (import do executor e templates).")
+    parser.add_argument("--output", help="Arquivo JSON para salvar o relatório.")
+    args = parser.parse_args()
+
+    entries = _import_times(args.module)
+    # Tempo próprio somado por pacote de topo: quanto cada dependência custa no total.
+    by_package: Dict[str, float] = defaultdict(float)
+    for entry in entries:
+        by_package[entry["module"].split(".")[0]] += entry["self_ms"]
+    total_ms = next((entry["cumulative_ms"] for entry in entries if entry["module"] == args.module), 0.0)
+
+    report = {
+        "module": args.module,
+        "total_import_ms": total_ms,
+        "modules_imported": len(entries),
+        "top_packages_self_ms": dict(sorted(by_package.items(), key=lambda item: item[1], reverse=True)[: args.top]),
+        "top_modules_cumulative_ms": [
+            {"module": entry["module"], "cumulative_ms": entry["cumulative_ms"], "self_ms": entry["self_ms"]}
+            for entry in sorted(entries, key=lambda entry: entry["cumulative_ms"], reverse=True)[: args.top]
+        ],
+        "memory": _memory(args.module, args.warmup),
+    }
+    rendered = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(rendered)
+    print(rendered)
+
+
+if __name__ == "__main__":
+    main()
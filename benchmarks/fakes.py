@@ -0,0 +1,191 @@
+# ---------------------------------------------------------------------------
+# benchmarks/fakes.py
+# Backends falsos para benchmarks offline: um AsyncZep em memória e um LLM
+# stub, ambos com latência e taxa de falhas configuráveis.
+# ---------------------------------------------------------------------------
+import asyncio
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from crewai.llms.base_llm import BaseLLM
+from zep_cloud.errors import InternalServerError, NotFoundError
+from zep_cloud.types import EntityEdge, GraphSearchResults, Message, MessageListResponse, Session, User
+
+
+@dataclass
+class FakeLatency:
+    """Latência simulada de uma chamada: base_seconds ± jitter_seconds, falhando com failure_rate."""
+
+    base_seconds: float = 0.05
+    jitter_seconds: float = 0.01
+    failure_rate: float = 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        return max(0.0, self.base_seconds + rng.uniform(-self.jitter_seconds, self.jitter_seconds))
+
+    def should_fail(self, rng: random.Random) -> bool:
+        return self.failure_rate > 0 and rng.random() < self.failure_rate
+
+
+class _FakeZepBackend:
+    """Estado compartilhado pelos namespaces do FakeAsyncZep (usuários, sessões, mensagens)."""
+
+    def __init__(self, latency: FakeLatency, per_operation: Dict[str, FakeLatency], graph_facts: int, seed: Optional[int]):
+        self.latency = latency
+        self.per_operation = per_operation
+        self.graph_facts = graph_facts
+        self.rng = random.Random(seed)
+        self.users: Dict[str, User] = {}
+        self.sessions: Dict[str, Session] = {}
+        self.messages: Dict[str, List[Message]] = {}
+        self.calls: Dict[str, int] = {}
+
+    async def call(self, operation: str) -> None:
+        self.calls[operation] = self.calls.get(operation, 0) + 1
+        latency = self.per_operation.get(operation, self.latency)
+        await asyncio.sleep(latency.sample(self.rng))
+        if latency.should_fail(self.rng):
+            raise InternalServerError(body=f"falha simulada em {operation}")
+
+
+class _FakeUserClient:
+    def __init__(self, backend: _FakeZepBackend):
+        self._backend = backend
+
+    async def get(self, user_id: str, **kwargs) -> User:
+        await self._backend.call("user.get")
+        if user_id not in self._backend.users:
+            raise NotFoundError(body=f"usuário {user_id} não encontrado")
+        return self._backend.users[user_id]
+
+    async def add(self, *, user_id: str, email: Optional[str] = None, first_name: Optional[str] = None, **kwargs) -> User:
+        await self._backend.call("user.add")
+        user = User(user_id=user_id, email=email, first_name=first_name)
+        self._backend.users[user_id] = user
+        return user
+
+    async def list_ordered(self, *, page_size: Optional[int] = None, page_number: Optional[int] = None, **kwargs) -> SimpleNamespace:
+        await self._backend.call("user.list_ordered")
+        users = list(self._backend.users.values())[: page_size or None]
+        return SimpleNamespace(users=users, row_count=len(users), total_count=len(self._backend.users))
+
+
+class _FakeMemoryClient:
+    def __init__(self, backend: _FakeZepBackend):
+        self._backend = backend
+
+    async def get_session(self, session_id: str, **kwargs) -> Session:
+        await self._backend.call("memory.get_session")
+        if session_id not in self._backend.sessions:
+            raise NotFoundError(body=f"sessão {session_id} não encontrada")
+        return self._backend.sessions[session_id]
+
+    async def add_session(self, *, session_id: str, user_id: str, **kwargs) -> Session:
+        await self._backend.call("memory.add_session")
+        session = Session(session_id=session_id, user_id=user_id)
+        self._backend.sessions[session_id] = session
+        self._backend.messages.setdefault(session_id, [])
+        return session
+
+    async def add(self, session_id: str, *, messages: List[Message], **kwargs) -> SimpleNamespace:
+        await self._backend.call("memory.add")
+        if session_id not in self._backend.sessions:
+            raise NotFoundError(body=f"sessão {session_id} não encontrada")
+        created_at = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        self._backend.messages[session_id].extend(
+            message.copy(update={"uuid_": str(uuid.uuid4()), "created_at": created_at}) for message in messages
+        )
+        return SimpleNamespace(context=None)
+
+    async def get_session_messages(self, session_id: str, *, limit: Optional[int] = None, **kwargs) -> MessageListResponse:
+        await self._backend.call("memory.get_session_messages")
+        messages = self._backend.messages.get(session_id, [])
+        if limit:
+            messages = messages[-limit:]
+        return MessageListResponse(messages=list(messages), row_count=len(messages), total_count=len(messages))
+
+
+class _FakeGraphClient:
+    def __init__(self, backend: _FakeZepBackend):
+        self._backend = backend
+
+    async def search(self, *, query: str, user_id: Optional[str] = None, limit: Optional[int] = None, **kwargs) -> GraphSearchResults:
+        await self._backend.call("graph.search")
+        count = min(limit or self._backend.graph_facts, self._backend.graph_facts)
+        edges = [
+            EntityEdge(
+                uuid_=str(uuid.uuid4()),
+                name="RELACIONADO_A",
+                fact=f"{user_id} mencionou o assunto {index} ao perguntar sobre '{query[:40]}'",
+                source_node_uuid=f"node-{user_id}",
+                target_node_uuid=f"node-assunto-{index}",
+                created_at="2024-05-01T12:00:00Z",
+                valid_at="2024-05-01T12:00:00Z",
+            )
+            for index in range(count)
+        ]
+        return GraphSearchResults(edges=edges, nodes=None)
+
+
+class FakeAsyncZep:
+    """
+    Substituto do AsyncZep com os métodos usados pela API (user, memory e graph).
+
+    Cada operação dorme a latência configurada (default ou por operação, ex.:
+    per_operation={"graph.search": FakeLatency(0.2)}) e falha com
+    InternalServerError na taxa configurada, como um 5xx da Zep.
+    """
+
+    def __init__(
+        self,
+        latency: Optional[FakeLatency] = None,
+        per_operation: Optional[Dict[str, FakeLatency]] = None,
+        graph_facts: int = 5,
+        seed: Optional[int] = None,
+    ):
+        self._backend = _FakeZepBackend(latency or FakeLatency(), per_operation or {}, graph_facts, seed)
+        self.user = _FakeUserClient(self._backend)
+        self.memory = _FakeMemoryClient(self._backend)
+        self.graph = _FakeGraphClient(self._backend)
+
+    @property
+    def calls(self) -> Dict[str, int]:
+        return dict(self._backend.calls)
+
+
+class FakeLLMError(Exception):
+    """Falha simulada do provedor de LLM."""
+
+
+class FakeLLM(BaseLLM):
+    """
+    LLM stub para o CrewAI: bloqueia a thread do kickoff pela latência configurada
+    (como uma chamada síncrona ao provedor) e devolve uma resposta final fixa.
+    """
+
+    def __init__(self, latency: Optional[FakeLatency] = None, answer: str = "Resposta simulada para benchmark.", seed: Optional[int] = None):
+        super().__init__(model="fake/benchmark-llm")
+        self.latency = latency or FakeLatency(base_seconds=0.5, jitter_seconds=0.1)
+        self.answer = answer
+        self.stream = False
+        self._rng = random.Random(seed)
+
+    def call(self, messages: Any, tools: Any = None, callbacks: Any = None, available_functions: Any = None) -> str:
+        time.sleep(self.latency.sample(self._rng))
+        if self.latency.should_fail(self._rng):
+            raise FakeLLMError("falha simulada do LLM")
+        return f"Thought: I now can give a great answer\nFinal Answer: {self.answer}"
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return True
+
+    def get_context_window_size(self) -> int:
+        return 8192
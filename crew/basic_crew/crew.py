@@ -5,6 +5,8 @@
 from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task # type: ignore
 from crewai_tools import SerperDevTool
+from app.settings import api_settings
+from crew.tool_cache import cached_tool
 from typing import Dict, List # List é usado implicitamente por CrewBase para self.agents/self.tasks
 import logging
 
@@ -30,8 +32,8 @@ class BasicCrew():
             raise KeyError("Configuração para 'basic_agent' não encontrada em agents.yaml.")
         return Agent(
             config=self.agents_config['basic_agent'], 
-            tools=[SerperDevTool()], 
-            verbose=True, 
+            tools=[cached_tool(SerperDevTool())], 
+            verbose=api_settings.crew_verbose,
             memory=False, 
             allow_delegation=False,
             # inject_date=False # Removido para usar o default do Agent ou o que CrewAI decidir.
@@ -67,6 +69,6 @@ class BasicCrew():
             agents=self.agents, # Lista de instâncias de Agent (basic_agent)
             tasks=self.tasks,   # Lista de instâncias de Task (basic_task, já com o agent atribuído)
             process=Process.sequential, 
-            verbose=True, 
+            verbose=api_settings.crew_verbose,
             memory=False 
         )
@@ -0,0 +1,143 @@
+# ---------------------------------------------------------------------------
+# crew/cached_llm.py
+# LLM do CrewAI que consulta o cache de completions (crew/llm_cache.py)
+# antes de chamar o LLM real. Importado só ao compilar crews com o cache
+# habilitado no runtime.yaml.
+# ---------------------------------------------------------------------------
+import copy
+import logging
+from typing import Any, Dict, List, Optional, Union
+
+from crewai.llms.base_llm import BaseLLM
+from crewai.utilities.events import crewai_event_bus
+from crewai.utilities.events.llm_events import LLMStreamChunkEvent
+
+from crew.context_builder import estimate_tokens
+from crew.llm_cache import (
+    SAMPLING_PARAMS,
+    CachedCompletion,
+    CompletionStore,
+    completion_cache_key,
+    get_completion_store,
+    llm_cache_requests_total,
+    llm_cache_saved_tokens_total,
+)
+
+logger_cached_llm = logging.getLogger(__name__)
+
+# Marcadores do formato ReAct do CrewAI. O resultado de uma ferramenta volta ao
+# LLM anexado a uma mensagem do assistente (o prompt de sistema também cita
+# "Observation:", então só as mensagens do assistente são verificadas).
+_TOOL_OBSERVATION_MARKER = "Observation:"
+_FINAL_ANSWER_MARKER = "Final Answer:"
+
+_OWN_ATTRIBUTES = frozenset({"_inner", "_crew_name", "_ttl_seconds", "_store"})
+
+
+def _message_text(messages: Union[str, List[Dict[str, Any]]]) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(message.get("content") or "") for message in messages)
+
+
+def _has_tool_result(messages: Union[str, List[Dict[str, Any]]]) -> bool:
+    if isinstance(messages, str):
+        return False
+    return any(
+        message.get("role") == "assistant" and _TOOL_OBSERVATION_MARKER in str(message.get("content") or "")
+        for message in messages
+    )
+
+
+class CachedLLM(BaseLLM):
+    """
+    Envolve o LLM de um agente. Atributos (model, stop, stream...) são lidos e
+    escritos no LLM envolvido, então o CrewAI o trata como o LLM original.
+
+    O cache é ignorado quando ferramentas entram na conversa: chamadas com tools
+    (function calling) ou cujo prompt já contém o resultado de uma ferramenta não
+    são consultadas nem gravadas, e respostas que pedem uma ferramenta (sem
+    "Final Answer:") não são gravadas.
+    """
+
+    def __init__(self, inner: BaseLLM, crew_name: str, ttl_seconds: float, store: Optional[CompletionStore] = None):
+        object.__setattr__(self, "_inner", inner)
+        object.__setattr__(self, "_crew_name", crew_name)
+        object.__setattr__(self, "_ttl_seconds", ttl_seconds)
+        object.__setattr__(self, "_store", store)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in _OWN_ATTRIBUTES:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._inner, name, value)
+
+    def __copy__(self) -> "CachedLLM":
+        # Agent.copy faz uma cópia rasa do LLM por requisição (e depois ajusta stop/stream
+        # na cópia): o LLM envolvido também precisa ser copiado para não alterar o template.
+        return CachedLLM(copy.copy(self._inner), self._crew_name, self._ttl_seconds, self._store)
+
+    @property
+    def inner(self) -> BaseLLM:
+        return self._inner
+
+    # BaseLLM declara estes como atributos de classe, que teriam precedência sobre __getattr__.
+    @property
+    def temperature(self) -> Optional[float]:
+        return self._inner.temperature
+
+    @property
+    def stop(self) -> Optional[List[str]]:
+        return self._inner.stop
+
+    def _cache_key(self, messages: Union[str, List[Dict[str, Any]]]) -> str:
+        params = {name: getattr(self._inner, name, None) for name in SAMPLING_PARAMS}
+        return completion_cache_key(str(getattr(self._inner, "model", "")), messages, params)
+
+    def call(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None,
+    ) -> Union[str, Any]:
+        if tools or available_functions or _has_tool_result(messages):
+            llm_cache_requests_total.inc(crew_name=self._crew_name, outcome="bypass")
+            return self._inner.call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions)
+
+        store = self._store or get_completion_store()
+        key = self._cache_key(messages)
+        try:
+            cached = store.get(key)
+        except Exception as e:
+            logger_cached_llm.warning(f"Falha ao consultar o cache de completions: {e}")
+            cached = None
+        if cached is not None:
+            llm_cache_requests_total.inc(crew_name=self._crew_name, outcome="hit")
+            llm_cache_saved_tokens_total.inc(cached.tokens, crew_name=self._crew_name)
+            if getattr(self._inner, "stream", False):
+                # Clientes de streaming recebem a resposta em um único chunk.
+                crewai_event_bus.emit(self, event=LLMStreamChunkEvent(chunk=cached.text))
+            return cached.text
+
+        llm_cache_requests_total.inc(crew_name=self._crew_name, outcome="miss")
+        response = self._inner.call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions)
+        if isinstance(response, str) and _FINAL_ANSWER_MARKER in response:
+            completion = CachedCompletion(text=response, tokens=estimate_tokens(_message_text(messages)) + estimate_tokens(response))
+            try:
+                store.put(key, completion, self._ttl_seconds)
+            except Exception as e:
+                logger_cached_llm.warning(f"Falha ao gravar no cache de completions: {e}")
+        return response
+
+    def supports_function_calling(self) -> bool:
+        return self._inner.supports_function_calling()
+
+    def supports_stop_words(self) -> bool:
+        return self._inner.supports_stop_words()
+
+    def get_context_window_size(self) -> int:
+        return self._inner.get_context_window_size()
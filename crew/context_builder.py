@@ -0,0 +1,245 @@
+# ---------------------------------------------------------------------------
+# crew/context_builder.py
+# Modelo do contexto Zep (fatos do grafo e turnos do histórico) e montagem do
+# texto enviado ao LLM dentro de um orçamento de tokens por crew.
+# ---------------------------------------------------------------------------
+import asyncio
+import math
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Literal, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, Field
+
+# Placeholders usados quando uma etapa falha ou estoura o orçamento de tempo
+GRAPH_CONTEXT_UNAVAILABLE = "Contexto da Busca no Grafo Zep indisponível."
+HISTORY_CONTEXT_UNAVAILABLE = "Histórico da sessão Zep indisponível."
+
+# Estimativa conservadora para português (tokenizers BPE ficam entre 3,5 e 4 caracteres por token).
+_CHARS_PER_TOKEN = 3.5
+
+ContextRenderMode = Literal["compact", "verbose"]
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa barata do número de tokens de um texto, sem depender do tokenizer do modelo."""
+    return math.ceil(len(text) / _CHARS_PER_TOKEN) if text else 0
+
+
+@dataclass(frozen=True)
+class GraphNode:
+    name: Optional[str]
+    uuid: str
+    labels: Tuple[str, ...]
+    summary: Optional[str]
+    attributes: Tuple[Tuple[str, str], ...]
+
+
+@dataclass(frozen=True)
+class GraphFact:
+    fact: Optional[str]
+    relation: Optional[str]
+    source_node_uuid: Optional[str]
+    target_node_uuid: Optional[str]
+    valid_at: Optional[str]
+    invalid_at: Optional[str]
+
+
+@dataclass(frozen=True)
+class GraphSearchResult:
+    """Resultado da busca no grafo já convertido, na ordem do reranker. Imutável para ser compartilhado em cache."""
+    query: str
+    scope: str
+    reranker: str
+    limit: int
+    nodes: Tuple[GraphNode, ...] = ()
+    facts: Tuple[GraphFact, ...] = ()
+
+
+@dataclass(frozen=True)
+class HistoryTurn:
+    role: str
+    content: str
+    created_at: Optional[datetime]  # No fuso de São Paulo; None se a Zep não informou ou não foi possível parsear
+    raw_timestamp: Optional[str] = None
+
+    def timestamp(self, compact: bool) -> str:
+        if self.created_at is None:
+            return self.raw_timestamp or "Timestamp indisponível"
+        return self.created_at.strftime("%d/%m %H:%M" if compact else "%d/%m/%Y %H:%M:%S %Z%z")
+
+
+@dataclass
+class ZepContext:
+    """
+    Resultado da montagem do contexto Zep para uma requisição.
+    graph/history valem None quando a etapa correspondente falhou ou estourou o deadline.
+    user_message_saved é a gravação da mensagem do usuário, que pode terminar depois
+    do deadline (crew/zep_context.py:user_message_persisted).
+    """
+    graph: Optional[GraphSearchResult]
+    history: Optional[Tuple[HistoryTurn, ...]]
+    history_limit: int
+    user_message_saved: Optional["asyncio.Future[bool]"] = None
+
+    def render(self) -> str:
+        """Renderização completa (sem orçamento), no layout detalhado."""
+        return ContextBuilder(ContextBudget(max_tokens=0, render_mode="verbose")).build(self)
+
+
+class ContextBudget(BaseModel):
+    """
+    Orçamento do contexto Zep de um crew (seção 'context' do config/runtime.yaml).
+    max_tokens igual a 0 desabilita o corte.
+    """
+    max_tokens: int = Field(1500, ge=0)
+    graph_share: float = Field(0.5, ge=0, le=1)
+    render_mode: ContextRenderMode = "compact"
+    max_turn_chars: int = Field(800, ge=0)
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + "…"
+
+
+def _date_only(timestamp: Optional[str]) -> Optional[str]:
+    """Reduz timestamps ISO ('2024-05-01T12:00:00Z') à data, suficiente para o modo compacto."""
+    return timestamp[:10] if timestamp else None
+
+
+class ContextBuilder:
+    """
+    Transforma um ZepContext no texto do input 'zep_context', respeitando o orçamento:
+
+    - fatos do grafo mantêm a ordem do reranker; fatos repetidos são removidos e
+      fatos já invalidados (invalid_at) vão para o fim da fila;
+    - o histórico prioriza os turnos mais recentes, mas é exibido em ordem cronológica,
+      e cada turno é limitado a max_turn_chars caracteres;
+    - o grafo recebe graph_share do orçamento, o histórico o restante, e o que sobrar
+      de um lado é aproveitado pelo outro.
+
+    O modo 'compact' omite UUIDs, parâmetros da busca e rótulos repetidos; o modo
+    'verbose' mantém o layout detalhado original.
+    """
+
+    def __init__(self, budget: ContextBudget):
+        self.budget = budget
+
+    def build(self, zep_context: ZepContext) -> str:
+        compact = self.budget.render_mode == "compact"
+        graph_header, graph_footer, graph_lines = self._graph_section(zep_context.graph, compact)
+        history_header, history_footer, history_lines = self._history_section(
+            zep_context.history, zep_context.history_limit, compact
+        )
+
+        if self.budget.max_tokens > 0:
+            fixed_cost = sum(estimate_tokens(line) for line in (graph_header, graph_footer, history_header, history_footer) if line)
+            available = max(0, self.budget.max_tokens - fixed_cost)
+            graph_costs = [estimate_tokens(line) for line in graph_lines]
+            history_costs = [estimate_tokens(line) for line in history_lines]
+
+            # Histórico: mais recentes primeiro. Grafo: ordem do ranking.
+            graph_selected: List[int] = []
+            graph_used = self._fill(graph_costs, range(len(graph_lines)), int(available * self.budget.graph_share), graph_selected)
+            history_selected: List[int] = []
+            history_used = self._fill(history_costs, reversed(range(len(history_lines))), available - graph_used, history_selected)
+            self._fill(graph_costs, range(len(graph_lines)), available - graph_used - history_used, graph_selected, graph_used)
+
+            graph_lines = [graph_lines[index] for index in sorted(graph_selected)]
+            history_lines = [history_lines[index] for index in sorted(history_selected)]
+
+        sections = []
+        for header, lines, footer in ((graph_header, graph_lines, graph_footer), (history_header, history_lines, history_footer)):
+            sections.append("\n".join(part for part in (header, *lines, footer) if part))
+        return "\n\n".join(sections)
+
+    @staticmethod
+    def _fill(costs: Sequence[int], order, budget: int, selected: List[int], used: int = 0) -> int:
+        """Seleciona itens na ordem dada enquanto couberem no orçamento (itens grandes demais são pulados)."""
+        total = used
+        limit = used + budget
+        for index in order:
+            if index in selected:
+                continue
+            if total + costs[index] <= limit:
+                selected.append(index)
+                total += costs[index]
+        return total - used
+
+    def _graph_section(self, graph: Optional[GraphSearchResult], compact: bool) -> Tuple[str, str, List[str]]:
+        if graph is None:
+            return GRAPH_CONTEXT_UNAVAILABLE, "", []
+
+        if compact:
+            header, footer = "Memória de longo prazo (fatos do grafo Zep):", ""
+            empty_line = "- Nenhum fato relevante encontrado."
+        else:
+            header = (
+                f"--- Início Contexto da Busca no Grafo Zep (Query utilizada: '{graph.query}', "
+                f"Scope: {graph.scope}, Reranker: {graph.reranker}, Limit: {graph.limit}) ---"
+            )
+            footer = "--- Fim Contexto da Busca no Grafo Zep ---"
+            empty_line = "Nenhum resultado relevante (nó ou aresta) encontrado na busca do grafo Zep com os parâmetros especificados."
+
+        lines = [self._render_node(node, compact) for node in graph.nodes]
+        seen_facts = set()
+        valid_facts, invalidated_facts = [], []
+        for fact in graph.facts:
+            fact_key = (fact.fact or "").strip().casefold()
+            if fact_key in seen_facts:
+                continue
+            seen_facts.add(fact_key)
+            (invalidated_facts if fact.invalid_at else valid_facts).append(fact)
+        lines.extend(self._render_fact(fact, compact) for fact in valid_facts + invalidated_facts)
+        if not lines:
+            lines = [empty_line]
+        return header, footer, lines
+
+    @staticmethod
+    def _render_node(node: GraphNode, compact: bool) -> str:
+        if compact:
+            summary = f": {node.summary}" if node.summary else ""
+            labels = f" ({', '.join(label for label in node.labels if label != 'Entity')})" if any(label != "Entity" for label in node.labels) else ""
+            return f"- {node.name or 'Sem Nome'}{labels}{summary}"
+        labels = ", ".join(node.labels) if node.labels else "N/A"
+        attributes_str = ", ".join(f"{k}: {v}" for k, v in node.attributes) if node.attributes else "Nenhum"
+        return (
+            f"  - Nó: {node.name or 'Sem Nome'} (UUID: {node.uuid})\n"
+            f"    Rótulos: {labels}\n"
+            f"    Resumo: {node.summary or 'Nenhum resumo.'}\n"
+            f"    Atributos: {attributes_str}"
+        )
+
+    @staticmethod
+    def _render_fact(fact: GraphFact, compact: bool) -> str:
+        if compact:
+            valid_from, valid_until = _date_only(fact.valid_at), _date_only(fact.invalid_at)
+            period = ""
+            if valid_until:
+                period = f" (de {valid_from or '?'} até {valid_until})"
+            elif valid_from:
+                period = f" (desde {valid_from})"
+            return f"- {fact.fact or 'N/A'}{period}"
+        return (
+            f"  - Fato: {fact.fact or 'N/A'} (Relação: {fact.relation or 'N/A'})\n"
+            f"    De: {fact.source_node_uuid} Para: {fact.target_node_uuid}\n"
+            f"    Válido de: {fact.valid_at or 'N/A'} até {fact.invalid_at or 'Presente'}"
+        )
+
+    def _history_section(self, history: Optional[Tuple[HistoryTurn, ...]], history_limit: int, compact: bool) -> Tuple[str, str, List[str]]:
+        if history is None:
+            return HISTORY_CONTEXT_UNAVAILABLE, "", []
+
+        if compact:
+            header, footer = "Histórico recente da sessão (horário de São Paulo):", ""
+        else:
+            header = f"--- Início Histórico Recente da Sessão Zep (últimas {history_limit} mensagens, Fuso Horário de São Paulo) ---"
+            footer = "--- Fim Histórico Recente da Sessão Zep ---"
+
+        max_chars = self.budget.max_turn_chars
+        lines = [f"  [{turn.timestamp(compact)}] {turn.role}: {_truncate(turn.content, max_chars)}" for turn in history]
+        if not lines:
+            lines = ["Nenhum histórico de mensagens encontrado para esta sessão na Zep."]
+        return header, footer, lines
@@ -0,0 +1,73 @@
+# ---------------------------------------------------------------------------
+# crew/crew_events.py
+# Encaminha eventos do event bus do CrewAI (tokens do LLM, uso de ferramentas,
+# início do crew) para a requisição que disparou o kickoff.
+# ---------------------------------------------------------------------------
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from crewai.utilities.events import (
+    CrewKickoffStartedEvent,
+    LLMStreamChunkEvent,
+    ToolUsageStartedEvent,
+    crewai_event_bus,
+)
+
+logger_crew_events = logging.getLogger(__name__)
+
+CrewEvent = Tuple[str, Dict[str, Any]]
+
+
+class CrewEventStream:
+    """
+    Fila de eventos de uma execução de crew.
+
+    O kickoff roda em uma thread (Crew.kickoff_async usa asyncio.to_thread), e o
+    event bus do CrewAI chama os handlers nessa thread. Como to_thread copia o
+    contexto (contextvars) da task que o chamou, os handlers globais abaixo
+    descobrem a qual requisição o evento pertence via _current_event_stream e
+    entregam o evento ao event loop de forma thread-safe.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self.queue: "asyncio.Queue[CrewEvent]" = asyncio.Queue()
+
+    def publish(self, event_name: str, data: Dict[str, Any]) -> None:
+        self._loop.call_soon_threadsafe(self.queue.put_nowait, (event_name, data))
+
+    @contextmanager
+    def bind(self) -> Iterator["CrewEventStream"]:
+        """Associa este stream às tasks/threads criadas dentro do bloco."""
+        token = _current_event_stream.set(self)
+        try:
+            yield self
+        finally:
+            _current_event_stream.reset(token)
+
+
+_current_event_stream: ContextVar[Optional[CrewEventStream]] = ContextVar("crew_event_stream", default=None)
+
+
+@crewai_event_bus.on(CrewKickoffStartedEvent)
+def _on_crew_kickoff_started(source: Any, event: CrewKickoffStartedEvent) -> None:
+    event_stream = _current_event_stream.get()
+    if event_stream:
+        event_stream.publish("crew_started", {"crew_name": event.crew_name})
+
+
+@crewai_event_bus.on(ToolUsageStartedEvent)
+def _on_tool_usage_started(source: Any, event: ToolUsageStartedEvent) -> None:
+    event_stream = _current_event_stream.get()
+    if event_stream:
+        event_stream.publish("tool_call", {"tool_name": event.tool_name, "tool_args": event.tool_args})
+
+
+@crewai_event_bus.on(LLMStreamChunkEvent)
+def _on_llm_stream_chunk(source: Any, event: LLMStreamChunkEvent) -> None:
+    event_stream = _current_event_stream.get()
+    if event_stream and event.chunk and event.tool_call is None:
+        event_stream.publish("token", {"text": event.chunk})
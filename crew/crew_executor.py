@@ -2,102 +2,238 @@
 # crew/crew_executor.py
 # Orquestra a execução do CrewAI com a integração da memória Zep.
 # ---------------------------------------------------------------------------
-from crew.basic_crew.crew import BasicCrew
-from crew.zep_client import zep_client
-from zep_cloud.types import Message as ZepMessage, RoleType # Importa RoleType para melhor tipagem
-from zep_cloud.errors import NotFoundError
-from crewai.project import CrewBase # Para tipagem de available_crews
+from app.settings import api_settings
+from crew.context_builder import ZepContext, estimate_tokens
+from crew.crew_events import CrewEvent, CrewEventStream
+from crew.crew_metrics import (
+    crew_kickoffs_in_flight,
+    observe_stage,
+    crew_prompt_context_tokens,
+    crew_requests_in_flight,
+    crew_requests_total,
+    record_token_usage,
+    track_in_flight,
+    track_stage,
+)
+from crew.crew_templates import crew_templates
+from crew.knowledge_index import KNOWLEDGE_CONTEXT_EMPTY, knowledge_retrieval_total, render_knowledge_context
+from crew.run_cancellation import RunCancellation
+from crew.session_ordering import SessionCoalescer, SessionLocks
+from crew.zep_client import get_zep_client
+from crew.zep_context import (
+    ZepSearchScope,
+    ZepReranker,
+    SAO_PAULO_TZ,
+    assemble_zep_context,
+    graph_search_cache,
+    pending_user_turn_writes,
+    remember_history_message,
+    session_history_cache,
+    user_message_persisted,
+    zep_write_behind,
+)
+from zep_cloud.types import Message as ZepMessage
+import asyncio
 import logging
-from typing import Optional, Literal, Any, Dict, Type # Adicionado Type
+import time
+from contextlib import aclosing
+from typing import Optional, Any, AsyncIterator, Awaitable, Dict, List, Tuple
 from datetime import datetime
-import pytz
 
 # O logging.basicConfig foi movido para app/main.py para centralização.
 # Se precisar de configuração específica para este módulo, use logging.getLogger.
 logger = logging.getLogger(__name__)
 
-ZepSearchScope = Literal["edges", "nodes"]
-ZepReranker = Literal["rrf", "mmr", "node_distance", "episode_mentions", "cross_encoder"]
+# Marcador colocado na fila de eventos quando o kickoff termina
+_KICKOFF_DONE = ("__kickoff_done__", {})
 
-# Define o fuso horário de São Paulo
-SAO_PAULO_TZ = pytz.timezone("America/Sao_Paulo")
 
-async def format_graph_search_results_to_context(search_results, scope: str, reranker: str, limit: int, query: str) -> str:
+def _session_release_barrier(session_id: str) -> Optional[Awaitable[None]]:
     """
-    Formata os resultados da busca no grafo Zep em uma string de contexto.
+    Escritas que o próximo turno da sessão precisa ver (a resposta ao cliente não as espera):
+
+    - a mensagem do usuário, que não é limitada pelo deadline do contexto e pode seguir
+      em andamento se o turno terminou antes (ex.: falha no crew);
+    - com o lock entre processos, a fila write-behind: o próximo turno pode rodar em
+      outro worker, que não vê a fila deste.
     """
-    context_parts = [
-        f"--- Início Contexto da Busca no Grafo Zep (Query utilizada: '{query}', Scope: {scope}, Reranker: {reranker}, Limit: {limit}) ---"
-    ]
-    found_results = False
-    if search_results:
-        if hasattr(search_results, 'nodes') and search_results.nodes:
-            found_results = True
-            context_parts.append("Nós Relevantes Encontrados:")
-            for node in search_results.nodes:
-                labels = ", ".join(node.labels) if node.labels else "N/A"
-                attributes_str = ", ".join([f"{k}: {v}" for k, v in node.attributes.items()]) if node.attributes else "Nenhum"
-                context_parts.append(
-                    f"  - Nó: {node.name or 'Sem Nome'} (UUID: {node.uuid})\n"
-                    f"    Rótulos: {labels}\n"
-                    f"    Resumo: {node.summary or 'Nenhum resumo.'}\n"
-                    f"    Atributos: {attributes_str}"
-                )
-            context_parts.append("")
-
-        if hasattr(search_results, 'edges') and search_results.edges:
-            found_results = True
-            context_parts.append("Fatos/Relações Relevantes Encontrados:")
-            for edge in search_results.edges:
-                context_parts.append(
-                    f"  - Fato: {edge.fact or 'N/A'} (Relação: {edge.name or 'N/A'})\n"
-                    f"    De: {edge.source_node_uuid} Para: {edge.target_node_uuid}\n"
-                    f"    Válido de: {edge.valid_at or 'N/A'} até {edge.invalid_at or 'Presente'}"
-                )
-            context_parts.append("")
-
-    if not found_results:
-        context_parts.append("Nenhum resultado relevante (nó ou aresta) encontrado na busca do grafo Zep com os parâmetros especificados.")
-
-    context_parts.append("--- Fim Contexto da Busca no Grafo Zep ---")
-    return "\n".join(context_parts)
-
-async def format_session_messages_to_context(session_messages_response, history_limit: int) -> str:
+    user_turn_writes = pending_user_turn_writes(session_id)
+    if user_turn_writes or (session_locks.cross_process and zep_write_behind.pending_count(session_id)):
+        return _finish_session_writes(session_id, user_turn_writes)
+    return None
+
+
+async def _finish_session_writes(session_id: str, user_turn_writes: List["asyncio.Task[bool]"]) -> None:
+    await asyncio.gather(*user_turn_writes, return_exceptions=True)
+    # A mensagem do usuário pode ter entrado na fila write-behind só agora.
+    if session_locks.cross_process and zep_write_behind.pending_count(session_id):
+        await zep_write_behind.flush_session(session_id)
+
+
+# Ordenação por sessão: turnos da mesma session_id rodam em sequência. Entre workers, a
+# geração do lock invalida o histórico em cache quando outro worker escreveu na sessão.
+session_locks = SessionLocks(
+    max_waiters=api_settings.session_max_waiters,
+    lock_dir=api_settings.session_lock_dir or None,
+    release_barrier=_session_release_barrier,
+    on_file_lock=session_history_cache.observe_generation,
+    on_file_unlock=session_history_cache.set_generation,
+)
+session_coalescer = SessionCoalescer(session_locks)
+
+
+def validate_crew_request(crew_name: str) -> None:
     """
-    Formata as mensagens da sessão Zep em uma string de contexto, com timestamps no fuso de São Paulo.
+    Validações feitas antes de qualquer chamada à Zep ou ao LLM.
+    Lança ValueError (mapeado para HTTP 400 pelos endpoints).
     """
-    context_parts = [f"--- Início Histórico Recente da Sessão Zep (últimas {history_limit} mensagens, Fuso Horário de São Paulo) ---"]
+    if not get_zep_client():
+        logger.error("Cliente Zep não inicializado. Verifique a ZEP_API_KEY.")
+        raise ValueError("Cliente Zep não está configurado, impossível executar o crew com memória.")
 
-    if session_messages_response and session_messages_response.messages:
-        for msg in session_messages_response.messages:
-            timestamp_str = "Timestamp indisponível"
-            if msg.created_at:
-                try:
-                    # Python 3.7+ datetime.fromisoformat lida com 'Z'
-                    dt_utc = datetime.fromisoformat(msg.created_at.replace("Z", "+00:00"))
-                    dt_sao_paulo = dt_utc.astimezone(SAO_PAULO_TZ)
-                    timestamp_str = dt_sao_paulo.strftime("%d/%m/%Y %H:%M:%S %Z%z")
-                except ValueError:
-                    logger.warning(f"Não foi possível parsear o timestamp: {msg.created_at}")
-                    timestamp_str = msg.created_at  # Mantém original se falhar
-
-            role_display = "Desconhecido"
-            # Lógica de role_display aprimorada
-            if hasattr(msg, 'role') and msg.role:
-                role_display = msg.role.capitalize()
-            elif hasattr(msg, 'role_type') and msg.role_type:
-                # Se role_type for um enum (como zep_cloud.types.RoleType), acesse .value
-                if isinstance(msg.role_type, RoleType) and hasattr(msg.role_type, 'value'):
-                    role_display = msg.role_type.value.capitalize()
-                else: # Caso contrário, tente converter para string
-                    role_display = str(msg.role_type).capitalize()
-
-            context_parts.append(f"  [{timestamp_str}] {role_display}: {msg.content}")
-    else:
-        context_parts.append("Nenhum histórico de mensagens encontrado para esta sessão na Zep.")
+    if not crew_templates.is_registered(crew_name):
+        logger.error(f"Crew com nome '{crew_name}' não encontrado.")
+        raise ValueError(f"Crew '{crew_name}' não é um tipo de crew válido.")
+
+
+async def _prepare_crew_inputs(
+    crew_name: str,
+    inputs: dict,
+    user_id: str,
+    session_id: str,
+    history_limit: Optional[int],
+    zep_graph_search_scope_override: Optional[ZepSearchScope],
+    zep_graph_search_reranker_override: Optional[ZepReranker],
+    zep_graph_search_limit_override: Optional[int],
+) -> Tuple[Dict[str, Any], ZepContext]:
+    """Monta o contexto Zep e os inputs do crew para a mensagem atual (retorna também o ZepContext)."""
+    user_message_content = inputs.get("message")
+    if not user_message_content:
+        raise ValueError("Campo 'message' é obrigatório nos inputs.")
+
+    # Parâmetros padrão para busca no grafo Zep
+    zep_graph_search_scope: ZepSearchScope = "edges"
+    zep_graph_search_reranker: ZepReranker = "rrf"
+    zep_graph_search_limit: int = 5
+
+    # Aplicar overrides se fornecidos
+    if zep_graph_search_scope_override:
+        zep_graph_search_scope = zep_graph_search_scope_override
+    if zep_graph_search_reranker_override:
+        zep_graph_search_reranker = zep_graph_search_reranker_override
+    if zep_graph_search_limit_override:
+        zep_graph_search_limit = zep_graph_search_limit_override
+
+    current_history_limit = history_limit if isinstance(history_limit, int) and history_limit > 0 else 10
+
+    # Blocos 1-3: garantir usuário/sessão, gravar a mensagem do usuário e recuperar
+    # o contexto (grafo + histórico) em um pipeline concorrente com deadline.
+    metric_crew_name = crew_name.lower()
+    with track_stage("zep.context_assembly", metric_crew_name):
+        zep_context_result = await assemble_zep_context(
+            get_zep_client(),
+            user_id=user_id,
+            session_id=session_id,
+            message=user_message_content,
+            history_limit=current_history_limit,
+            scope=zep_graph_search_scope,
+            reranker=zep_graph_search_reranker,
+            limit=zep_graph_search_limit,
+            crew_name=metric_crew_name,
+        )
 
-    context_parts.append("--- Fim Histórico Recente da Sessão Zep ---")
-    return "\n".join(context_parts)
+    # Obter data e hora atuais no fuso de São Paulo
+    now_sao_paulo = datetime.now(SAO_PAULO_TZ)
+    # Com o cache de completions, o runtime.yaml pode usar um formato mais grosso para que prompts repetidos sejam iguais.
+    llm_cache_config = crew_templates.llm_cache_config(crew_name)
+    datetime_format = (llm_cache_config.enabled and llm_cache_config.datetime_format) or "%d/%m/%Y %H:%M:%S %Z%z"
+    current_datetime_sp_str = now_sao_paulo.strftime(datetime_format)
+    logger.debug("Data/Hora Atual (São Paulo) para o agente: %s", current_datetime_sp_str)
+
+    # Contexto cortado e renderizado conforme o orçamento do crew (config/runtime.yaml).
+    with track_stage("context.build", metric_crew_name):
+        zep_context = crew_templates.context_builder(crew_name).build(zep_context_result)
+    zep_context_tokens = estimate_tokens(zep_context)
+    crew_prompt_context_tokens.observe(zep_context_tokens, crew_name=metric_crew_name)
+
+    # Trechos da documentação local (índice BM25 em mmap; poucos ms, sem I/O de rede).
+    knowledge_context = KNOWLEDGE_CONTEXT_EMPTY
+    knowledge_index = crew_templates.knowledge_index(crew_name)
+    if knowledge_index is not None:
+        knowledge_config = crew_templates.knowledge_config(crew_name)
+        with track_stage("knowledge.retrieval", metric_crew_name):
+            snippets = knowledge_index.search(user_message_content, knowledge_config.top_k, knowledge_config.min_score)
+            knowledge_context = render_knowledge_context(snippets, knowledge_config.max_tokens)
+        knowledge_retrieval_total.inc(crew_name=metric_crew_name, outcome="hit" if snippets else "empty")
+
+    crew_inputs_for_selected_crew = {
+        "message": user_message_content,
+        "zep_context": zep_context,
+        "knowledge_context": knowledge_context,
+        "current_datetime_sp": current_datetime_sp_str # Adiciona data/hora ao input do crew
+    }
+
+    # Argumentos preguiçosos e sem o conteúdo da mensagem: o log roda a cada requisição.
+    logger.info(
+        "Iniciando Crew '%s' (mensagem com %d caracteres, contexto_zep_len=%d, contexto_zep_tokens_est=%d).",
+        crew_name, len(user_message_content or ""), len(zep_context), zep_context_tokens,
+        extra={"crew_name": crew_name, "session_id": session_id},
+    )
+    return crew_inputs_for_selected_crew, zep_context_result
+
+
+def crew_output_to_text(crew_result_text: Any) -> str:
+    """Converte o retorno do kickoff (CrewOutput, str ou outro) em texto."""
+    converted_result_text = ""
+    if crew_result_text is not None:
+        if hasattr(crew_result_text, 'raw') and isinstance(crew_result_text.raw, str):
+            converted_result_text = crew_result_text.raw
+        elif isinstance(crew_result_text, str):
+            converted_result_text = crew_result_text
+        else:
+            try:
+                converted_result_text = str(crew_result_text)
+            except Exception as e_conv: # Tratamento de erro aprimorado
+                logger.warning(f"Não foi possível converter crew_result_text para string diretamente: {type(crew_result_text)}. Erro: {e_conv}", exc_info=True)
+                converted_result_text = "" # Fallback para string vazia
+    return converted_result_text
+
+
+async def _save_assistant_message(crew_name: str, user_id: str, session_id: str, crew_result_text: Any, zep_context_result: ZepContext) -> None:
+    with track_stage("zep.write_back", crew_name.lower()):
+        # A mensagem do usuário não é limitada pelo deadline do contexto e pode ainda estar sendo gravada.
+        if not await user_message_persisted(zep_context_result):
+            logger.warning(
+                "Mensagem do usuário não foi gravada na sessão %s; a resposta do crew '%s' não será salva no Zep.", session_id, crew_name,
+                extra={"crew_name": crew_name, "session_id": session_id},
+            )
+            session_history_cache.discard(session_id)
+            return
+        await _write_assistant_message(crew_name, user_id, session_id, crew_result_text)
+
+
+async def _write_assistant_message(crew_name: str, user_id: str, session_id: str, crew_result_text: Any) -> None:
+    final_text_to_save = crew_output_to_text(crew_result_text).strip()
+    if final_text_to_save:
+        # MODIFICAÇÃO AQUI: Usar string literal "assistant" para role_type
+        assistant_zep_message = ZepMessage(role="AI Assistant", role_type="assistant", content=final_text_to_save)
+        zep_client = get_zep_client()
+        if api_settings.zep_write_behind_enabled and zep_write_behind.enqueue(zep_client, session_id, assistant_zep_message, user_id=user_id):
+            # Gravada em segundo plano: a resposta não espera o round trip da Zep.
+            logger.info("Mensagem do assistente enfileirada para gravação na sessão %s no Zep.", session_id)
+            remember_history_message(session_id, assistant_zep_message)
+            return
+        try:
+            await zep_client.memory.add(session_id, messages=[assistant_zep_message])
+            graph_search_cache.on_user_memory_write(user_id)
+            remember_history_message(session_id, assistant_zep_message)
+            logger.info("Mensagem do assistente (Role: AI Assistant, RoleType: assistant) adicionada à sessão %s no Zep.", session_id)
+        except Exception as e_zep_add:
+            # O histórico em cache deixaria de refletir a Zep.
+            session_history_cache.discard(session_id)
+            logger.error(f"Erro ao adicionar msg do assistente ao Zep: {e_zep_add}", exc_info=True)
+    else:
+        logger.warning(f"Resultado do Crew '{crew_name}' (após conversão e strip) é vazio ou None, não será salvo no Zep.")
 
 
 async def execute_crew(
@@ -110,125 +246,181 @@ async def execute_crew(
     zep_graph_search_reranker_override: Optional[ZepReranker] = None,
     zep_graph_search_limit_override: Optional[int] = None
 ):
-    if not zep_client:
-        logger.error("Cliente Zep não inicializado. Verifique a ZEP_API_KEY.")
-        raise ValueError("Cliente Zep não está configurado, impossível executar o crew com memória.")
-
-    available_crews: Dict[str, Type[CrewBase]] = { "basic": BasicCrew } # Tipagem aprimorada
-    CrewClass = available_crews.get(crew_name.lower())
-    if not CrewClass:
-        logger.error(f"Crew com nome '{crew_name}' não encontrado.")
-        raise ValueError(f"Crew '{crew_name}' não é um tipo de crew válido.")
-
-    try:
-        # Bloco 1: Garantir usuário e sessão
-        try:
-            await zep_client.user.get(user_id)
-        except NotFoundError:
-            # Adiciona user_id como first_name e email fictício para Zep, se necessário
-            await zep_client.user.add(user_id=user_id, email=f"{user_id}@example.com", first_name=user_id)
-        try:
-            await zep_client.memory.get_session(session_id)
-        except NotFoundError:
-            await zep_client.memory.add_session(session_id=session_id, user_id=user_id)
-
-        user_message_content = inputs.get("message")
-        if not user_message_content:
-            raise ValueError("Campo 'message' é obrigatório nos inputs.")
-        query_for_graph = user_message_content
-
-        # Bloco 2: Adicionar mensagem atual do usuário à memória Zep
-        # MODIFICAÇÃO AQUI: Usar string literal "user" para role_type
-        user_zep_message = ZepMessage(role="User", role_type="user", content=user_message_content, user_id=user_id)
-        await zep_client.memory.add(session_id, messages=[user_zep_message])
-        logger.info(f"Mensagem do usuário '{user_message_content}' (Role: User, RoleType: user) adicionada à sessão {session_id} no Zep.")
-
-        # Bloco 3: Recuperar contexto da Zep
-        # Parâmetros padrão para busca no grafo Zep
-        zep_graph_search_scope: ZepSearchScope = "edges"
-        zep_graph_search_reranker: ZepReranker = "rrf"
-        zep_graph_search_limit: int = 5
-
-        # Aplicar overrides se fornecidos
-        if zep_graph_search_scope_override:
-            zep_graph_search_scope = zep_graph_search_scope_override
-        if zep_graph_search_reranker_override:
-            zep_graph_search_reranker = zep_graph_search_reranker_override
-        if zep_graph_search_limit_override:
-            zep_graph_search_limit = zep_graph_search_limit_override
-
-        graph_search_context_str = "Contexto da Busca no Grafo Zep indisponível."
-        try:
-            search_params_dict = {
-                "query": query_for_graph, "user_id": user_id,
-                "scope": zep_graph_search_scope, "reranker": zep_graph_search_reranker,
-                "limit": zep_graph_search_limit
-            }
-            search_results = await zep_client.graph.search(**search_params_dict)
-            graph_search_context_str = await format_graph_search_results_to_context(
-                search_results, scope=zep_graph_search_scope, reranker=zep_graph_search_reranker,
-                limit=zep_graph_search_limit, query=query_for_graph
-            )
-        except Exception as e_graph:
-            logger.error(f"Erro ao buscar no grafo Zep: {e_graph}", exc_info=True)
+    validate_crew_request(crew_name)
 
-        session_history_context_str = "Histórico da sessão Zep indisponível."
-        try:
-            current_history_limit = history_limit if isinstance(history_limit, int) and history_limit > 0 else 10
-            messages_response = await zep_client.memory.get_session_messages(session_id=session_id, limit=current_history_limit)
-            session_history_context_str = await format_session_messages_to_context(messages_response, current_history_limit)
-        except Exception as e_hist:
-            logger.error(f"Erro ao buscar histórico de mensagens da Zep: {e_hist}", exc_info=True)
-
-        # Obter data e hora atuais no fuso de São Paulo
-        now_sao_paulo = datetime.now(SAO_PAULO_TZ)
-        current_datetime_sp_str = now_sao_paulo.strftime("%d/%m/%Y %H:%M:%S %Z%z")
-        logger.info(f"Data/Hora Atual (São Paulo) para o agente: {current_datetime_sp_str}")
-
-        zep_context = (
-            f"{graph_search_context_str}\n\n"
-            f"{session_history_context_str}"
+    async def run_turn(message: str):
+        return await _run_crew_turn(
+            crew_name, {**inputs, "message": message}, user_id, session_id, history_limit,
+            zep_graph_search_scope_override, zep_graph_search_reranker_override, zep_graph_search_limit_override,
         )
 
-        crew_inputs_for_selected_crew = {
-            "message": user_message_content,
-            "zep_context": zep_context,
-            "current_datetime_sp": current_datetime_sp_str # Adiciona data/hora ao input do crew
-        }
+    user_message_content = inputs.get("message")
+    if api_settings.session_coalescing_enabled and user_message_content:
+        # Mensagens que chegam enquanto a sessão está ocupada são unidas em uma única execução,
+        # desde que com os mesmos parâmetros: a execução unida usa os do primeiro do lote.
+        batch_key = (
+            session_id, user_id, crew_name.lower(), history_limit,
+            zep_graph_search_scope_override, zep_graph_search_reranker_override, zep_graph_search_limit_override,
+            tuple(sorted((name, repr(value)) for name, value in inputs.items() if name != "message")),
+        )
+        return await session_coalescer.submit(session_id, batch_key, user_message_content, run_turn)
+    async with session_locks.acquire(session_id):
+        return await run_turn(user_message_content)
 
-        logger.info(f"Iniciando Crew '{crew_name}' com inputs: {crew_inputs_for_selected_crew['message']}, contexto_zep_len={len(zep_context)}, data_hora_sp='{current_datetime_sp_str}'")
 
-        crew_instance = CrewClass()
-        actual_crew_to_run = crew_instance.crew()
-        crew_result_text = await actual_crew_to_run.kickoff_async(inputs=crew_inputs_for_selected_crew)
+async def _run_crew_turn(
+    crew_name: str,
+    inputs: dict,
+    user_id: str,
+    session_id: str,
+    history_limit: Optional[int],
+    zep_graph_search_scope_override: Optional[ZepSearchScope],
+    zep_graph_search_reranker_override: Optional[ZepReranker],
+    zep_graph_search_limit_override: Optional[int],
+):
+    """Executa um turno completo (contexto, kickoff, escrita da resposta). Chamado com o lock da sessão."""
+    metric_crew_name = crew_name.lower()
+    outcome = "error"
+    try:
+        with track_in_flight(crew_requests_in_flight, metric_crew_name):
+            crew_inputs_for_selected_crew, zep_context_result = await _prepare_crew_inputs(
+                crew_name, inputs, user_id, session_id, history_limit,
+                zep_graph_search_scope_override, zep_graph_search_reranker_override, zep_graph_search_limit_override,
+            )
 
-        converted_result_text = ""
-        if crew_result_text is not None:
-            if hasattr(crew_result_text, 'raw') and isinstance(crew_result_text.raw, str):
-                converted_result_text = crew_result_text.raw
-            elif isinstance(crew_result_text, str):
-                converted_result_text = crew_result_text
-            else:
+            # Cópia do template compilado no startup: não relê os YAMLs nem recria LLMs/ferramentas.
+            with track_stage("crew.instantiate", metric_crew_name):
+                actual_crew_to_run = crew_templates.instantiate(crew_name)
+            cancellation = RunCancellation(metric_crew_name)
+            with track_stage("crew.kickoff", metric_crew_name), track_in_flight(crew_kickoffs_in_flight, metric_crew_name):
                 try:
-                    converted_result_text = str(crew_result_text)
-                except Exception as e_conv: # Tratamento de erro aprimorado
-                    logger.warning(f"Não foi possível converter crew_result_text para string diretamente: {type(crew_result_text)}. Erro: {e_conv}", exc_info=True)
-                    converted_result_text = "" # Fallback para string vazia
-
-        final_text_to_save = converted_result_text.strip()
-        if final_text_to_save:
-            # MODIFICAÇÃO AQUI: Usar string literal "assistant" para role_type
-            assistant_zep_message = ZepMessage(role="AI Assistant", role_type="assistant", content=final_text_to_save)
-            try:
-                await zep_client.memory.add(session_id, messages=[assistant_zep_message])
-                logger.info(f"Mensagem do assistente (Role: AI Assistant, RoleType: assistant) adicionada à sessão {session_id} no Zep.")
-            except Exception as e_zep_add:
-                logger.error(f"Erro ao adicionar msg do assistente ao Zep: {e_zep_add}", exc_info=True)
-        else:
-            logger.warning(f"Resultado do Crew '{crew_name}' (após conversão e strip) é vazio ou None, não será salvo no Zep.")
+                    with cancellation.bind():
+                        crew_result_text = await actual_crew_to_run.kickoff_async(inputs=crew_inputs_for_selected_crew)
+                except asyncio.CancelledError:
+                    # A thread do kickoff continua rodando: para na próxima chamada ao LLM ou ferramenta.
+                    cancellation.cancel()
+                    raise
+            record_token_usage(metric_crew_name, crew_result_text)
+
+            await _save_assistant_message(crew_name, user_id, session_id, crew_result_text, zep_context_result)
+        outcome = "success"
         return crew_result_text
     except ValueError: # Re-raise ValueError para ser pego pelo endpoint
+        outcome = "invalid"
+        raise
+    except asyncio.CancelledError:
+        outcome = "cancelled"
         raise
     except Exception as e: # Re-raise outras exceções para serem pegas pelo endpoint
         logger.error(f"Exceção inesperada ao executar crew '{crew_name}': {e}", exc_info=True)
         raise
+    finally:
+        crew_requests_total.inc(crew_name=metric_crew_name, mode="sync", outcome=outcome)
+
+
+async def stream_crew(
+    crew_name: str,
+    inputs: dict,
+    user_id: str,
+    session_id: str,
+    history_limit: Optional[int] = 10,
+    zep_graph_search_scope_override: Optional[ZepSearchScope] = None,
+    zep_graph_search_reranker_override: Optional[ZepReranker] = None,
+    zep_graph_search_limit_override: Optional[int] = None
+) -> AsyncIterator[CrewEvent]:
+    """
+    Variante de execute_crew que produz eventos à medida que a execução avança:
+    'context_ready', 'crew_started', 'tool_call', 'token', 'result' e 'keepalive'
+    (quando nada acontece por api_settings.sse_keepalive_seconds).
+
+    Se o consumidor parar de iterar (ex.: cliente desconectou), o kickoff deixa
+    de ser aguardado e a resposta não é salva na Zep.
+    """
+    validate_crew_request(crew_name)
+
+    # Turnos da mesma sessão são serializados também no streaming (sem agrupamento).
+    metric_crew_name = crew_name.lower()
+    outcome = "error"
+    try:
+        async with session_locks.acquire(session_id):
+            turn_events = _stream_crew_turn(
+                crew_name, inputs, user_id, session_id, history_limit,
+                zep_graph_search_scope_override, zep_graph_search_reranker_override, zep_graph_search_limit_override,
+            )
+            # aclosing garante que o kickoff seja cancelado quando o consumidor parar de iterar.
+            with track_in_flight(crew_requests_in_flight, metric_crew_name):
+                async with aclosing(turn_events):
+                    async for event in turn_events:
+                        yield event
+        outcome = "success"
+    except ValueError:
+        outcome = "invalid"
+        raise
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = "cancelled"
+        raise
+    finally:
+        crew_requests_total.inc(crew_name=metric_crew_name, mode="stream", outcome=outcome)
+
+
+async def _stream_crew_turn(
+    crew_name: str,
+    inputs: dict,
+    user_id: str,
+    session_id: str,
+    history_limit: Optional[int],
+    zep_graph_search_scope_override: Optional[ZepSearchScope],
+    zep_graph_search_reranker_override: Optional[ZepReranker],
+    zep_graph_search_limit_override: Optional[int],
+) -> AsyncIterator[CrewEvent]:
+    """Corpo de stream_crew, executado com o lock da sessão."""
+    metric_crew_name = crew_name.lower()
+    crew_inputs_for_selected_crew, zep_context_result = await _prepare_crew_inputs(
+        crew_name, inputs, user_id, session_id, history_limit,
+        zep_graph_search_scope_override, zep_graph_search_reranker_override, zep_graph_search_limit_override,
+    )
+    zep_context = crew_inputs_for_selected_crew["zep_context"]
+    yield "context_ready", {"zep_context_len": len(zep_context), "zep_context_tokens_est": estimate_tokens(zep_context)}
+
+    event_stream = CrewEventStream()
+    cancellation = RunCancellation(metric_crew_name)
+    with track_stage("crew.instantiate", metric_crew_name):
+        actual_crew_to_run = crew_templates.instantiate(crew_name, stream=True)
+    with event_stream.bind(), cancellation.bind():
+        # A task (e a thread do kickoff) herdam o contexto com o stream associado.
+        kickoff_task = asyncio.create_task(actual_crew_to_run.kickoff_async(inputs=crew_inputs_for_selected_crew))
+    kickoff_started_at = time.perf_counter()
+    crew_kickoffs_in_flight.inc(crew_name=metric_crew_name)
+
+    def on_kickoff_done(task: asyncio.Task) -> None:
+        crew_kickoffs_in_flight.dec(crew_name=metric_crew_name)
+        kickoff_outcome = "cancelled" if task.cancelled() else ("error" if task.exception() else "success")
+        observe_stage("crew.kickoff", metric_crew_name, kickoff_outcome, time.perf_counter() - kickoff_started_at)
+        event_stream.queue.put_nowait(_KICKOFF_DONE)
+
+    kickoff_task.add_done_callback(on_kickoff_done)
+
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(event_stream.queue.get(), timeout=api_settings.sse_keepalive_seconds)
+            except asyncio.TimeoutError:
+                yield "keepalive", {}
+                continue
+            if event is _KICKOFF_DONE:
+                break
+            yield event
+
+        crew_result_text = kickoff_task.result()
+        record_token_usage(metric_crew_name, crew_result_text)
+        await _save_assistant_message(crew_name, user_id, session_id, crew_result_text, zep_context_result)
+        token_usage = getattr(crew_result_text, "token_usage", None)
+        yield "result", {
+            "raw": crew_output_to_text(crew_result_text),
+            "token_usage": token_usage.model_dump() if token_usage is not None else None,
+        }
+    finally:
+        if not kickoff_task.done():
+            logger.warning(f"Stream do crew '{crew_name}' encerrado antes do fim do kickoff (session_id='{session_id}').")
+            kickoff_task.cancel()
+            cancellation.cancel()
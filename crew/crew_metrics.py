@@ -0,0 +1,87 @@
+# ---------------------------------------------------------------------------
+# crew/crew_metrics.py
+# Métricas do caminho de uma requisição de crew: latência por etapa, execuções
+# em andamento, tamanho do contexto no prompt e uso de tokens do LLM.
+# ---------------------------------------------------------------------------
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from crew.metrics import metrics_registry
+
+# Tamanhos de contexto/prompt em tokens (estimados)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+crew_stage_duration_seconds = metrics_registry.histogram(
+    "crew_stage_duration_seconds",
+    "Duração de cada etapa de uma requisição de crew (chamadas Zep, contexto, construção, kickoff, escrita).",
+    ("stage", "crew_name", "outcome"),
+)
+crew_requests_total = metrics_registry.counter(
+    "crew_requests_total", "Execuções de crew finalizadas, por resultado.", ("crew_name", "mode", "outcome")
+)
+crew_requests_in_flight = metrics_registry.gauge(
+    "crew_requests_in_flight", "Execuções de crew em andamento (do contexto à escrita da resposta).", ("crew_name",)
+)
+crew_kickoffs_in_flight = metrics_registry.gauge(
+    "crew_kickoffs_in_flight", "Kickoffs de crew (LLM/ferramentas) em andamento.", ("crew_name",)
+)
+crew_prompt_context_tokens = metrics_registry.histogram(
+    "crew_prompt_context_tokens", "Tamanho estimado, em tokens, do contexto Zep enviado ao crew.", ("crew_name",), buckets=TOKEN_BUCKETS
+)
+crew_llm_tokens_total = metrics_registry.counter(
+    "crew_llm_tokens_total", "Tokens de LLM consumidos pelos crews (token_usage do CrewOutput).", ("crew_name", "kind")
+)
+crew_llm_requests_total = metrics_registry.counter(
+    "crew_llm_requests_total", "Chamadas bem-sucedidas ao LLM feitas pelos crews.", ("crew_name",)
+)
+
+# Campos do UsageMetrics do CrewAI exportados como 'kind'
+_TOKEN_USAGE_KINDS = {
+    "prompt_tokens": "prompt",
+    "cached_prompt_tokens": "cached_prompt",
+    "completion_tokens": "completion",
+}
+
+
+def observe_stage(stage: str, crew_name: str, outcome: str, seconds: float) -> None:
+    crew_stage_duration_seconds.observe(seconds, stage=stage, crew_name=crew_name, outcome=outcome)
+
+
+@contextmanager
+def track_stage(stage: str, crew_name: str) -> Iterator[None]:
+    """Mede a etapa e a rotula com outcome 'success', 'error' ou 'cancelled'."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "success"
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = "cancelled"
+        raise
+    finally:
+        observe_stage(stage, crew_name, outcome, time.perf_counter() - start)
+
+
+@contextmanager
+def track_in_flight(gauge, crew_name: str) -> Iterator[None]:
+    gauge.inc(crew_name=crew_name)
+    try:
+        yield
+    finally:
+        gauge.dec(crew_name=crew_name)
+
+
+def record_token_usage(crew_name: str, crew_output: Any) -> None:
+    """Contabiliza o token_usage de um CrewOutput (ignora retornos sem essa informação)."""
+    token_usage = getattr(crew_output, "token_usage", None)
+    if token_usage is None:
+        return
+    for field_name, kind in _TOKEN_USAGE_KINDS.items():
+        value = getattr(token_usage, field_name, 0) or 0
+        if value:
+            crew_llm_tokens_total.inc(value, crew_name=crew_name, kind=kind)
+    successful_requests = getattr(token_usage, "successful_requests", 0) or 0
+    if successful_requests:
+        crew_llm_requests_total.inc(successful_requests, crew_name=crew_name)
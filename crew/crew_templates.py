@@ -0,0 +1,187 @@
+# ---------------------------------------------------------------------------
+# crew/crew_templates.py
+# Registro de crews disponíveis e cache de "templates" compilados.
+# ---------------------------------------------------------------------------
+import importlib
+import importlib.util
+import logging
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Type, Union
+
+import yaml
+from pydantic import ValidationError
+
+from app.settings import api_settings
+from crew.context_builder import ContextBudget, ContextBuilder
+from crew.knowledge_index import KnowledgeConfig, KnowledgeIndex, load_knowledge_index
+from crew.llm_cache import CompletionCacheConfig
+
+if TYPE_CHECKING:
+    from crewai import Crew
+    from crewai.project import CrewBase
+
+logger_crew_templates = logging.getLogger(__name__)
+
+
+class CrewTemplateRegistry:
+    """
+    Mantém os crews registrados e um template compilado de cada um.
+
+    Compilar um crew significa instanciar a classe CrewBase (o que lê e parseia
+    agents.yaml/tasks.yaml) e montar o Crew com seus agentes, ferramentas e LLMs.
+    Isso é feito uma única vez; cada requisição recebe uma cópia do template
+    (Crew.copy), com cópias rasas dos LLMs e das ferramentas, e só recebe os
+    inputs da requisição no kickoff. A cópia economiza tempo (sem YAML nem os
+    decoradores do CrewBase), não memória: o Crew.copy do crewai revalida os
+    modelos pydantic e aloca tanto quanto a montagem completa.
+
+    Cada crew pode ter um config/runtime.yaml (ao lado de agents.yaml/tasks.yaml)
+    com configurações de execução, como o orçamento do contexto Zep e o cache
+    de completions do LLM (os LLMs dos agentes são envolvidos por CachedLLM na
+    compilação) e os documentos da recuperação local (o índice é aberto, ou
+    reconstruído se as fontes mudaram, na compilação).
+
+    A classe pode ser registrada pelo caminho "modulo:Classe": o módulo (e com
+    ele crewai, crewai_tools, litellm...) só é importado na primeira compilação.
+    """
+
+    def __init__(self):
+        self._crew_classes: Dict[str, Union[str, Type["CrewBase"]]] = {}
+        self._templates: Dict[str, "Crew"] = {}
+        self._context_builders: Dict[str, ContextBuilder] = {}
+        self._llm_cache_configs: Dict[str, CompletionCacheConfig] = {}
+        self._knowledge_configs: Dict[str, KnowledgeConfig] = {}
+        self._knowledge_indexes: Dict[str, KnowledgeIndex] = {}
+        self._lock = threading.Lock()
+
+    def register(self, crew_name: str, crew_class: Union[str, Type["CrewBase"]]) -> None:
+        key = crew_name.lower()
+        self._crew_classes[key] = crew_class
+        runtime_config = self._load_runtime_config(self._base_directory(crew_class))
+        try:
+            context_budget = ContextBudget(**(runtime_config.get("context") or {}))
+        except ValidationError as e:
+            raise ValueError(f"Seção 'context' inválida no runtime.yaml do crew '{key}': {e}") from e
+        self._context_builders[key] = ContextBuilder(context_budget)
+        try:
+            self._llm_cache_configs[key] = CompletionCacheConfig(**(runtime_config.get("llm_cache") or {}))
+        except ValidationError as e:
+            raise ValueError(f"Seção 'llm_cache' inválida no runtime.yaml do crew '{key}': {e}") from e
+        try:
+            self._knowledge_configs[key] = KnowledgeConfig(**(runtime_config.get("knowledge") or {}))
+        except ValidationError as e:
+            raise ValueError(f"Seção 'knowledge' inválida no runtime.yaml do crew '{key}': {e}") from e
+
+    @staticmethod
+    def _base_directory(crew_class: Union[str, Type["CrewBase"]]) -> Optional[Path]:
+        if not isinstance(crew_class, str):
+            base_directory = getattr(crew_class, "base_directory", None)
+            return Path(base_directory) if base_directory is not None else None
+        # Localiza o arquivo do módulo sem executá-lo (mesmo diretório que o CrewBase usaria).
+        module_spec = importlib.util.find_spec(crew_class.partition(":")[0])
+        if module_spec is None or not module_spec.origin:
+            raise ValueError(f"Módulo do crew '{crew_class}' não encontrado.")
+        return Path(module_spec.origin).parent
+
+    @staticmethod
+    def _load_runtime_config(base_directory: Optional[Path]) -> Dict:
+        if base_directory is None:
+            return {}
+        runtime_path = Path(base_directory) / "config" / "runtime.yaml"
+        if not runtime_path.is_file():
+            return {}
+        with open(runtime_path, "r", encoding="utf-8") as runtime_file:
+            return yaml.safe_load(runtime_file) or {}
+
+    def names(self) -> List[str]:
+        return list(self._crew_classes)
+
+    def is_registered(self, crew_name: str) -> bool:
+        return crew_name.lower() in self._crew_classes
+
+    def is_compiled(self, crew_name: str) -> bool:
+        return crew_name.lower() in self._templates
+
+    def compile(self, crew_name: str) -> "Crew":
+        key = crew_name.lower()
+        crew_class = self._crew_classes.get(key)
+        if not crew_class:
+            raise ValueError(f"Crew '{crew_name}' não é um tipo de crew válido.")
+        with self._lock:
+            template = self._templates.get(key)
+            if template is None:
+                if isinstance(crew_class, str):
+                    module_name, _, class_name = crew_class.partition(":")
+                    crew_class = getattr(importlib.import_module(module_name), class_name)
+                    self._crew_classes[key] = crew_class
+                logger_crew_templates.info(f"Compilando template do crew '{key}'.")
+                template = crew_class().crew()
+                llm_cache_config = self._llm_cache_configs.get(key)
+                if llm_cache_config is not None and llm_cache_config.enabled:
+                    self._wrap_llms_with_cache(template, key, llm_cache_config)
+                self._open_knowledge_index(key)
+                self._templates[key] = template
+        return template
+
+    @staticmethod
+    def _wrap_llms_with_cache(template: "Crew", crew_name: str, config: CompletionCacheConfig) -> None:
+        from crew.cached_llm import CachedLLM
+
+        for crew_agent in template.agents:
+            if crew_agent.llm is not None and not isinstance(crew_agent.llm, CachedLLM):
+                crew_agent.llm = CachedLLM(crew_agent.llm, crew_name=crew_name, ttl_seconds=config.ttl_seconds)
+
+    def _open_knowledge_index(self, crew_name: str) -> None:
+        knowledge_config = self._knowledge_configs.get(crew_name)
+        if knowledge_config is None or not knowledge_config.enabled:
+            return
+        try:
+            self._knowledge_indexes[crew_name] = load_knowledge_index(
+                knowledge_config.sources, api_settings.knowledge_index_dir, knowledge_config.max_chunk_chars
+            )
+        except OSError as e:
+            # Sem as fontes o crew roda normalmente, só sem a recuperação local.
+            logger_crew_templates.error(f"Índice de conhecimento do crew '{crew_name}' indisponível: {e}")
+
+    def compile_all(self) -> None:
+        for crew_name in self._crew_classes:
+            self.compile(crew_name)
+
+    def context_builder(self, crew_name: str) -> ContextBuilder:
+        """ContextBuilder com o orçamento de contexto configurado para o crew."""
+        return self._context_builders[crew_name.lower()]
+
+    def llm_cache_config(self, crew_name: str) -> CompletionCacheConfig:
+        """Configuração do cache de completions do crew (desabilitado se o runtime.yaml não tem a seção)."""
+        return self._llm_cache_configs.get(crew_name.lower()) or CompletionCacheConfig()
+
+    def knowledge_config(self, crew_name: str) -> KnowledgeConfig:
+        """Configuração da recuperação local do crew (desabilitada se o runtime.yaml não tem a seção)."""
+        return self._knowledge_configs.get(crew_name.lower()) or KnowledgeConfig()
+
+    def knowledge_index(self, crew_name: str) -> Optional[KnowledgeIndex]:
+        """Índice da recuperação local do crew, ou None se desabilitada ou indisponível."""
+        return self._knowledge_indexes.get(crew_name.lower())
+
+    def instantiate(self, crew_name: str, stream: bool = False) -> "Crew":
+        """
+        Retorna um Crew pronto para uma requisição, copiado do template compilado.
+        Com stream=True, os LLMs da cópia emitem tokens à medida que chegam.
+        """
+        template = self._templates.get(crew_name.lower()) or self.compile(crew_name)
+        crew_instance = template.copy()
+        for crew_agent in crew_instance.agents:
+            # Agent.copy reaproveita a lista de ferramentas do template; o contador de uso
+            # (current_usage_count) é estado por instância, então cada cópia recebe as suas.
+            # O cache e o limite de taxa das CachedTool continuam compartilhados por nome.
+            if crew_agent.tools:
+                crew_agent.tools = [tool.model_copy(update={"current_usage_count": 0}) for tool in crew_agent.tools]
+            # Agent.copy já faz uma cópia rasa do LLM, então o template não é afetado.
+            if stream and hasattr(crew_agent.llm, "stream"):
+                crew_agent.llm.stream = True
+        return crew_instance
+
+
+crew_templates = CrewTemplateRegistry()
+crew_templates.register("basic", "crew.basic_crew.crew:BasicCrew")
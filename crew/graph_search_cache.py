@@ -0,0 +1,83 @@
+# ---------------------------------------------------------------------------
+# crew/graph_search_cache.py
+# Cache dos resultados da busca no grafo Zep, com deduplicação
+# (single-flight) de buscas idênticas concorrentes.
+# ---------------------------------------------------------------------------
+import logging
+import re
+import unicodedata
+from typing import Awaitable, Callable, Dict, Set, Tuple
+
+from crew.context_builder import GraphSearchResult
+from crew.ttl_cache import SingleFlight, TTLCache
+
+logger_graph_search_cache = logging.getLogger(__name__)
+
+GraphSearchKey = Tuple[str, str, str, str, int]
+
+_NON_WORD_RE = re.compile(r"[^\w\s]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normaliza a query para que variações triviais ("Oi!", " oi ") compartilhem a
+    mesma entrada: Unicode NFKC, casefold, sem pontuação e espaços colapsados.
+    """
+    normalized = unicodedata.normalize("NFKC", query).casefold()
+    normalized = _NON_WORD_RE.sub(" ", normalized)
+    return _WHITESPACE_RE.sub(" ", normalized).strip()
+
+
+class GraphSearchCache:
+    """
+    Guarda o GraphSearchResult (imutável) por
+    (user_id, query normalizada, scope, reranker, limit).
+
+    Escritas na memória de um usuário não apagam as entradas dele na hora (a Zep
+    processa novas mensagens de forma assíncrona), mas encurtam a validade delas
+    para no máximo stale_after_write_seconds.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, stale_after_write_seconds: float):
+        self._cache: TTLCache[GraphSearchKey, GraphSearchResult] = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self._single_flight: SingleFlight[GraphSearchKey, GraphSearchResult] = SingleFlight()
+        self._keys_by_user: Dict[str, Set[GraphSearchKey]] = {}
+        self._stale_after_write_seconds = stale_after_write_seconds
+
+    async def get_or_search(
+        self,
+        user_id: str,
+        query: str,
+        scope: str,
+        reranker: str,
+        limit: int,
+        search: Callable[[], Awaitable[GraphSearchResult]],
+    ) -> GraphSearchResult:
+        """Retorna o resultado em cache ou executa `search` (uma única vez para chamadas concorrentes)."""
+        key: GraphSearchKey = (user_id, normalize_query(query), scope, reranker, limit)
+        cached_result = self._cache.get(key)
+        if cached_result is not None:
+            return cached_result
+
+        async def search_and_store() -> GraphSearchResult:
+            graph_result = await search()
+            self._cache.set(key, graph_result)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            return graph_result
+
+        return await self._single_flight.do(key, search_and_store)
+
+    def on_user_memory_write(self, user_id: str) -> None:
+        """Envelhece as entradas do usuário após uma escrita na memória dele."""
+        user_keys = self._keys_by_user.get(user_id)
+        if not user_keys:
+            return
+        for key in list(user_keys):
+            if not self._cache.cap_ttl(key, self._stale_after_write_seconds):
+                user_keys.discard(key)  # Entrada já expirou ou foi despejada
+        if not user_keys:
+            self._keys_by_user.pop(user_id, None)
+
+    def stats(self) -> Dict[str, float]:
+        return {**self._cache.stats(), "single_flight_shared": self._single_flight.shared_calls}
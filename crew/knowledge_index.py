@@ -0,0 +1,352 @@
+# ---------------------------------------------------------------------------
+# crew/knowledge_index.py
+# Recuperação local sobre documentos (ex.: knowledge.mdx): os documentos são
+# divididos em trechos por seção, indexados com BM25 e o índice é gravado em
+# um arquivo binário compacto, aberto via mmap e reconstruído só quando as
+# fontes mudam.
+# ---------------------------------------------------------------------------
+import bisect
+import hashlib
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, Field
+
+from crew.context_builder import estimate_tokens
+from crew.metrics import metrics_registry
+
+logger_knowledge_index = logging.getLogger(__name__)
+
+knowledge_retrieval_total = metrics_registry.counter(
+    "knowledge_retrieval_total", "Consultas à recuperação local, por crew e resultado (hit, empty).", ("crew_name", "outcome")
+)
+
+KNOWLEDGE_CONTEXT_EMPTY = "Nenhum trecho relevante encontrado na documentação local."
+
+_INDEX_MAGIC = b"KIDX"
+_INDEX_VERSION = 1
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+# Palavras muito frequentes (inglês dos documentos e português das perguntas) não ajudam no ranking.
+_STOPWORDS = frozenset(
+    "a an and are as at be by can de do da das dos e em for from how i if in into is it na no nos o of on or os "
+    "para por que se the this to um uma was what when where which with you your como com mais qual quais".split()
+)
+
+
+class KnowledgeConfig(BaseModel):
+    """Seção 'knowledge' do config/runtime.yaml. Caminhos relativos ao diretório de trabalho."""
+    enabled: bool = False
+    sources: List[str] = Field(default_factory=lambda: ["knowledge.mdx"])
+    top_k: int = Field(3, ge=1)
+    max_tokens: int = Field(600, ge=0)
+    min_score: float = Field(0.0, ge=0)
+    max_chunk_chars: int = Field(1200, ge=200)
+
+
+@dataclass(frozen=True)
+class KnowledgeChunk:
+    source: str
+    section: str
+    text: str
+
+
+@dataclass(frozen=True)
+class KnowledgeSnippet:
+    source: str
+    section: str
+    text: str
+    score: float
+
+
+def tokenize(text: str) -> List[str]:
+    """Minúsculas sem acentos; identificadores com '_' entram inteiros e também por partes."""
+    normalized = "".join(ch for ch in unicodedata.normalize("NFKD", text.lower()) if not unicodedata.combining(ch))
+    tokens = []
+    for token in _TOKEN_RE.findall(normalized):
+        parts = [token, *token.split("_")] if "_" in token else [token]
+        tokens.extend(part for part in parts if len(part) > 1 and part not in _STOPWORDS)
+    return tokens
+
+
+def chunk_markdown(text: str, source: str, max_chunk_chars: int) -> List[KnowledgeChunk]:
+    """
+    Divide um documento Markdown/MDX em trechos por seção (títulos fora de blocos
+    de código). Cada trecho leva o caminho de títulos da seção; seções longas são
+    quebradas em parágrafos até max_chunk_chars.
+    """
+    chunks: List[KnowledgeChunk] = []
+    headings: List[Tuple[int, str]] = []
+    paragraphs: List[str] = []
+    current: List[str] = []
+    in_fence = False
+
+    def close_paragraph() -> None:
+        if any(line.strip() for line in current):
+            paragraphs.append("\n".join(current).strip())
+        current.clear()
+
+    def close_section() -> None:
+        close_paragraph()
+        section = " > ".join(title for _, title in headings)
+        body: List[str] = []
+        for paragraph in paragraphs:
+            if body and sum(len(part) + 2 for part in body) + len(paragraph) > max_chunk_chars:
+                chunks.append(KnowledgeChunk(source, section, "\n\n".join(body)))
+                body = []
+            body.append(paragraph)
+        if body:
+            chunks.append(KnowledgeChunk(source, section, "\n\n".join(body)))
+        paragraphs.clear()
+
+    for line in text.splitlines():
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        heading = None if in_fence else _HEADING_RE.match(line)
+        if heading:
+            close_section()
+            level = len(heading.group(1))
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, heading.group(2)))
+        elif not in_fence and not line.strip():
+            close_paragraph()
+        else:
+            current.append(line)
+    close_section()
+    return chunks
+
+
+def sources_fingerprint(sources: Sequence[str], max_chunk_chars: int) -> str:
+    digest = hashlib.sha256(f"v{_INDEX_VERSION}:{max_chunk_chars}:{sys.byteorder}".encode())
+    for source in sources:
+        digest.update(source.encode("utf-8") + b"\0")
+        digest.update(hashlib.sha256(Path(source).read_bytes()).digest())
+    return digest.hexdigest()
+
+
+def _pad(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % 8)
+
+
+def build_index(sources: Sequence[str], index_path: str, max_chunk_chars: int) -> None:
+    """
+    Grava o índice BM25 das fontes em index_path (substituição atômica). Formato:
+    'KIDX', versão, tamanho e cabeçalho JSON, seguidos de seções alinhadas em 8
+    bytes (termos ordenados, postings, tamanhos dos trechos e textos) lidas via
+    memoryview sem cópia.
+    """
+    chunks: List[KnowledgeChunk] = []
+    for source in sources:
+        chunks.extend(chunk_markdown(Path(source).read_text(encoding="utf-8"), source, max_chunk_chars))
+
+    postings: Dict[bytes, List[Tuple[int, int]]] = {}
+    doc_lengths = array("I")
+    for doc_id, chunk in enumerate(chunks):
+        terms = tokenize(f"{chunk.section}\n{chunk.text}")
+        doc_lengths.append(len(terms))
+        for term, frequency in Counter(terms).items():
+            postings.setdefault(term.encode("utf-8"), []).append((doc_id, min(frequency, 0xFFFF)))
+
+    sorted_terms = sorted(postings)
+    term_offsets, posting_offsets = array("I", [0]), array("I", [0])
+    posting_docs, posting_tfs = array("I"), array("H")
+    for term in sorted_terms:
+        term_offsets.append(term_offsets[-1] + len(term))
+        for doc_id, frequency in postings[term]:
+            posting_docs.append(doc_id)
+            posting_tfs.append(frequency)
+        posting_offsets.append(len(posting_docs))
+
+    def blob(values: Sequence[str]) -> Tuple[array, bytes]:
+        encoded = [value.encode("utf-8") for value in values]
+        offsets = array("I", [0])
+        for item in encoded:
+            offsets.append(offsets[-1] + len(item))
+        return offsets, b"".join(encoded)
+
+    source_names = sorted(set(chunk.source for chunk in chunks))
+    source_ids = array("H", [source_names.index(chunk.source) for chunk in chunks])
+    section_offsets, section_blob = blob([chunk.section for chunk in chunks])
+    text_offsets, text_blob = blob([chunk.text for chunk in chunks])
+
+    sections = {
+        "term_offsets": term_offsets.tobytes(), "terms": b"".join(sorted_terms),
+        "posting_offsets": posting_offsets.tobytes(), "posting_docs": posting_docs.tobytes(), "posting_tfs": posting_tfs.tobytes(),
+        "doc_lengths": doc_lengths.tobytes(), "source_ids": source_ids.tobytes(),
+        "section_offsets": section_offsets.tobytes(), "sections": section_blob,
+        "text_offsets": text_offsets.tobytes(), "texts": text_blob,
+    }
+    layout, position = {}, 0
+    for name, data in sections.items():
+        layout[name] = [position, len(data)]
+        position += len(_pad(data))
+    header = json.dumps({
+        "fingerprint": sources_fingerprint(sources, max_chunk_chars),
+        "documents": len(chunks),
+        "average_length": (sum(doc_lengths) / len(chunks)) if chunks else 0.0,
+        "sources": source_names,
+        "sections": layout,
+    }).encode("utf-8")
+
+    index_file = Path(index_path)
+    index_file.parent.mkdir(parents=True, exist_ok=True)
+    temporary = index_file.with_name(f"{index_file.name}.{os.getpid()}.tmp")
+    with open(temporary, "wb") as output:
+        output.write(_pad(_INDEX_MAGIC + struct.pack("<II", _INDEX_VERSION, len(header)) + header))
+        for data in sections.values():
+            output.write(_pad(data))
+    os.replace(temporary, index_file)
+
+
+class KnowledgeIndex:
+    """Índice aberto via mmap (somente leitura; páginas compartilhadas entre workers após o fork)."""
+
+    def __init__(self, index_path: str):
+        with open(index_path, "rb") as index_file:
+            self._mmap = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:4] != _INDEX_MAGIC:
+            raise ValueError(f"Arquivo de índice inválido: {index_path}")
+        version, header_length = struct.unpack_from("<II", self._mmap, 4)
+        if version != _INDEX_VERSION:
+            raise ValueError(f"Versão {version} do índice não suportada: {index_path}")
+        header_end = 12 + header_length
+        header = json.loads(self._mmap[12:header_end])
+        self.fingerprint: str = header["fingerprint"]
+        self.documents: int = header["documents"]
+        self._average_length: float = header["average_length"] or 1.0
+        self._sources: List[str] = header["sources"]
+
+        view = memoryview(self._mmap)
+        base = header_end + (-header_end % 8)
+
+        def section(name: str, item_format: Optional[str] = None) -> memoryview:
+            offset, length = header["sections"][name]
+            data = view[base + offset: base + offset + length]
+            return data.cast(item_format) if item_format else data
+
+        self._term_offsets = section("term_offsets", "I")
+        self._terms = section("terms")
+        self._posting_offsets = section("posting_offsets", "I")
+        self._posting_docs = section("posting_docs", "I")
+        self._posting_tfs = section("posting_tfs", "H")
+        self._doc_lengths = section("doc_lengths", "I")
+        self._source_ids = section("source_ids", "H")
+        self._section_offsets = section("section_offsets", "I")
+        self._section_blob = section("sections")
+        self._text_offsets = section("text_offsets", "I")
+        self._text_blob = section("texts")
+        self._term_count = len(self._term_offsets) - 1
+
+    def _term(self, position: int) -> bytes:
+        return bytes(self._terms[self._term_offsets[position]:self._term_offsets[position + 1]])
+
+    def _find_term(self, term: bytes) -> int:
+        position = bisect.bisect_left(range(self._term_count), term, key=self._term)
+        return position if position < self._term_count and self._term(position) == term else -1
+
+    def _chunk(self, doc_id: int) -> Tuple[str, str, str]:
+        section = bytes(self._section_blob[self._section_offsets[doc_id]:self._section_offsets[doc_id + 1]]).decode("utf-8")
+        text = bytes(self._text_blob[self._text_offsets[doc_id]:self._text_offsets[doc_id + 1]]).decode("utf-8")
+        return self._sources[self._source_ids[doc_id]], section, text
+
+    def search(self, query: str, top_k: int, min_score: float = 0.0) -> List[KnowledgeSnippet]:
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            position = self._find_term(term.encode("utf-8"))
+            if position < 0:
+                continue
+            start, end = self._posting_offsets[position], self._posting_offsets[position + 1]
+            document_frequency = end - start
+            idf = math.log(1.0 + (self.documents - document_frequency + 0.5) / (document_frequency + 0.5))
+            for index in range(start, end):
+                doc_id, frequency = self._posting_docs[index], self._posting_tfs[index]
+                length_norm = 1.0 - _BM25_B + _BM25_B * self._doc_lengths[doc_id] / self._average_length
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (_BM25_K1 + 1) / (frequency + _BM25_K1 * length_norm)
+        best = heapq.nlargest(top_k, ((score, doc_id) for doc_id, score in scores.items() if score > min_score))
+        return [KnowledgeSnippet(*self._chunk(doc_id), score=score) for score, doc_id in best]
+
+    def close(self) -> None:
+        for name, value in list(vars(self).items()):
+            if isinstance(value, memoryview):
+                value.release()
+        self._mmap.close()
+
+
+def _index_path(index_dir: str, sources: Sequence[str], max_chunk_chars: int) -> str:
+    key = hashlib.sha256(json.dumps([list(sources), max_chunk_chars]).encode("utf-8")).hexdigest()[:16]
+    return str(Path(index_dir) / f"knowledge-{key}.kidx")
+
+
+_open_indexes: Dict[Tuple[Tuple[str, ...], int], KnowledgeIndex] = {}
+_open_indexes_lock = threading.Lock()
+
+
+def load_knowledge_index(sources: Sequence[str], index_dir: str, max_chunk_chars: int) -> KnowledgeIndex:
+    """
+    Abre o índice das fontes (compartilhado entre crews com as mesmas fontes),
+    reconstruindo-o só se o arquivo não existe ou as fontes mudaram.
+    """
+    key = (tuple(sources), max_chunk_chars)
+    with _open_indexes_lock:
+        fingerprint = sources_fingerprint(sources, max_chunk_chars)
+        index = _open_indexes.get(key)
+        if index is not None and index.fingerprint == fingerprint:
+            return index
+
+        index_path = _index_path(index_dir, sources, max_chunk_chars)
+        started_at = time.perf_counter()
+        loaded: Optional[KnowledgeIndex] = None
+        try:
+            loaded = KnowledgeIndex(index_path)
+        except (OSError, ValueError):
+            pass
+        if loaded is None or loaded.fingerprint != fingerprint:
+            if loaded is not None:
+                loaded.close()
+            build_index(sources, index_path, max_chunk_chars)
+            loaded = KnowledgeIndex(index_path)
+            logger_knowledge_index.info(
+                "Índice de conhecimento reconstruído (%d trechos de %s) em %.0f ms.",
+                loaded.documents, ", ".join(sources), (time.perf_counter() - started_at) * 1000,
+            )
+        else:
+            logger_knowledge_index.info("Índice de conhecimento carregado (%d trechos) em %.1f ms.", loaded.documents, (time.perf_counter() - started_at) * 1000)
+        # O índice anterior não é fechado: requisições em andamento ainda podem lê-lo.
+        _open_indexes[key] = loaded
+        return loaded
+
+
+def render_knowledge_context(snippets: Sequence[KnowledgeSnippet], max_tokens: int) -> str:
+    """Texto do input 'knowledge_context': trechos na ordem do ranking enquanto couberem em max_tokens (0 = sem corte)."""
+    header = "Trechos da documentação local (mais relevantes primeiro):"
+    lines, used = [], estimate_tokens(header)
+    for snippet in snippets:
+        line = f"- [{Path(snippet.source).name} > {snippet.section}]\n{snippet.text}"
+        cost = estimate_tokens(line)
+        if max_tokens > 0 and used + cost > max_tokens:
+            continue
+        lines.append(line)
+        used += cost
+    if not lines:
+        return KNOWLEDGE_CONTEXT_EMPTY
+    return "\n\n".join([header, *lines])
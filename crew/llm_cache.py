@@ -0,0 +1,161 @@
+# ---------------------------------------------------------------------------
+# crew/llm_cache.py
+# Cache de completions do LLM: chave derivada do modelo, das mensagens já
+# renderizadas e dos parâmetros de amostragem, armazenada em memória ou em
+# um arquivo SQLite local (compartilhado entre workers), com TTL e limite
+# de entradas. A integração com o CrewAI fica em crew/cached_llm.py.
+# ---------------------------------------------------------------------------
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, Field
+
+from app.settings import api_settings
+from crew.metrics import metrics_registry
+from crew.ttl_cache import TTLCache
+
+logger_llm_cache = logging.getLogger(__name__)
+
+llm_cache_requests_total = metrics_registry.counter(
+    "llm_cache_requests_total",
+    "Chamadas ao LLM passando pelo cache de completions, por crew e resultado (hit, miss, bypass).",
+    ("crew_name", "outcome"),
+)
+llm_cache_saved_tokens_total = metrics_registry.counter(
+    "llm_cache_saved_tokens_total", "Tokens (estimados, prompt + resposta) economizados por hits no cache de completions.", ("crew_name",)
+)
+
+# Parâmetros que mudam a resposta do modelo e por isso fazem parte da chave.
+SAMPLING_PARAMS = (
+    "temperature", "top_p", "n", "stop", "max_tokens", "max_completion_tokens", "presence_penalty",
+    "frequency_penalty", "logit_bias", "seed", "response_format", "reasoning_effort",
+)
+
+
+class CompletionCacheConfig(BaseModel):
+    """
+    Cache de completions de um crew (seção 'llm_cache' do config/runtime.yaml).
+
+    Só prompts idênticos byte a byte acertam o cache. datetime_format, se definido,
+    substitui o formato do input 'current_datetime_sp' enquanto o cache está ligado:
+    um formato mais grosso (ex.: só a data) torna prompts repetidos de fato iguais.
+    """
+    enabled: bool = False
+    ttl_seconds: float = Field(86400.0, gt=0)
+    datetime_format: Optional[str] = None
+
+
+@dataclass
+class CachedCompletion:
+    text: str
+    tokens: int
+
+
+def completion_cache_key(model: str, messages: Any, params: Dict[str, Any]) -> str:
+    """Hash estável (sha256) do modelo, das mensagens e dos parâmetros de amostragem."""
+    canonical = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CompletionStore(ABC):
+    """Interface síncrona (as chamadas ao LLM do CrewAI rodam na thread do kickoff)."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[CachedCompletion]:
+        ...
+
+    @abstractmethod
+    def put(self, key: str, completion: CachedCompletion, ttl_seconds: float) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class InMemoryCompletionStore(CompletionStore):
+    """Completions em memória do worker, limitadas por quantidade (LRU) e por TTL."""
+
+    def __init__(self, max_entries: int):
+        self._entries: TTLCache[str, CachedCompletion] = TTLCache(max_size=max_entries, ttl_seconds=86400.0)
+
+    def get(self, key: str) -> Optional[CachedCompletion]:
+        return self._entries.get(key)
+
+    def put(self, key: str, completion: CachedCompletion, ttl_seconds: float) -> None:
+        self._entries.set(key, completion, ttl_seconds=ttl_seconds)
+
+
+class SQLiteCompletionStore(CompletionStore):
+    """Completions em um arquivo SQLite local, compartilhado entre workers e reinícios."""
+
+    def __init__(self, path: str, max_entries: int):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS llm_completions ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, tokens INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS llm_completions_created_at ON llm_completions (created_at)")
+
+    def get(self, key: str) -> Optional[CachedCompletion]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT text, tokens FROM llm_completions WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return CachedCompletion(text=row[0], tokens=row[1]) if row is not None else None
+
+    def put(self, key: str, completion: CachedCompletion, ttl_seconds: float) -> None:
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO llm_completions (key, text, tokens, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (key, completion.text, completion.tokens, now, now + ttl_seconds),
+            )
+            self._connection.execute("DELETE FROM llm_completions WHERE expires_at <= ?", (now,))
+            self._connection.execute(
+                "DELETE FROM llm_completions WHERE key IN "
+                "(SELECT key FROM llm_completions ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self._max_entries,),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def create_completion_store() -> CompletionStore:
+    if api_settings.llm_cache_store == "sqlite":
+        return SQLiteCompletionStore(api_settings.llm_cache_sqlite_path, api_settings.llm_cache_max_entries)
+    return InMemoryCompletionStore(api_settings.llm_cache_max_entries)
+
+
+_completion_store: Optional[CompletionStore] = None
+_completion_store_lock = threading.Lock()
+
+
+def get_completion_store() -> CompletionStore:
+    """Store compartilhado, criado no primeiro uso (já no worker, depois do fork)."""
+    global _completion_store
+    with _completion_store_lock:
+        if _completion_store is None:
+            _completion_store = create_completion_store()
+        return _completion_store
+
+
+def close_completion_store() -> None:
+    global _completion_store
+    with _completion_store_lock:
+        if _completion_store is not None:
+            _completion_store.close()
+            _completion_store = None
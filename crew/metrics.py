@@ -0,0 +1,353 @@
+# ---------------------------------------------------------------------------
+# crew/metrics.py
+# Registro de métricas em processo (contadores, gauges e histogramas com labels),
+# exposição no formato texto do Prometheus e agregação entre os workers do
+# servidor pre-fork.
+# ---------------------------------------------------------------------------
+import asyncio
+import glob
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger_metrics = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class _Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"Métrica '{self.name}' espera os labels {self.label_names}, recebeu {tuple(labels)}.")
+        return tuple(str(labels[label_name]) for label_name in self.label_names)
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Tuple[LabelValues, float]]:
+        with self._lock:
+            return list(self._values.items())
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[Tuple[LabelValues, float]]:
+        with self._lock:
+            return list(self._values.items())
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Por combinação de labels: (contagem por bucket, soma, contagem total)
+        self._values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            bucket_counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for index, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    bucket_counts[index] += 1
+            self._values[key] = (bucket_counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[Tuple[LabelValues, Tuple[List[int], float, int]]]:
+        with self._lock:
+            return [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+
+
+class CallbackMetric(_Metric):
+    """
+    Métrica lida no momento da coleta a partir de um callback, para valores que já
+    existem em outro lugar (ex.: tamanho e hits dos caches, profundidade de filas).
+    """
+
+    def __init__(self, name: str, documentation: str, metric_type: str, label_names: Sequence[str], callback: Callable[[], List[Tuple[LabelValues, float]]]):
+        super().__init__(name, documentation, label_names)
+        self.metric_type = metric_type
+        self._callback = callback
+
+    def samples(self) -> List[Tuple[LabelValues, float]]:
+        return [(tuple(str(value) for value in label_values), float(value)) for label_values, value in self._callback()]
+
+
+class MetricsRegistry:
+    """Registro único das métricas do processo."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def callback(self, name: str, documentation: str, metric_type: str, label_names: Sequence[str], callback: Callable[[], List[Tuple[LabelValues, float]]]) -> CallbackMetric:
+        return self._register(CallbackMetric(name, documentation, metric_type, label_names, callback))
+
+    def metrics(self) -> List[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(label_names: Sequence[str], label_values: Sequence[str]) -> str:
+    if not label_names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in zip(label_names, label_values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def render_prometheus_text(registry: "MetricsRegistry") -> str:
+    """Serializa todas as métricas do registro no formato de exposição texto do Prometheus (0.0.4)."""
+    lines: List[str] = []
+    for metric in sorted(registry.metrics(), key=lambda m: m.name):
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+        if isinstance(metric, Histogram):
+            for label_values, (bucket_counts, total, count) in metric.samples():
+                # As contagens por bucket já são cumulativas (observe incrementa todo bucket >= valor).
+                for upper_bound, bucket_count in zip(metric.buckets, bucket_counts):
+                    labels = _format_labels((*metric.label_names, "le"), (*label_values, _format_value(upper_bound)))
+                    lines.append(f"{metric.name}_bucket{labels} {bucket_count}")
+                labels = _format_labels((*metric.label_names, "le"), (*label_values, "+Inf"))
+                lines.append(f"{metric.name}_bucket{labels} {count}")
+                labels = _format_labels(metric.label_names, label_values)
+                lines.append(f"{metric.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{metric.name}_count{labels} {count}")
+        else:
+            for label_values, value in metric.samples():
+                lines.append(f"{metric.name}{_format_labels(metric.label_names, label_values)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+
+def _snapshot(registry: MetricsRegistry) -> List[Dict[str, Any]]:
+    snapshot = []
+    for metric in registry.metrics():
+        entry: Dict[str, Any] = {
+            "name": metric.name,
+            "documentation": metric.documentation,
+            "type": metric.metric_type,
+            "labels": list(metric.label_names),
+        }
+        if isinstance(metric, Histogram):
+            entry["buckets"] = list(metric.buckets)
+            entry["samples"] = [[list(label_values), [counts, total, count]] for label_values, (counts, total, count) in metric.samples()]
+        else:
+            entry["samples"] = [[list(label_values), value] for label_values, value in metric.samples()]
+        snapshot.append(entry)
+    return snapshot
+
+
+def _subtract(value: Any, baseline: Any) -> Any:
+    if baseline is None:
+        return value
+    if isinstance(value, list):
+        counts, total, count = value
+        return [[c - b for c, b in zip(counts, baseline[0])], total - baseline[1], count - baseline[2]]
+    return value - baseline
+
+
+def _add(value: Any, other: Any) -> Any:
+    if isinstance(value, list):
+        return [[a + b for a, b in zip(value[0], other[0])], value[1] + other[1], value[2] + other[2]]
+    return value + other
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MultiprocessMetrics:
+    """
+    Agrega as métricas dos workers do servidor pre-fork, para que /metrics não
+    dependa de qual worker atende a coleta. Cada worker grava um snapshot do seu
+    registro em directory/worker-<pid>.json a cada write_interval_seconds (e no
+    shutdown); a coleta lê todos e soma:
+
+    - counters e histogramas de todos os arquivos, inclusive de workers que já
+      saíram, para que os totais não voltem atrás quando um worker é substituído;
+    - gauges só de workers vivos.
+
+    Os valores herdados do mestre no fork (ex.: contagens do pré-carregamento)
+    são descontados a partir de start(), para não serem somados uma vez por worker.
+    """
+
+    def __init__(self, registry: MetricsRegistry, directory: str, write_interval_seconds: float = 1.0, pid: Optional[int] = None):
+        self.registry = registry
+        self.directory = directory
+        self.write_interval_seconds = write_interval_seconds
+        self._pid = pid
+        self._baseline: Dict[Tuple[str, Tuple[str, ...]], Any] = {}
+        self._writer_task: Optional[asyncio.Task] = None
+
+    @property
+    def pid(self) -> int:
+        return self._pid or os.getpid()
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"worker-{pid}.json")
+
+    def _local_snapshot(self) -> List[Dict[str, Any]]:
+        snapshot = _snapshot(self.registry)
+        for entry in snapshot:
+            if entry["type"] in ("counter", "histogram"):
+                entry["samples"] = [
+                    [label_values, _subtract(value, self._baseline.get((entry["name"], tuple(label_values))))]
+                    for label_values, value in entry["samples"]
+                ]
+        return snapshot
+
+    def write(self, snapshot: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Grava o snapshot deste processo (rename atômico: leitores nunca veem um arquivo pela metade)."""
+        path = self._path(self.pid)
+        with open(path + ".tmp", "w", encoding="utf-8") as snapshot_file:
+            json.dump({"pid": self.pid, "metrics": snapshot if snapshot is not None else self._local_snapshot()}, snapshot_file)
+        os.replace(path + ".tmp", path)
+
+    def start(self) -> None:
+        """Chamado no startup do worker: fixa a linha de base herdada e começa a gravar periodicamente."""
+        self._baseline = {
+            (entry["name"], tuple(label_values)): value
+            for entry in _snapshot(self.registry) if entry["type"] in ("counter", "histogram")
+            for label_values, value in entry["samples"]
+        }
+        self.write()
+        self._writer_task = asyncio.create_task(self._run_writer())
+
+    async def stop(self) -> None:
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            await asyncio.gather(self._writer_task, return_exceptions=True)
+            self._writer_task = None
+        self.write()
+
+    async def _run_writer(self) -> None:
+        while True:
+            await asyncio.sleep(self.write_interval_seconds)
+            try:
+                # Os callbacks leem estado do event loop: o snapshot é feito aqui, só o I/O vai para a thread.
+                await asyncio.to_thread(self.write, self._local_snapshot())
+            except OSError as e:
+                logger_metrics.warning(f"Falha ao gravar o snapshot de métricas em {self.directory}: {e}")
+
+    def collect(self) -> MetricsRegistry:
+        """Registro com a soma das métricas de todos os workers (este com os valores atuais)."""
+        snapshots = [(self.pid, self._local_snapshot())]
+        for path in glob.glob(os.path.join(self.directory, "worker-*.json")):
+            if path == self._path(self.pid):
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as snapshot_file:
+                    data = json.load(snapshot_file)
+            except (OSError, ValueError):
+                continue
+            snapshots.append((data["pid"], data["metrics"]))
+
+        merged = MetricsRegistry()
+        for pid, snapshot in snapshots:
+            alive = pid == self.pid or _process_alive(pid)
+            for entry in snapshot:
+                if entry["type"] == "histogram":
+                    metric = merged.histogram(entry["name"], entry["documentation"], entry["labels"], entry["buckets"])
+                elif entry["type"] == "counter":
+                    metric = merged.counter(entry["name"], entry["documentation"], entry["labels"])
+                else:
+                    if not alive:
+                        continue
+                    metric = merged.gauge(entry["name"], entry["documentation"], entry["labels"])
+                for label_values, value in entry["samples"]:
+                    key = tuple(label_values)
+                    current = metric._values.get(key)
+                    if isinstance(value, list):
+                        value = [list(value[0]), value[1], value[2]]
+                    metric._values[key] = value if current is None else _add(current, value)
+        return merged
+
+    def render(self) -> str:
+        return render_prometheus_text(self.collect())
@@ -0,0 +1,55 @@
+# ---------------------------------------------------------------------------
+# crew/rate_limit.py
+# Token bucket seguro entre threads, usado pelo limite de taxa das ferramentas
+# (crew/tool_cache.py) e pelo limite por tenant do controle de admissão.
+# ---------------------------------------------------------------------------
+import threading
+import time
+from typing import Callable
+
+
+class RateLimitExceeded(RuntimeError):
+    """O limite de taxa exigiria esperar mais que o permitido (wait_seconds: espera necessária)."""
+
+    def __init__(self, message: str, wait_seconds: float):
+        super().__init__(message)
+        self.wait_seconds = wait_seconds
+
+
+class TokenBucket:
+    """
+    Limite de taxa (seguro entre threads): até burst chamadas de imediato e
+    rate_per_second em regime. acquire() bloqueia a thread chamadora até haver
+    uma ficha e devolve a espera; rate_per_second igual a 0 desabilita.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float,
+        burst: int,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate_per_second = rate_per_second
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait_seconds: float) -> float:
+        if self.rate_per_second <= 0:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate_per_second)
+            self._updated_at = now
+            wait = max(0.0, (1.0 - self._tokens) / self.rate_per_second)
+            if wait > max_wait_seconds:
+                raise RateLimitExceeded(f"limite de {self.rate_per_second}/s atingido (espera de {wait:.1f}s)", wait)
+            # Reserva a ficha já (o saldo pode ficar negativo): as próximas chamadas esperam na fila.
+            self._tokens -= 1.0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
@@ -0,0 +1,102 @@
+# ---------------------------------------------------------------------------
+# crew/run_cancellation.py
+# Cancelamento cooperativo do kickoff: a thread do crew não pode ser
+# interrompida pelo asyncio, então ela é parada na próxima chamada ao LLM
+# ou a uma ferramenta depois que a requisição foi cancelada.
+# ---------------------------------------------------------------------------
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+from crewai.utilities.events import (
+    AgentExecutionStartedEvent,
+    LLMCallStartedEvent,
+    TaskStartedEvent,
+    ToolUsageStartedEvent,
+    crewai_event_bus,
+)
+
+from crew.metrics import metrics_registry
+
+logger_run_cancellation = logging.getLogger(__name__)
+
+crew_runs_cancelled_total = metrics_registry.counter(
+    "crew_runs_cancelled_total", "Kickoffs cancelados antes do fim (cliente desconectou ou prazo expirou).", ("crew_name",)
+)
+crew_cancelled_calls_skipped_total = metrics_registry.counter(
+    "crew_cancelled_calls_skipped_total",
+    "Chamadas ao LLM/ferramentas (e tarefas/agentes) não executadas porque o kickoff foi cancelado.",
+    ("crew_name", "kind"),
+)
+
+
+class CrewRunCancelled(BaseException):
+    """
+    Levantada na thread do kickoff para encerrá-lo. É BaseException para não ser
+    engolida pelo event bus nem pelos 'except Exception' do loop de agentes do CrewAI.
+    """
+
+
+class RunCancellation:
+    """
+    Sinal de cancelamento de um kickoff. Como em CrewEventStream, bind() associa o
+    sinal às tasks/threads criadas dentro do bloco (asyncio.to_thread copia o
+    contexto), e os handlers do event bus abaixo o consultam na thread do crew.
+    """
+
+    def __init__(self, crew_name: str):
+        self.crew_name = crew_name
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self._cancelled.set()
+        crew_runs_cancelled_total.inc(crew_name=self.crew_name)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @contextmanager
+    def bind(self) -> Iterator["RunCancellation"]:
+        token = _current_run_cancellation.set(self)
+        try:
+            yield self
+        finally:
+            _current_run_cancellation.reset(token)
+
+
+_current_run_cancellation: ContextVar[Optional[RunCancellation]] = ContextVar("crew_run_cancellation", default=None)
+
+
+def _stop_if_cancelled(kind: str) -> None:
+    cancellation = _current_run_cancellation.get()
+    if cancellation is not None and cancellation.cancelled:
+        crew_cancelled_calls_skipped_total.inc(crew_name=cancellation.crew_name, kind=kind)
+        logger_run_cancellation.info("Kickoff do crew '%s' interrompido antes de: %s.", cancellation.crew_name, kind)
+        raise CrewRunCancelled(f"kickoff do crew '{cancellation.crew_name}' cancelado")
+
+
+@crewai_event_bus.on(LLMCallStartedEvent)
+def _on_llm_call_started(source: Any, event: LLMCallStartedEvent) -> None:
+    _stop_if_cancelled("llm_call")
+
+
+@crewai_event_bus.on(ToolUsageStartedEvent)
+def _on_tool_usage_started(source: Any, event: ToolUsageStartedEvent) -> None:
+    _stop_if_cancelled("tool_call")
+
+
+@crewai_event_bus.on(TaskStartedEvent)
+def _on_task_started(source: Any, event: TaskStartedEvent) -> None:
+    _stop_if_cancelled("task")
+
+
+@crewai_event_bus.on(AgentExecutionStartedEvent)
+def _on_agent_execution_started(source: Any, event: AgentExecutionStartedEvent) -> None:
+    _stop_if_cancelled("agent_execution")
@@ -0,0 +1,146 @@
+# ---------------------------------------------------------------------------
+# crew/session_history_cache.py
+# Cache write-through do histórico recente de cada sessão: turnos já
+# convertidos (HistoryTurn), atualizados localmente a cada escrita e
+# limitados em memória total com despejo LRU entre sessões.
+# ---------------------------------------------------------------------------
+import sys
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from itertools import islice
+from typing import Callable, Deque, Dict, Optional, Sequence, Tuple
+
+from crew.context_builder import HistoryTurn
+
+# Custo aproximado de um HistoryTurn além do conteúdo (objeto, datetime, role, timestamp).
+_TURN_OVERHEAD_BYTES = 400
+
+
+def _turn_size(turn: HistoryTurn) -> int:
+    return _TURN_OVERHEAD_BYTES + sys.getsizeof(turn.content or "")
+
+
+@dataclass
+class _SessionHistory:
+    turns: Deque[HistoryTurn]
+    # True quando o buffer contém o histórico inteiro da sessão (a Zep devolveu menos que o pedido).
+    complete: bool
+    size_bytes: int
+    expires_at: float
+    # Geração do lock entre processos deixada pela última escrita deste processo (None: desconhecida).
+    generation: Optional[int] = None
+
+
+class SessionHistoryCache:
+    """
+    Ring buffer por sessão com os últimos max_turns turnos.
+
+    Preenchido a partir da Zep num miss (fill) e mantido localmente a cada
+    mensagem gravada (append), de modo que uma conversa contínua não precisa
+    buscar o histórico a cada turno. Uma consulta com limite maior que o que o
+    buffer sabe ser o topo do histórico é um miss. Entre workers do servidor
+    pre-fork, a geração do lock da sessão (observe_generation/set_generation)
+    descarta a entrada quando outro worker escreveu na sessão; entre réplicas, só
+    o TTL limita a defasagem. max_bytes igual a 0 desabilita o cache.
+    """
+
+    def __init__(self, max_turns: int, max_bytes: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._sessions: "OrderedDict[str, _SessionHistory]" = OrderedDict()
+        self._size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _live_entry(self, session_id: str) -> Optional[_SessionHistory]:
+        entry = self._sessions.get(session_id)
+        if entry is not None and entry.expires_at <= self._clock():
+            self.discard(session_id)
+            return None
+        return entry
+
+    def get(self, session_id: str, limit: int) -> Optional[Tuple[HistoryTurn, ...]]:
+        entry = self._live_entry(session_id)
+        if entry is None or (not entry.complete and len(entry.turns) < limit):
+            self.misses += 1
+            return None
+        self._sessions.move_to_end(session_id)
+        self.hits += 1
+        return tuple(islice(entry.turns, max(0, len(entry.turns) - limit), None))
+
+    def fill(self, session_id: str, turns: Sequence[HistoryTurn], requested_limit: int) -> None:
+        """Guarda os turnos buscados na Zep com limit=requested_limit (do mais antigo ao mais recente)."""
+        if self.max_bytes <= 0 or self.max_turns <= 0:
+            return
+        self.discard(session_id)
+        kept = deque(turns[-self.max_turns:], maxlen=self.max_turns)
+        entry = _SessionHistory(
+            turns=kept,
+            complete=len(turns) < requested_limit and len(kept) == len(turns),
+            size_bytes=sum(_turn_size(turn) for turn in kept),
+            expires_at=self._clock() + self.ttl_seconds,
+        )
+        self._sessions[session_id] = entry
+        self._size_bytes += entry.size_bytes
+        self._evict()
+
+    def append(self, session_id: str, turn: HistoryTurn) -> None:
+        """Acrescenta um turno gravado; sem efeito se a sessão não está no cache."""
+        entry = self._live_entry(session_id)
+        if entry is None:
+            return
+        if len(entry.turns) == entry.turns.maxlen:
+            dropped = entry.turns.popleft()
+            entry.size_bytes -= _turn_size(dropped)
+            self._size_bytes -= _turn_size(dropped)
+            entry.complete = False
+        entry.turns.append(turn)
+        entry.size_bytes += _turn_size(turn)
+        self._size_bytes += _turn_size(turn)
+        self._sessions.move_to_end(session_id)
+        self._evict()
+
+    def observe_generation(self, session_id: str, generation: int) -> None:
+        """Chamado ao obter o lock entre processos: descarta a sessão se outro processo escreveu desde a nossa última escrita."""
+        entry = self._sessions.get(session_id)
+        if entry is not None and entry.generation != generation:
+            self.discard(session_id)
+
+    def set_generation(self, session_id: str, generation: int) -> None:
+        """Chamado ao liberar o lock entre processos, com a geração que este processo deixou."""
+        entry = self._sessions.get(session_id)
+        if entry is not None:
+            entry.generation = generation
+
+    def discard(self, session_id: str) -> None:
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self._size_bytes -= entry.size_bytes
+
+    def _evict(self) -> None:
+        while self._size_bytes > self.max_bytes and self._sessions:
+            _, entry = self._sessions.popitem(last=False)
+            self._size_bytes -= entry.size_bytes
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size_bytes
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._sessions),
+            "size_bytes": self._size_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+        }
@@ -0,0 +1,271 @@
+# ---------------------------------------------------------------------------
+# crew/session_ordering.py
+# Serialização por session_id (lock assíncrono por chave com fila limitada,
+# opcionalmente também entre processos) e agrupamento opcional de mensagens
+# pendentes da mesma sessão.
+# ---------------------------------------------------------------------------
+import asyncio
+import logging
+import os
+import struct
+import zlib
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Set, TypeVar
+
+from crew.metrics import metrics_registry
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: só o lock em processo
+    fcntl = None
+
+logger_session_ordering = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+session_lock_wait_seconds = metrics_registry.histogram(
+    "crew_session_lock_wait_seconds", "Tempo de espera pelo lock da sessão antes de executar o crew."
+)
+session_lock_waiters = metrics_registry.gauge(
+    "crew_session_lock_waiters", "Requisições aguardando o lock de alguma sessão."
+)
+session_lock_rejections_total = metrics_registry.counter(
+    "crew_session_lock_rejections_total", "Requisições rejeitadas por excesso de espera na mesma sessão."
+)
+session_coalesced_messages_total = metrics_registry.counter(
+    "crew_session_coalesced_messages_total", "Mensagens agrupadas em uma execução de crew já existente."
+)
+
+
+class SessionBusyError(Exception):
+    """Há mais requisições aguardando a mesma sessão do que o limite configurado."""
+
+
+@dataclass
+class _SessionLockEntry:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    waiters: int = 0
+
+
+class _FileLockHold:
+    """Lock de um arquivo de SessionFileLocks já obtido, com a geração lida do arquivo."""
+
+    def __init__(self, fd: int, generation: int):
+        self._fd = fd
+        self.generation = generation
+
+    def release(self) -> int:
+        """Incrementa a geração, libera o lock e retorna a nova geração."""
+        generation = self.generation + 1
+        try:
+            os.pwrite(self._fd, struct.pack("<Q", generation), 0)
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+        return generation
+
+
+class SessionFileLocks:
+    """
+    Lock entre processos (flock) por session_id, para os workers do servidor
+    pre-fork. Cada sessão é mapeada para um de `stripes` arquivos em directory;
+    sessões que caem no mesmo arquivo também se serializam entre si (raro, e
+    só atrasa). A espera usa tentativas não bloqueantes com backoff curto, então
+    não trava o event loop e pode ser cancelada. Entre processos, a ordem de
+    chegada não é garantida: só que dois turnos da sessão não rodam juntos.
+
+    Cada arquivo guarda uma geração, incrementada a cada liberação: um processo
+    que vê uma geração diferente da que deixou sabe que outro escreveu numa
+    sessão do arquivo desde então (usado para invalidar caches em processo).
+    """
+
+    def __init__(self, directory: str, stripes: int = 4096, max_poll_seconds: float = 0.05):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.stripes = stripes
+        self.max_poll_seconds = max_poll_seconds
+
+    def _path(self, session_id: str) -> str:
+        stripe = zlib.crc32(session_id.encode("utf-8")) % self.stripes
+        return os.path.join(self.directory, f"session-{stripe:04d}.lock")
+
+    async def lock(self, session_id: str) -> _FileLockHold:
+        fd = os.open(self._path(session_id), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            poll_seconds = 0.002
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(poll_seconds)
+                    poll_seconds = min(self.max_poll_seconds, poll_seconds * 2)
+        except BaseException:
+            os.close(fd)
+            raise
+        stored = os.pread(fd, 8, 0)
+        return _FileLockHold(fd, struct.unpack("<Q", stored)[0] if len(stored) == 8 else 0)
+
+
+class SessionLocks:
+    """
+    Lock assíncrono por session_id. Turnos da mesma sessão rodam em ordem de
+    chegada; sessões diferentes continuam totalmente paralelas. Cada sessão
+    aceita no máximo max_waiters requisições aguardando o lock.
+
+    O lock é do processo. Com lock_dir, o turno também segura um SessionFileLocks,
+    o que estende a serialização aos demais workers do servidor pre-fork; o limite
+    de max_waiters (HTTP 429) continua contado por worker. on_file_lock e
+    on_file_unlock recebem a geração do arquivo ao obter e ao liberar esse lock.
+
+    release_barrier(session_id) pode devolver um awaitable com escritas do turno
+    ainda em andamento: o lock só é liberado (em segundo plano) depois dele, e o
+    próximo turno da sessão espera essas escritas.
+    """
+
+    def __init__(
+        self,
+        max_waiters: int,
+        lock_dir: Optional[str] = None,
+        release_barrier: Optional[Callable[[str], Optional[Awaitable[Any]]]] = None,
+        on_file_lock: Optional[Callable[[str, int], None]] = None,
+        on_file_unlock: Optional[Callable[[str, int], None]] = None,
+    ):
+        self.max_waiters = max_waiters
+        self._entries: Dict[str, _SessionLockEntry] = {}
+        self._file_locks: Optional[SessionFileLocks] = None
+        self._release_barrier = release_barrier
+        self._on_file_lock = on_file_lock
+        self._on_file_unlock = on_file_unlock
+        self._deferred_releases: Set[asyncio.Task] = set()
+        if lock_dir:
+            if fcntl is None:
+                logger_session_ordering.warning("fcntl indisponível: ordenação por sessão apenas dentro de cada processo.")
+            else:
+                self._file_locks = SessionFileLocks(lock_dir)
+
+    @property
+    def cross_process(self) -> bool:
+        return self._file_locks is not None
+
+    @asynccontextmanager
+    async def acquire(self, session_id: str) -> AsyncIterator[None]:
+        entry = self._entries.get(session_id)
+        if entry is None:
+            entry = self._entries[session_id] = _SessionLockEntry()
+        if entry.lock.locked() and entry.waiters >= self.max_waiters:
+            session_lock_rejections_total.inc()
+            raise SessionBusyError(f"Sessão '{session_id}' já possui {entry.waiters} mensagens aguardando processamento.")
+
+        loop = asyncio.get_running_loop()
+        wait_started_at = loop.time()
+        entry.waiters += 1
+        session_lock_waiters.inc()
+        try:
+            await entry.lock.acquire()
+        finally:
+            entry.waiters -= 1
+            session_lock_waiters.dec()
+
+        file_lock: Optional[_FileLockHold] = None
+        try:
+            if self._file_locks is not None:
+                file_lock = await self._file_locks.lock(session_id)
+                if self._on_file_lock is not None:
+                    self._on_file_lock(session_id, file_lock.generation)
+            session_lock_wait_seconds.observe(loop.time() - wait_started_at)
+            yield
+        finally:
+            barrier = self._release_barrier(session_id) if self._release_barrier is not None else None
+            if barrier is None:
+                self._release(session_id, entry, file_lock)
+            else:
+                task = asyncio.ensure_future(self._release_after(session_id, entry, file_lock, barrier))
+                self._deferred_releases.add(task)
+                task.add_done_callback(self._deferred_releases.discard)
+
+    async def _release_after(
+        self, session_id: str, entry: _SessionLockEntry, file_lock: Optional[_FileLockHold], barrier: Awaitable[Any],
+    ) -> None:
+        try:
+            await barrier
+        except Exception as e:
+            logger_session_ordering.warning(f"Escritas pendentes da sessão '{session_id}' falharam antes de liberar o lock: {e}")
+        finally:
+            self._release(session_id, entry, file_lock)
+
+    def _release(self, session_id: str, entry: _SessionLockEntry, file_lock: Optional[_FileLockHold]) -> None:
+        try:
+            if file_lock is not None:
+                generation = file_lock.release()
+                if self._on_file_unlock is not None:
+                    self._on_file_unlock(session_id, generation)
+        finally:
+            entry.lock.release()
+            if entry.waiters == 0 and not entry.lock.locked() and self._entries.get(session_id) is entry:
+                self._entries.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@dataclass
+class _PendingBatch:
+    batch_key: Hashable = None
+    messages: List[str] = field(default_factory=list)
+    future: Optional[asyncio.Future] = None
+
+
+class SessionCoalescer:
+    """
+    Agrupa mensagens que chegam para uma sessão enquanto ela está ocupada.
+
+    A primeira mensagem que encontra a sessão ocupada abre um lote e aguarda o
+    lock; mensagens seguintes com a mesma batch_key (os mesmos parâmetros de
+    execução) entram no mesmo lote. Quando o lock é obtido, o lote é fechado e
+    processado em uma única execução com as mensagens unidas, e todas as
+    requisições do lote recebem o mesmo resultado.
+
+    Só o último lote aberto da sessão aceita mensagens: uma mensagem com outra
+    batch_key abre um novo lote atrás dele, e as seguintes não voltam para o
+    lote anterior, o que preservaria os parâmetros mas inverteria a ordem.
+    """
+
+    def __init__(self, session_locks: SessionLocks, separator: str = "\n"):
+        self._session_locks = session_locks
+        self._separator = separator
+        # Último lote aberto de cada sessão.
+        self._open_batches: Dict[str, _PendingBatch] = {}
+
+    async def submit(self, session_id: str, batch_key: Hashable, message: str, run: Callable[[str], Awaitable[T]]) -> T:
+        batch = self._open_batches.get(session_id)
+        if batch is not None and batch.batch_key == batch_key:
+            batch.messages.append(message)
+            session_coalesced_messages_total.inc()
+            logger_session_ordering.info(f"Mensagem agrupada ao lote pendente da sessão '{session_id}' ({len(batch.messages)} mensagens).")
+            return await asyncio.shield(batch.future)
+
+        batch = _PendingBatch(batch_key=batch_key, messages=[message], future=asyncio.get_running_loop().create_future())
+        self._open_batches[session_id] = batch
+        try:
+            async with self._session_locks.acquire(session_id):
+                # Lote fechado: mensagens que chegarem agora abrem o próximo lote.
+                self._close(session_id, batch)
+                result = await run(self._separator.join(batch.messages))
+        except BaseException as e:
+            self._close(session_id, batch)
+            if not batch.future.done():
+                batch_error = e
+                if isinstance(e, asyncio.CancelledError):
+                    batch_error = RuntimeError("A execução agrupada desta sessão foi cancelada.")
+                batch.future.set_exception(batch_error)
+                # Marca a exceção como consumida caso nenhuma outra requisição esteja no lote.
+                batch.future.exception()
+            raise
+        batch.future.set_result(result)
+        return result
+
+    def _close(self, session_id: str, batch: _PendingBatch) -> None:
+        if self._open_batches.get(session_id) is batch:
+            self._open_batches.pop(session_id, None)
@@ -0,0 +1,178 @@
+# ---------------------------------------------------------------------------
+# crew/tool_cache.py
+# Cache das ferramentas dos crews (ex.: SerperDevTool) compartilhado entre
+# requisições: resultados por consulta normalizada com TTL, chamadas
+# concorrentes idênticas em uma única execução (single-flight) e limite de
+# taxa por processo em direção ao provedor.
+# ---------------------------------------------------------------------------
+import json
+import logging
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Optional, Tuple
+
+from crewai.tools import BaseTool
+from pydantic import ConfigDict, Field
+
+from app.settings import api_settings
+from crew.metrics import metrics_registry
+from crew.rate_limit import RateLimitExceeded, TokenBucket
+from crew.ttl_cache import TTLCache, ThreadSingleFlight
+
+logger_tool_cache = logging.getLogger(__name__)
+
+tool_calls_total = metrics_registry.counter(
+    "tool_calls_total",
+    "Chamadas de ferramentas dos crews, por ferramenta e resultado (hit, miss, shared, rate_limited, error).",
+    ("tool_name", "outcome"),
+)
+tool_call_duration_seconds = metrics_registry.histogram(
+    "tool_call_duration_seconds", "Duração das chamadas reais das ferramentas ao provedor.", ("tool_name",)
+)
+tool_rate_limit_wait_seconds = metrics_registry.histogram(
+    "tool_rate_limit_wait_seconds", "Espera imposta pelo limite de taxa antes de chamar o provedor.", ("tool_name",)
+)
+
+
+# Mantido com o nome antigo: o limite de taxa das ferramentas usa o token bucket comum.
+ToolRateLimitError = RateLimitExceeded
+
+
+def normalize_tool_input(value: Any) -> Any:
+    """Normaliza a entrada para a chave: Unicode NFKC, minúsculas e espaços colapsados em strings."""
+    if isinstance(value, str):
+        return " ".join(unicodedata.normalize("NFKC", value).lower().split())
+    if isinstance(value, dict):
+        return {key: normalize_tool_input(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_tool_input(item) for item in value]
+    return value
+
+
+class _ToolCacheState:
+    def __init__(self, max_entries: int, ttl_seconds: float, rate_limiter: TokenBucket):
+        self.results: TTLCache[str, Any] = TTLCache(max_size=max_entries, ttl_seconds=ttl_seconds)
+        self.flights: ThreadSingleFlight[str, Any] = ThreadSingleFlight()
+        self.rate_limiter = rate_limiter
+
+
+# Um estado por nome de ferramenta no processo: todas as cópias do crew (e todos os crews) o compartilham.
+_tool_states: Dict[str, _ToolCacheState] = {}
+_tool_states_lock = threading.Lock()
+
+
+def _tool_state(tool_name: str, max_entries: int, ttl_seconds: float, rate_per_second: float, burst: int) -> _ToolCacheState:
+    with _tool_states_lock:
+        state = _tool_states.get(tool_name)
+        if state is None:
+            state = _ToolCacheState(max_entries, ttl_seconds, TokenBucket(rate_per_second, burst))
+            _tool_states[tool_name] = state
+        return state
+
+
+def tool_cache_stats() -> Dict[str, Dict[str, float]]:
+    with _tool_states_lock:
+        states = dict(_tool_states)
+    return {name: {**state.results.stats(), "shared_calls": state.flights.shared_calls} for name, state in states.items()}
+
+
+def _tool_stat_samples(stat_name: str):
+    return [((tool_name,), stats[stat_name]) for tool_name, stats in tool_cache_stats().items()]
+
+
+metrics_registry.callback("tool_cache_entries", "Resultados de ferramentas em cache, por ferramenta.", "gauge", ("tool_name",), lambda: _tool_stat_samples("size"))
+
+
+def _config_fingerprint(tool: BaseTool) -> str:
+    # Campos simples da instância (ex.: search_type, n_results, country do SerperDevTool) mudam o resultado.
+    # Calculado uma vez ao envolver a ferramenta: contadores alterados durante as chamadas não entram na chave.
+    ignored = {"name", "description", "description_updated", "result_as_answer", "max_usage_count", "current_usage_count"}
+    config = {
+        field_name: getattr(tool, field_name, None)
+        for field_name in type(tool).model_fields
+        if field_name not in ignored and isinstance(getattr(tool, field_name, None), (str, int, float, bool, type(None)))
+    }
+    return json.dumps(config, sort_keys=True, default=str)
+
+
+class CachedTool(BaseTool):
+    """
+    Envolve uma ferramenta do CrewAI mantendo nome, descrição e argumentos. Erros
+    não são cacheados (a exceção chega a todas as chamadas que compartilharam a
+    execução, e o CrewAI a repassa ao agente).
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    tool: BaseTool = Field(exclude=True)
+    config_fingerprint: str
+    ttl_seconds: float
+    max_entries: int
+    rate_limit_per_second: float
+    rate_limit_burst: int
+    rate_limit_max_wait_seconds: float
+
+    def _generate_description(self) -> None:
+        # A descrição da ferramenta envolvida já foi gerada (com nome e argumentos).
+        pass
+
+    def _state(self) -> _ToolCacheState:
+        return _tool_state(self.name, self.max_entries, self.ttl_seconds, self.rate_limit_per_second, self.rate_limit_burst)
+
+    def _cache_key(self, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> str:
+        payload = {"config": self.config_fingerprint, "args": normalize_tool_input(list(args)), "kwargs": normalize_tool_input(kwargs)}
+        return json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+
+    def _call_provider(self, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Any:
+        state = self._state()
+        try:
+            waited = state.rate_limiter.acquire(self.rate_limit_max_wait_seconds)
+        except ToolRateLimitError:
+            tool_calls_total.inc(tool_name=self.name, outcome="rate_limited")
+            raise
+        tool_rate_limit_wait_seconds.observe(waited, tool_name=self.name)
+        start = time.perf_counter()
+        try:
+            result = self.tool._run(*args, **kwargs)
+        except Exception:
+            tool_calls_total.inc(tool_name=self.name, outcome="error")
+            raise
+        finally:
+            tool_call_duration_seconds.observe(time.perf_counter() - start, tool_name=self.name)
+        tool_calls_total.inc(tool_name=self.name, outcome="miss")
+        state.results.set(self._cache_key(args, kwargs), result)
+        return result
+
+    def _run(self, *args: Any, **kwargs: Any) -> Any:
+        state = self._state()
+        key = self._cache_key(args, kwargs)
+        cached = state.results.get(key)
+        if cached is not None:
+            tool_calls_total.inc(tool_name=self.name, outcome="hit")
+            return cached
+        result, shared = state.flights.do(key, lambda: self._call_provider(args, kwargs))
+        if shared:
+            tool_calls_total.inc(tool_name=self.name, outcome="shared")
+        return result
+
+
+def cached_tool(
+    tool: BaseTool,
+    ttl_seconds: Optional[float] = None,
+    rate_limit_per_second: Optional[float] = None,
+) -> CachedTool:
+    """Envolve a ferramenta com o cache; padrões em api_settings.tool_cache_* e tool_rate_limit_*."""
+    return CachedTool(
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        result_as_answer=tool.result_as_answer,
+        tool=tool,
+        config_fingerprint=_config_fingerprint(tool),
+        ttl_seconds=ttl_seconds if ttl_seconds is not None else api_settings.tool_cache_ttl_seconds,
+        max_entries=api_settings.tool_cache_max_entries,
+        rate_limit_per_second=rate_limit_per_second if rate_limit_per_second is not None else api_settings.tool_rate_limit_per_second,
+        rate_limit_burst=api_settings.tool_rate_limit_burst,
+        rate_limit_max_wait_seconds=api_settings.tool_rate_limit_max_wait_seconds,
+    )
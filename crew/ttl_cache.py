@@ -0,0 +1,173 @@
+# ---------------------------------------------------------------------------
+# crew/ttl_cache.py
+# Cache em memória com expiração por tempo (TTL) e despejo LRU, e
+# deduplicação de chamadas concorrentes idênticas (single-flight).
+# ---------------------------------------------------------------------------
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Cache limitado por tamanho (LRU) e por tempo de vida (TTL) das entradas.
+    Mantém contadores de hits, misses e despejos. Seguro para uso entre threads.
+    Um max_size igual a 0 desabilita o cache (toda consulta é um miss).
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[K, Tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def __contains__(self, key: K) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def set(self, key: K, value: V, ttl_seconds: Optional[float] = None) -> None:
+        if self.max_size <= 0:
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def cap_ttl(self, key: K, ttl_seconds: float) -> bool:
+        """Antecipa a expiração da entrada para no máximo ttl_seconds a partir de agora."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            expires_at, value = entry
+            self._entries[key] = (min(expires_at, self._clock() + ttl_seconds), value)
+            return True
+
+    def discard(self, key: K) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+class SingleFlight(Generic[K, V]):
+    """
+    Garante que chamadas assíncronas concorrentes com a mesma chave compartilhem
+    uma única execução em andamento. Se quem aguarda for cancelado (ex.: timeout),
+    a execução compartilhada continua para os demais.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[K, "asyncio.Future[V]"] = {}
+        self.shared_calls = 0
+
+    async def do(self, key: K, fn: Callable[[], Awaitable[V]]) -> V:
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done: self._on_done(key, done))
+        else:
+            self.shared_calls += 1
+        return await asyncio.shield(future)
+
+    def _on_done(self, key: K, future: "asyncio.Future[V]") -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        if not future.cancelled():
+            future.exception()  # Evita aviso de exceção não consumida quando ninguém mais aguarda.
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+
+class _ThreadCall(Generic[V]):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[V] = None
+        self.error: Optional[BaseException] = None
+
+
+class ThreadSingleFlight(Generic[K, V]):
+    """
+    Equivalente do SingleFlight para código síncrono executado em threads (ex.:
+    ferramentas do CrewAI, que rodam na thread do kickoff). do() retorna o valor
+    e se ele veio de uma execução iniciada por outra thread.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[K, _ThreadCall[V]] = {}
+        self._lock = threading.Lock()
+        self.shared_calls = 0
+
+    def do(self, key: K, fn: Callable[[], V]) -> Tuple[V, bool]:
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = _ThreadCall()
+                self._in_flight[key] = call
+            else:
+                self.shared_calls += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
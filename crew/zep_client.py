@@ -4,22 +4,89 @@
 # ---------------------------------------------------------------------------
 import os
 from zep_cloud.client import AsyncZep
+import httpx
 import logging # Adicionado para logar o status da chave ZEP
 from typing import Optional
 
+from app.settings import api_settings
+from crew.metrics import metrics_registry
+from crew.zep_http import ZepRetryPolicy, ZepTransport, create_zep_httpx_client
+
 logger_zep_client = logging.getLogger(__name__)
 
 ZEP_API_KEY = os.environ.get("ZEP_API_KEY")
 zep_client: Optional[AsyncZep] = None # Tipagem explícita
+# Cliente HTTP criado por este módulo (e fechado por close_zep_client); None para clientes injetados.
+_zep_httpx_client: Optional[httpx.AsyncClient] = None
 
 if not ZEP_API_KEY:
     logger_zep_client.warning("ALERTA: ZEP_API_KEY não está configurada nas variáveis de ambiente. A integração com Zep não funcionará.")
-    # zep_client permanece None
-else:
+
+
+def _create_zep_client() -> Optional[AsyncZep]:
+    global _zep_httpx_client
     try:
-        zep_client = AsyncZep(api_key=ZEP_API_KEY)
-        logger_zep_client.info("Cliente Zep inicializado com sucesso.")
+        httpx_client = create_zep_httpx_client(
+            max_connections=api_settings.zep_http_max_connections,
+            max_keepalive_connections=api_settings.zep_http_max_keepalive_connections,
+            keepalive_expiry_seconds=api_settings.zep_http_keepalive_expiry_seconds,
+            http2=api_settings.zep_http2_enabled,
+            connect_timeout_seconds=api_settings.zep_http_connect_timeout_seconds,
+            read_timeout_seconds=api_settings.zep_http_read_timeout_seconds,
+            write_timeout_seconds=api_settings.zep_http_write_timeout_seconds,
+            pool_timeout_seconds=api_settings.zep_http_pool_timeout_seconds,
+            read_timeouts=api_settings.zep_http_operation_read_timeouts,
+            retry_policy=ZepRetryPolicy(
+                max_retries=api_settings.zep_http_read_max_retries,
+                base_seconds=api_settings.zep_http_retry_base_seconds,
+                max_seconds=api_settings.zep_http_retry_max_seconds,
+            ),
+        )
+        client = AsyncZep(api_key=ZEP_API_KEY, httpx_client=httpx_client)
     except Exception as e:
         logger_zep_client.error(f"Falha ao inicializar o cliente Zep: {e}", exc_info=True)
-        # zep_client permanece None ou pode ser explicitamente setado para None
+        return None
+    _zep_httpx_client = httpx_client
+    logger_zep_client.info("Cliente Zep inicializado com sucesso.")
+    return client
+
+
+def get_zep_client() -> Optional[AsyncZep]:
+    """
+    Cliente Zep em uso pelo processo (None se a ZEP_API_KEY não estiver configurada).
+    Criado na primeira chamada, de modo que cada worker do servidor pre-fork tem o seu pool.
+    """
+    global zep_client
+    if zep_client is None and ZEP_API_KEY:
+        zep_client = _create_zep_client()
+    return zep_client
+
+
+def set_zep_client(client: Optional[AsyncZep]) -> None:
+    """Substitui o cliente Zep do processo (ex.: backend falso nos benchmarks offline)."""
+    global zep_client, _zep_httpx_client
+    zep_client = client
+    _zep_httpx_client = None
+
+
+async def close_zep_client() -> None:
+    """Fecha o pool de conexões do cliente criado por este módulo (shutdown da aplicação)."""
+    global zep_client, _zep_httpx_client
+    if _zep_httpx_client is None:
+        return
+    httpx_client, _zep_httpx_client = _zep_httpx_client, None
+    zep_client = None
+    await httpx_client.aclose()
+    logger_zep_client.info("Cliente Zep encerrado.")
+
+
+def _pool_connections():
+    transport = getattr(_zep_httpx_client, "_transport", None)
+    if not isinstance(transport, ZepTransport):
+        return []
+    return [((state,), count) for state, count in transport.pool_stats().items()]
+
 
+metrics_registry.callback(
+    "zep_http_pool_connections", "Conexões abertas no pool HTTP da Zep, por estado.", "gauge", ("state",), _pool_connections
+)
@@ -0,0 +1,470 @@
+# ---------------------------------------------------------------------------
+# crew/zep_context.py
+# Montagem concorrente do contexto Zep (usuário/sessão, mensagem, grafo e
+# histórico) com orçamento de tempo (deadline) por etapa.
+# ---------------------------------------------------------------------------
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Dict, List, Literal, Optional, Set, Tuple, TypeVar
+
+import pytz
+from zep_cloud.errors import NotFoundError
+from zep_cloud.types import Message as ZepMessage, RoleType
+
+from app.settings import api_settings
+from crew.context_builder import (
+    GraphFact,
+    GraphNode,
+    GraphSearchResult,
+    HistoryTurn,
+    ZepContext,
+)
+from crew.crew_metrics import observe_stage
+from crew.graph_search_cache import GraphSearchCache
+from crew.metrics import metrics_registry
+from crew.session_history_cache import SessionHistoryCache
+from crew.ttl_cache import SingleFlight, TTLCache
+from crew.zep_write_behind import ZepWriteBehindQueue
+
+logger_zep_context = logging.getLogger(__name__)
+
+ZepSearchScope = Literal["edges", "nodes"]
+ZepReranker = Literal["rrf", "mmr", "node_distance", "episode_mentions", "cross_encoder"]
+
+# Define o fuso horário de São Paulo
+SAO_PAULO_TZ = pytz.timezone("America/Sao_Paulo")
+
+T = TypeVar("T")
+
+# Usuários e sessões já confirmados na Zep. Evitam as chamadas user.get e
+# memory.get_session a cada mensagem de usuários recorrentes.
+known_zep_users: TTLCache[str, bool] = TTLCache(
+    max_size=api_settings.zep_entity_cache_max_size,
+    ttl_seconds=api_settings.zep_entity_cache_ttl_seconds,
+)
+
+# Contexto formatado da busca no grafo, compartilhado entre requisições do mesmo usuário.
+graph_search_cache = GraphSearchCache(
+    max_size=api_settings.graph_search_cache_max_size,
+    ttl_seconds=api_settings.graph_search_cache_ttl_seconds,
+    stale_after_write_seconds=api_settings.graph_search_cache_stale_after_write_seconds,
+)
+known_zep_sessions: TTLCache[str, str] = TTLCache(
+    max_size=api_settings.zep_entity_cache_max_size,
+    ttl_seconds=api_settings.zep_entity_cache_ttl_seconds,
+)
+# Últimos turnos de cada sessão, já convertidos, mantidos a cada escrita.
+session_history_cache = SessionHistoryCache(
+    max_turns=api_settings.session_history_cache_max_turns,
+    max_bytes=api_settings.session_history_cache_max_bytes,
+    ttl_seconds=api_settings.session_history_cache_ttl_seconds,
+)
+# Verificações concorrentes do mesmo usuário/sessão ainda não cacheados (ex.: vários
+# itens de um batch do mesmo usuário) compartilham uma única chamada à Zep.
+_ensure_user_flights: SingleFlight[str, None] = SingleFlight()
+_session_exists_flights: SingleFlight[str, bool] = SingleFlight()
+
+
+def _cache_stat_samples(stat_name: str):
+    caches = {
+        "zep_users": known_zep_users.stats(),
+        "zep_sessions": known_zep_sessions.stats(),
+        "graph_search": graph_search_cache.stats(),
+        "session_history": session_history_cache.stats(),
+    }
+    return [((cache_name,), stats[stat_name]) for cache_name, stats in caches.items()]
+
+
+metrics_registry.callback("crew_cache_entries", "Entradas atuais dos caches em processo.", "gauge", ("cache",), lambda: _cache_stat_samples("size"))
+metrics_registry.callback("crew_cache_hits_total", "Consultas atendidas pelos caches em processo.", "counter", ("cache",), lambda: _cache_stat_samples("hits"))
+metrics_registry.callback("crew_cache_misses_total", "Consultas não atendidas pelos caches em processo.", "counter", ("cache",), lambda: _cache_stat_samples("misses"))
+metrics_registry.callback("crew_cache_evictions_total", "Entradas despejadas por limite de tamanho.", "counter", ("cache",), lambda: _cache_stat_samples("evictions"))
+
+# Escritas na memória feitas fora do caminho crítico (iniciada/encerrada no lifespan da aplicação).
+zep_write_behind = ZepWriteBehindQueue(
+    batch_size=api_settings.zep_write_behind_batch_size,
+    flush_interval_seconds=api_settings.zep_write_behind_flush_interval_seconds,
+    max_pending=api_settings.zep_write_behind_max_pending,
+    max_retries=api_settings.zep_write_behind_max_retries,
+    retry_base_seconds=api_settings.zep_write_behind_retry_base_seconds,
+    on_written=graph_search_cache.on_user_memory_write,
+    on_dropped=session_history_cache.discard,
+)
+
+
+def graph_search_result_from_zep(search_results, scope: str, reranker: str, limit: int, query: str) -> GraphSearchResult:
+    """Converte a resposta de graph.search para o modelo imutável usado pelo ContextBuilder."""
+    nodes, facts = (), ()
+    if search_results:
+        if getattr(search_results, "nodes", None):
+            nodes = tuple(
+                GraphNode(
+                    name=node.name,
+                    uuid=node.uuid,
+                    labels=tuple(node.labels or ()),
+                    summary=node.summary,
+                    attributes=tuple((str(k), str(v)) for k, v in (node.attributes or {}).items()),
+                )
+                for node in search_results.nodes
+            )
+        if getattr(search_results, "edges", None):
+            facts = tuple(
+                GraphFact(
+                    fact=edge.fact,
+                    relation=edge.name,
+                    source_node_uuid=edge.source_node_uuid,
+                    target_node_uuid=edge.target_node_uuid,
+                    valid_at=edge.valid_at,
+                    invalid_at=edge.invalid_at,
+                )
+                for edge in search_results.edges
+            )
+    return GraphSearchResult(query=query, scope=scope, reranker=reranker, limit=limit, nodes=nodes, facts=facts)
+
+
+def history_turn_from_zep_message(msg) -> HistoryTurn:
+    """Converte uma mensagem da Zep em HistoryTurn, com o timestamp no fuso de São Paulo."""
+    created_at = None
+    if msg.created_at:
+        try:
+            created_at = datetime.fromisoformat(msg.created_at.replace("Z", "+00:00")).astimezone(SAO_PAULO_TZ)
+        except ValueError:
+            logger_zep_context.warning(f"Não foi possível parsear o timestamp: {msg.created_at}")
+
+    role_display = "Desconhecido"
+    if getattr(msg, 'role', None):
+        role_display = msg.role.capitalize()
+    elif getattr(msg, 'role_type', None):
+        if isinstance(msg.role_type, RoleType) and hasattr(msg.role_type, 'value'):
+            role_display = msg.role_type.value.capitalize()
+        else:
+            role_display = str(msg.role_type).capitalize()
+
+    return HistoryTurn(role=role_display, content=msg.content, created_at=created_at, raw_timestamp=msg.created_at)
+
+
+def history_turns_from_zep(session_messages_response) -> Tuple[HistoryTurn, ...]:
+    """Converte a resposta de get_session_messages em turnos com timestamps no fuso de São Paulo."""
+    if session_messages_response and session_messages_response.messages:
+        return tuple(history_turn_from_zep_message(msg) for msg in session_messages_response.messages)
+    return ()
+
+
+def remember_history_message(session_id: str, message: ZepMessage) -> None:
+    """Acrescenta ao cache de histórico uma mensagem gravada (ou aceita pela fila write-behind)."""
+    if message.created_at is None:
+        message = message.copy(update={"created_at": datetime.now(pytz.utc).isoformat().replace("+00:00", "Z")})
+    session_history_cache.append(session_id, history_turn_from_zep_message(message))
+
+
+def forget_session(session_id: str) -> None:
+    """Descarta o que se sabe localmente da sessão (ex.: removida na Zep ou escrita perdida)."""
+    known_zep_sessions.discard(session_id)
+    session_history_cache.discard(session_id)
+
+
+class _ContextDeadline:
+    """
+    Controla o orçamento total da montagem do contexto. Cada etapa recebe uma
+    fração do orçamento, limitada ao tempo que ainda resta até o deadline.
+    """
+    def __init__(self, total_seconds: float):
+        self._loop = asyncio.get_running_loop()
+        self._total_seconds = total_seconds
+        self._deadline = self._loop.time() + total_seconds
+
+    def timeout_for(self, fraction: float) -> float:
+        remaining = self._deadline - self._loop.time()
+        return max(0.0, min(self._total_seconds * fraction, remaining))
+
+
+async def _run_stage(
+    stage_name: str,
+    awaitable: Awaitable[T],
+    timeout: Optional[float],
+    fallback: T,
+    crew_name: str,
+    fallback_on_error: bool = False,
+) -> T:
+    """
+    Executa uma etapa com timeout (None: sem limite) e registra sua duração em
+    crew_stage_duration_seconds. Se a etapa estourar o orçamento, ela é descartada e o
+    valor de fallback é retornado. Outras exceções propagam, exceto com
+    fallback_on_error (etapas opcionais).
+    """
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        result = await asyncio.wait_for(awaitable, timeout=timeout)
+        outcome = "success"
+        return result
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        logger_zep_context.warning(f"Etapa '{stage_name}' do contexto Zep excedeu o orçamento de {timeout:.2f}s e foi descartada.")
+        return fallback
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    except Exception as e_stage:
+        if not fallback_on_error:
+            raise
+        logger_zep_context.error(f"Erro na etapa '{stage_name}' do contexto Zep: {e_stage}", exc_info=True)
+        return fallback
+    finally:
+        observe_stage(stage_name, crew_name, outcome, time.perf_counter() - start)
+
+
+# Escritas do turno do usuário que continuam depois do contexto pronto, por sessão (referência até terminarem).
+_detached_writes: Dict[str, Set["asyncio.Task[bool]"]] = {}
+
+
+def _detached(session_id: str, awaitable: Awaitable[bool]) -> "asyncio.Task[bool]":
+    """Escritas não são descartadas pelo deadline (nem canceladas com a requisição): rodam até o fim."""
+    task = asyncio.ensure_future(awaitable)
+    _detached_writes.setdefault(session_id, set()).add(task)
+
+    def on_done(done_task: "asyncio.Task[bool]") -> None:
+        session_writes = _detached_writes.get(session_id)
+        if session_writes is not None:
+            session_writes.discard(done_task)
+            if not session_writes:
+                del _detached_writes[session_id]
+        if not done_task.cancelled() and done_task.exception() is not None:
+            logger_zep_context.warning("Escrita do turno do usuário na sessão %s falhou: %s", session_id, done_task.exception())
+
+    task.add_done_callback(on_done)
+    return task
+
+
+def pending_user_turn_writes(session_id: str) -> List["asyncio.Task[bool]"]:
+    """
+    Escritas do turno do usuário (sessão e mensagem) ainda em andamento. Se o turno
+    terminar antes delas (ex.: falha no crew), o lock da sessão deve esperá-las para
+    que a próxima mensagem não passe na frente.
+    """
+    return [task for task in _detached_writes.get(session_id, ()) if not task.done()]
+
+
+async def _wait_detached(stage_name: str, task: "asyncio.Task[bool]", timeout: float, fallback: Optional[bool]) -> Optional[bool]:
+    """Espera uma escrita por até timeout segundos; depois disso ela continua em segundo plano."""
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger_zep_context.warning(f"Etapa '{stage_name}' do contexto Zep excedeu o orçamento de {timeout:.2f}s; continua em segundo plano.")
+        return fallback
+
+
+async def user_message_persisted(context: ZepContext) -> bool:
+    """
+    Espera (sem prazo) a gravação da mensagem do usuário do turno. Retorna False se
+    ela falhou: a resposta do assistente não deve ser gravada sem o turno do usuário.
+    """
+    if context.user_message_saved is None:
+        return True
+    try:
+        return await asyncio.shield(context.user_message_saved)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        return False
+
+
+async def _ensure_user(zep_client: Any, user_id: str) -> None:
+    if user_id in known_zep_users:
+        return
+    await _ensure_user_flights.do(user_id, lambda: _get_or_add_user(zep_client, user_id))
+
+
+async def _get_or_add_user(zep_client: Any, user_id: str) -> None:
+    try:
+        await zep_client.user.get(user_id)
+    except NotFoundError:
+        # Adiciona user_id como first_name e email fictício para Zep, se necessário
+        await zep_client.user.add(user_id=user_id, email=f"{user_id}@example.com", first_name=user_id)
+    known_zep_users.set(user_id, True)
+
+
+async def _session_exists(zep_client: Any, session_id: str) -> bool:
+    if session_id in known_zep_sessions:
+        return True
+    return await _session_exists_flights.do(session_id, lambda: _lookup_session(zep_client, session_id))
+
+
+async def _lookup_session(zep_client: Any, session_id: str) -> bool:
+    try:
+        session = await zep_client.memory.get_session(session_id)
+    except NotFoundError:
+        return False
+    known_zep_sessions.set(session_id, getattr(session, "user_id", None) or "")
+    return True
+
+
+async def _ensure_user_and_session(zep_client: Any, user_id: str, session_id: str) -> bool:
+    # user.get e memory.get_session são independentes; só a criação da sessão depende do usuário.
+    _, session_exists = await asyncio.gather(
+        _ensure_user(zep_client, user_id),
+        _session_exists(zep_client, session_id),
+    )
+    if not session_exists:
+        await zep_client.memory.add_session(session_id=session_id, user_id=user_id)
+        known_zep_sessions.set(session_id, user_id)
+    return True
+
+
+async def _add_user_message_when_ready(
+    session_ready: "asyncio.Task[bool]", zep_client: Any, user_id: str, session_id: str, message: str, crew_name: str,
+) -> bool:
+    if not await session_ready:
+        return False
+    return await _run_stage("zep.memory_add_user", _add_user_message(zep_client, user_id, session_id, message), None, False, crew_name)
+
+
+async def _add_user_message(zep_client: Any, user_id: str, session_id: str, message: str) -> bool:
+    user_zep_message = ZepMessage(role="User", role_type="user", content=message, user_id=user_id)
+    if api_settings.zep_write_behind_enabled:
+        # Com mensagens da sessão ainda na fila (ex.: a resposta do turno anterior), a do
+        # usuário entra atrás delas: gravada diretamente, passaria na frente.
+        has_pending = zep_write_behind.pending_count(session_id) > 0
+        if (api_settings.zep_write_behind_user_messages or has_pending) and zep_write_behind.enqueue(
+            zep_client, session_id, user_zep_message, user_id=user_id, force=has_pending
+        ):
+            logger_zep_context.info("Mensagem do usuário enfileirada para gravação na sessão %s no Zep.", session_id)
+            return True
+        if has_pending:
+            # Fila parando (shutdown): grava o que está pendente antes.
+            await zep_write_behind.flush_session(session_id)
+    try:
+        await zep_client.memory.add(session_id, messages=[user_zep_message])
+    except NotFoundError:
+        # A sessão pode ter sido removida na Zep enquanto ainda estava no cache.
+        forget_session(session_id)
+        raise
+    graph_search_cache.on_user_memory_write(user_id)
+    logger_zep_context.info("Mensagem do usuário (%d caracteres, Role: User, RoleType: user) adicionada à sessão %s no Zep.", len(message), session_id)
+    return True
+
+
+async def _search_graph(zep_client: Any, user_id: str, query: str, scope: ZepSearchScope, reranker: ZepReranker, limit: int) -> GraphSearchResult:
+    async def search() -> GraphSearchResult:
+        search_results = await zep_client.graph.search(
+            query=query, user_id=user_id, scope=scope, reranker=reranker, limit=limit
+        )
+        return graph_search_result_from_zep(search_results, scope=scope, reranker=reranker, limit=limit, query=query)
+
+    # Falhas não são cacheadas: a exceção propaga e o placeholder é usado só nesta requisição.
+    return await graph_search_cache.get_or_search(user_id, query, scope, reranker, limit, search)
+
+
+async def _fetch_history(zep_client: Any, session_id: str, history_limit: int) -> Tuple[HistoryTurn, ...]:
+    messages_response = await zep_client.memory.get_session_messages(session_id=session_id, limit=history_limit)
+    return history_turns_from_zep(messages_response)
+
+
+async def assemble_zep_context(
+    zep_client: Any,
+    user_id: str,
+    session_id: str,
+    message: str,
+    history_limit: int,
+    scope: ZepSearchScope,
+    reranker: ZepReranker,
+    limit: int,
+    crew_name: str = "unknown",
+) -> ZepContext:
+    """
+    Monta o contexto Zep como um pipeline concorrente:
+
+    - a busca no grafo começa imediatamente (depende apenas do user_id);
+    - usuário e sessão são verificados em paralelo (a sessão só é criada após o usuário);
+    - a escrita da mensagem do usuário e a leitura do histórico rodam juntas após a sessão existir.
+
+    O deadline só descarta leituras (grafo, histórico e o flush da fila write-behind).
+    A verificação de usuário/sessão e a escrita da mensagem do usuário têm uma fração
+    do orçamento para o contexto esperar por elas; passado esse tempo, o contexto segue
+    sem histórico e elas terminam em segundo plano. ZepContext.user_message_saved
+    indica o resultado da escrita, esperado (user_message_persisted) antes de gravar a
+    resposta do assistente.
+
+    Como o histórico é lido em paralelo à escrita, ele pode não conter a mensagem atual,
+    que de qualquer forma é enviada ao crew separadamente no input 'message'. Mensagens
+    de turnos anteriores ainda na fila write-behind são gravadas antes da leitura (dentro
+    do orçamento do histórico); a mensagem atual entra na fila atrás delas, então a ordem
+    na Zep é mantida mesmo se esse flush estourar o orçamento. Quando o
+    session_history_cache tem os turnos pedidos, a leitura e o flush são dispensados
+    (o cache já contém as respostas pendentes, e a mensagem atual continua entrando
+    na fila atrás delas).
+    Etapas que falham ou estouram sua fração do orçamento ficam como None no ZepContext
+    e são renderizadas com os placeholders pelo ContextBuilder. A duração de cada etapa
+    é registrada em crew_stage_duration_seconds com o label crew_name.
+    """
+    deadline = _ContextDeadline(api_settings.zep_context_deadline_seconds)
+
+    graph_task = asyncio.create_task(_run_stage(
+        "zep.graph_search",
+        _search_graph(zep_client, user_id, message, scope, reranker, limit),
+        deadline.timeout_for(api_settings.zep_graph_search_budget_fraction),
+        None,
+        crew_name,
+        fallback_on_error=True,
+    ))
+    pending_tasks = [graph_task]
+    ensure_task = _detached(session_id, _run_stage(
+        "zep.user_session_ensure", _ensure_user_and_session(zep_client, user_id, session_id), None, False, crew_name,
+    ))
+    write_task = _detached(session_id, _add_user_message_when_ready(ensure_task, zep_client, user_id, session_id, message, crew_name))
+    try:
+        session_ready = await _wait_detached(
+            "zep.user_session_ensure", ensure_task, deadline.timeout_for(api_settings.zep_ensure_budget_fraction), False,
+        )
+        if not session_ready:
+            logger_zep_context.warning(f"Usuário/sessão não confirmados a tempo; contexto sem histórico na sessão {session_id} (a mensagem do usuário será gravada em segundo plano).")
+            session_history_cache.discard(session_id)
+            return ZepContext(graph=await graph_task, history=None, history_limit=history_limit, user_message_saved=write_task)
+
+        cached_history = session_history_cache.get(session_id, history_limit)
+        # No acerto do cache não há flush: _add_user_message enfileira a mensagem atrás das pendentes.
+        if cached_history is None and zep_write_behind.pending_count(session_id):
+            # A resposta do turno anterior pode ainda não ter sido gravada; o histórico precisa dela.
+            await _run_stage(
+                "zep.write_behind_flush",
+                zep_write_behind.flush_session(session_id),
+                deadline.timeout_for(api_settings.zep_history_budget_fraction),
+                None,
+                crew_name,
+            )
+
+        write_wait = _wait_detached(
+            "zep.memory_add_user", write_task, deadline.timeout_for(api_settings.zep_user_message_budget_fraction), None,
+        )
+        if cached_history is not None:
+            history_turns = cached_history
+            graph_result, user_message_written = await asyncio.gather(graph_task, write_wait)
+        else:
+            history_task = asyncio.create_task(_run_stage(
+                "zep.get_session_messages",
+                _fetch_history(zep_client, session_id, history_limit),
+                deadline.timeout_for(api_settings.zep_history_budget_fraction),
+                None,
+                crew_name,
+                fallback_on_error=True,
+            ))
+            pending_tasks.append(history_task)
+            graph_result, history_turns, user_message_written = await asyncio.gather(graph_task, history_task, write_wait)
+            if history_turns is not None:
+                session_history_cache.fill(session_id, history_turns, history_limit)
+
+        if user_message_written:
+            # A leitura concorrente pode já ter trazido a mensagem atual; não a duplica no cache.
+            if not (history_turns and history_turns[-1].role == "User" and history_turns[-1].content == message):
+                remember_history_message(session_id, ZepMessage(role="User", role_type="user", content=message, user_id=user_id))
+        else:
+            # A mensagem ainda não chegou à Zep (ou não se sabe se chegou): o próximo turno relê o histórico.
+            session_history_cache.discard(session_id)
+        return ZepContext(graph=graph_result, history=history_turns, history_limit=history_limit, user_message_saved=write_task)
+    finally:
+        # Se alguma etapa obrigatória falhar, não deixa as leituras rodando em segundo plano (as escritas continuam).
+        for task in pending_tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,184 @@
+# ---------------------------------------------------------------------------
+# crew/zep_http.py
+# Transporte HTTP do cliente Zep: pool de conexões configurável, HTTP/2
+# opcional, timeouts por operação e retentativas com backoff para leituras.
+# ---------------------------------------------------------------------------
+import asyncio
+import logging
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+from crew.metrics import metrics_registry
+
+logger_zep_http = logging.getLogger(__name__)
+
+zep_http_requests_total = metrics_registry.counter(
+    "zep_http_requests_total", "Tentativas HTTP feitas à Zep, por operação e resultado.", ("operation", "outcome")
+)
+zep_http_request_duration_seconds = metrics_registry.histogram(
+    "zep_http_request_duration_seconds", "Duração de cada tentativa HTTP à Zep.", ("operation",)
+)
+zep_http_retries_total = metrics_registry.counter(
+    "zep_http_retries_total", "Retentativas de leituras na Zep, por operação e motivo.", ("operation", "reason")
+)
+zep_http_requests_in_flight = metrics_registry.gauge(
+    "zep_http_requests_in_flight", "Requisições HTTP à Zep em andamento (usando ou aguardando conexão do pool)."
+)
+
+# Operações chamadas pela API, identificadas por método e caminho (relativo a /api/v2).
+# Leituras são seguras para repetir; graph.search é POST, mas não altera estado.
+_OPERATIONS: Tuple[Tuple[str, "re.Pattern[str]", str, bool], ...] = (
+    ("GET", re.compile(r"/users-ordered$"), "user.list_ordered", True),
+    ("GET", re.compile(r"/users/[^/]+$"), "user.get", True),
+    ("POST", re.compile(r"/users$"), "user.add", False),
+    ("GET", re.compile(r"/sessions/[^/]+/messages$"), "memory.get_session_messages", True),
+    ("POST", re.compile(r"/sessions/[^/]+/memory$"), "memory.add", False),
+    ("GET", re.compile(r"/sessions/[^/]+$"), "memory.get_session", True),
+    ("POST", re.compile(r"/sessions$"), "memory.add_session", False),
+    ("POST", re.compile(r"/graph/search$"), "graph.search", True),
+)
+
+_RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+def classify_zep_request(method: str, path: str) -> Tuple[str, bool]:
+    """Retorna (operação, idempotente). Chamadas não mapeadas são tratadas como escrita."""
+    for operation_method, pattern, operation, idempotent in _OPERATIONS:
+        if method == operation_method and pattern.search(path):
+            return operation, idempotent
+    return "other", method in ("GET", "HEAD", "OPTIONS")
+
+
+@dataclass(frozen=True)
+class ZepRetryPolicy:
+    max_retries: int = 2
+    base_seconds: float = 0.2
+    max_seconds: float = 2.0
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Backoff exponencial com jitter ("full jitter"); respeita Retry-After dentro do teto."""
+        if retry_after is not None:
+            return min(self.max_seconds, retry_after)
+        return random.uniform(0, min(self.max_seconds, self.base_seconds * 2 ** (attempt - 1)))
+
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class ZepTransport(httpx.AsyncBaseTransport):
+    """
+    Envolve o AsyncHTTPTransport do httpx. O SDK da Zep desliga o timeout do
+    httpx quando recebe um cliente próprio, então o timeout de cada operação é
+    aplicado aqui (read_timeouts por operação, default para as demais). Leituras
+    que falham por erro de rede, timeout, 429 ou 5xx são repetidas; escritas nunca
+    (a fila write-behind já faz as retentativas das mensagens).
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncHTTPTransport,
+        timeout: httpx.Timeout,
+        read_timeouts: Dict[str, float],
+        retry_policy: ZepRetryPolicy,
+    ):
+        self._transport = transport
+        self._timeout = timeout
+        self._read_timeouts = read_timeouts
+        self._retry_policy = retry_policy
+
+    def _timeout_for(self, operation: str) -> Dict[str, Optional[float]]:
+        read_timeout = self._read_timeouts.get(operation)
+        if read_timeout is None:
+            return self._timeout.as_dict()
+        return {**self._timeout.as_dict(), "read": read_timeout}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        operation, idempotent = classify_zep_request(request.method, request.url.path)
+        request.extensions = {**request.extensions, "timeout": self._timeout_for(operation)}
+        max_retries = self._retry_policy.max_retries if idempotent else 0
+        attempt = 0
+        while True:
+            attempt += 1
+            start = time.perf_counter()
+            zep_http_requests_in_flight.inc()
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                zep_http_requests_total.inc(operation=operation, outcome=type(e).__name__)
+                if attempt > max_retries:
+                    raise
+                reason, retry_after = type(e).__name__, None
+            else:
+                zep_http_requests_total.inc(operation=operation, outcome=str(response.status_code))
+                if response.status_code not in _RETRYABLE_STATUS_CODES or attempt > max_retries:
+                    return response
+                reason, retry_after = str(response.status_code), _retry_after_seconds(response)
+                await response.aclose()
+            finally:
+                zep_http_requests_in_flight.dec()
+                zep_http_request_duration_seconds.observe(time.perf_counter() - start, operation=operation)
+
+            delay = self._retry_policy.delay(attempt, retry_after)
+            zep_http_retries_total.inc(operation=operation, reason=reason)
+            logger_zep_http.warning(f"Zep '{operation}' falhou ({reason}); tentativa {attempt + 1} em {delay:.2f}s.")
+            await asyncio.sleep(delay)
+
+    def pool_stats(self) -> Dict[str, int]:
+        """Conexões abertas no pool, separadas em ativas e ociosas."""
+        pool = getattr(self._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", ()) or ())
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {"active": len(connections) - idle, "idle": idle}
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_zep_httpx_client(
+    max_connections: int,
+    max_keepalive_connections: int,
+    keepalive_expiry_seconds: float,
+    http2: bool,
+    connect_timeout_seconds: float,
+    read_timeout_seconds: float,
+    write_timeout_seconds: float,
+    pool_timeout_seconds: float,
+    read_timeouts: Dict[str, float],
+    retry_policy: ZepRetryPolicy,
+) -> httpx.AsyncClient:
+    if http2 and not _http2_available():
+        logger_zep_http.warning("HTTP/2 habilitado para a Zep, mas o pacote 'h2' não está instalado; usando HTTP/1.1.")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry_seconds,
+    )
+    timeout = httpx.Timeout(
+        connect=connect_timeout_seconds, read=read_timeout_seconds, write=write_timeout_seconds, pool=pool_timeout_seconds
+    )
+    transport = ZepTransport(
+        httpx.AsyncHTTPTransport(limits=limits, http2=http2),
+        timeout=timeout,
+        read_timeouts=read_timeouts,
+        retry_policy=retry_policy,
+    )
+    return httpx.AsyncClient(transport=transport, timeout=timeout)
@@ -0,0 +1,222 @@
+# ---------------------------------------------------------------------------
+# crew/zep_write_behind.py
+# Fila write-behind das escritas na memória Zep: mensagens são aceitas na hora
+# e gravadas em segundo plano, em lotes por sessão, com retentativas.
+# ---------------------------------------------------------------------------
+import asyncio
+import logging
+import random
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import httpx
+from zep_cloud.types import Message as ZepMessage
+
+from crew.metrics import metrics_registry
+
+logger_zep_write_behind = logging.getLogger(__name__)
+
+write_behind_queue_depth = metrics_registry.gauge(
+    "zep_write_behind_queue_depth", "Mensagens aguardando gravação na Zep (pendentes e em envio)."
+)
+write_behind_flush_seconds = metrics_registry.histogram(
+    "zep_write_behind_flush_seconds", "Duração de cada lote gravado na Zep, incluindo retentativas."
+)
+write_behind_messages_total = metrics_registry.counter(
+    "zep_write_behind_messages_total", "Mensagens processadas pela fila write-behind, por resultado.", ("outcome",)
+)
+
+
+@dataclass
+class _SessionWrites:
+    zep_client: Any
+    messages: List[ZepMessage] = field(default_factory=list)
+    user_ids: Set[str] = field(default_factory=set)
+
+
+# O lote não chegou a ser enviado: falha ao conectar ou ao obter conexão do pool.
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _is_retryable(error: Exception) -> bool:
+    """
+    memory.add não é idempotente (como em crew/zep_http.py, escritas não são
+    repetidas às cegas): só repete respostas 429 e 5xx e erros em que o lote não
+    foi enviado. Timeouts de leitura/escrita e erros desconhecidos são ambíguos
+    (a Zep pode ter gravado) e não são repetidos, para não duplicar mensagens.
+    """
+    if isinstance(error, _NOT_SENT_ERRORS):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return isinstance(status_code, int) and (status_code == 429 or status_code >= 500)
+
+
+class ZepWriteBehindQueue:
+    """
+    Acumula mensagens por sessão e as grava com memory.add em lotes de até
+    batch_size mensagens. Cada sessão tem no máximo um envio em andamento, o que
+    preserva a ordem das mensagens. Falhas temporárias (429, 5xx e erros de
+    conexão) são repetidas com backoff exponencial (com jitter); após
+    max_retries, ou em falhas ambíguas como timeout de leitura, o lote é
+    descartado e registrado.
+
+    Enquanto a fila não está rodando (ou está cheia), enqueue retorna False e
+    quem chamou deve gravar diretamente, depois de flush_session se a sessão
+    tiver mensagens pendentes. A fila é do processo: outro worker do servidor
+    pre-fork não vê as mensagens pendentes aqui.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval_seconds: float,
+        max_pending: int,
+        max_retries: int,
+        retry_base_seconds: float,
+        on_written: Optional[Callable[[str], None]] = None,
+        on_dropped: Optional[Callable[[str], None]] = None,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self._on_written = on_written
+        self._on_dropped = on_dropped
+        self._pending: Dict[str, _SessionWrites] = {}
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._depth = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._flusher_task is not None and not self._flusher_task.done() and not self._stopping
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._flusher_task = asyncio.create_task(self._run_flusher())
+        logger_zep_write_behind.info("Fila write-behind da Zep iniciada.")
+
+    async def stop(self, timeout: float) -> None:
+        """Para o flusher e grava tudo o que estiver pendente (limitado a timeout segundos)."""
+        if self._flusher_task is None:
+            return
+        # Sinaliza a parada em vez de cancelar: o wait_for do Python 3.11 pode engolir
+        # um cancelamento que chega junto com o evento de wakeup.
+        self._stopping = True
+        self._wakeup.set()
+        await self._flusher_task
+        self._flusher_task = None
+        try:
+            await asyncio.wait_for(self.flush_all(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger_zep_write_behind.error(f"Flush da fila write-behind não terminou em {timeout:.1f}s; {self._depth} mensagens podem ter sido perdidas.")
+        logger_zep_write_behind.info("Fila write-behind da Zep encerrada.")
+
+    def enqueue(self, zep_client: Any, session_id: str, message: ZepMessage, user_id: Optional[str] = None, force: bool = False) -> bool:
+        """
+        Aceita a mensagem para gravação em segundo plano. Retorna False se não foi aceita.
+        force ignora max_pending: para mensagens que precisam ficar atrás das já pendentes da sessão.
+        """
+        if not self.running or (self._depth >= self.max_pending and not force):
+            return False
+        session_writes = self._pending.get(session_id)
+        if session_writes is None:
+            session_writes = self._pending[session_id] = _SessionWrites(zep_client=zep_client)
+        session_writes.messages.append(message)
+        if user_id:
+            session_writes.user_ids.add(user_id)
+        self._depth += 1
+        write_behind_queue_depth.set(self._depth)
+        if len(session_writes.messages) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def pending_count(self, session_id: str) -> int:
+        session_writes = self._pending.get(session_id)
+        return (len(session_writes.messages) if session_writes else 0) + (1 if session_id in self._in_flight else 0)
+
+    async def flush_session(self, session_id: str) -> None:
+        """Aguarda até que as mensagens já aceitas para a sessão tenham sido gravadas (ou descartadas)."""
+        in_flight = self._in_flight.get(session_id)
+        if in_flight is not None:
+            await asyncio.shield(in_flight)
+        if session_id in self._pending and session_id not in self._in_flight:
+            self._start_flush(session_id)
+        next_flush = self._in_flight.get(session_id)
+        if next_flush is not None and next_flush is not in_flight:
+            await asyncio.shield(next_flush)
+
+    async def flush_all(self) -> None:
+        while self._pending or self._in_flight:
+            for session_id in list(self._pending):
+                if session_id not in self._in_flight:
+                    self._start_flush(session_id)
+            if self._in_flight:
+                await asyncio.gather(*[asyncio.shield(task) for task in list(self._in_flight.values())], return_exceptions=True)
+
+    async def _run_flusher(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            for session_id in list(self._pending):
+                if session_id not in self._in_flight:
+                    self._start_flush(session_id)
+
+    def _start_flush(self, session_id: str) -> None:
+        session_writes = self._pending.pop(session_id)
+        task = asyncio.create_task(self._write_session(session_id, session_writes))
+        self._in_flight[session_id] = task
+        task.add_done_callback(lambda done: self._on_flush_done(session_id, done))
+
+    def _on_flush_done(self, session_id: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(session_id) is task:
+            del self._in_flight[session_id]
+
+    async def _write_session(self, session_id: str, session_writes: _SessionWrites) -> None:
+        messages = session_writes.messages
+        for start in range(0, len(messages), self.batch_size):
+            batch = messages[start:start + self.batch_size]
+            try:
+                written = await self._write_batch(session_writes.zep_client, session_id, batch)
+            finally:
+                self._depth -= len(batch)
+                write_behind_queue_depth.set(self._depth)
+            write_behind_messages_total.inc(len(batch), outcome="written" if written else "dropped")
+            if not written and self._on_dropped is not None:
+                self._on_dropped(session_id)
+        if self._on_written is not None:
+            for user_id in session_writes.user_ids:
+                self._on_written(user_id)
+
+    async def _write_batch(self, zep_client: Any, session_id: str, batch: List[ZepMessage]) -> bool:
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+        attempt = 0
+        try:
+            while True:
+                try:
+                    await zep_client.memory.add(session_id, messages=batch)
+                    logger_zep_write_behind.info(f"{len(batch)} mensagem(ns) gravada(s) na sessão {session_id} no Zep.")
+                    return True
+                except Exception as e_add:
+                    attempt += 1
+                    if attempt > self.max_retries or not _is_retryable(e_add):
+                        logger_zep_write_behind.error(
+                            f"Descartando {len(batch)} mensagem(ns) da sessão {session_id} após {attempt} tentativa(s): {e_add}",
+                            exc_info=True,
+                        )
+                        return False
+                    delay = self.retry_base_seconds * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+                    logger_zep_write_behind.warning(f"Falha ao gravar lote da sessão {session_id} (tentativa {attempt}); nova tentativa em {delay:.2f}s: {e_add}")
+                    await asyncio.sleep(delay)
+        finally:
+            write_behind_flush_seconds.observe(loop.time() - started_at)
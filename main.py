@@ -1,7 +1,11 @@
 # ---------------------------------------------------------------------------
 # main.py
 # Arquivo principal para iniciar a aplicação FastAPI com Uvicorn.
+# Sem argumentos, sobe o servidor pre-fork de produção (app/server.py);
+# com --reload, um único processo com reload automático para desenvolvimento.
 # ---------------------------------------------------------------------------
+import sys
+
 import uvicorn
 from dotenv import load_dotenv
 
@@ -10,4 +14,8 @@ load_dotenv()
 from app.main import app
 
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    if "--reload" in sys.argv[1:]:
+        uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    else:
+        from app.server import main as run_prefork_server
+        run_prefork_server()
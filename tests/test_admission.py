@@ -0,0 +1,88 @@
+# ---------------------------------------------------------------------------
+# tests/test_admission.py
+# Testes unitários do controle de admissão adaptativo de /v1/create_crew/.
+# ---------------------------------------------------------------------------
+import asyncio
+
+import pytest
+
+from app.admission import AdaptiveConcurrencyLimiter, AdmissionRejectedError
+
+
+def test_limite_sobe_com_latencia_estavel_e_cai_quando_ela_dispara():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, min_limit=2, max_limit=6)
+    for _ in range(20):
+        limiter.on_sample(1.0, in_flight=limiter.limit)
+    assert limiter.limit == 6
+
+    for _ in range(10):
+        limiter.on_sample(5.0, in_flight=limiter.limit)
+    assert limiter.limit == 2
+
+    # Sem uso do limite (poucas execuções em andamento), ele não cresce.
+    for _ in range(20):
+        limiter.on_sample(limiter.baseline_latency, in_flight=0)
+    assert limiter.limit == 2
+
+
+@pytest.mark.asyncio
+async def test_fila_limitada_recusa_e_libera_vagas_em_ordem():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1, max_limit=1, queue_size=1, queue_timeout_seconds=1.0)
+    order = []
+    release = asyncio.Event()
+
+    async def run(name: str):
+        async with limiter.admit():
+            order.append(name)
+            await release.wait()
+
+    first = asyncio.create_task(run("primeira"))
+    await asyncio.sleep(0)
+    queued = asyncio.create_task(run("na fila"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejectedError) as rejected:
+        await run("recusada")
+    assert rejected.value.reason == "queue_full" and limiter.queue_depth == 1
+
+    release.set()
+    await asyncio.gather(first, queued)
+    assert order == ["primeira", "na fila"] and limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_espera_na_fila_expira():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1, max_limit=1, queue_size=5, queue_timeout_seconds=0.05)
+    async with limiter.admit():
+        with pytest.raises(AdmissionRejectedError) as rejected:
+            async with limiter.admit():
+                pass
+    assert rejected.value.reason == "queue_timeout"
+    assert limiter.queue_depth == 0 and limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_execucao_em_segundo_plano_espera_a_vaga_sem_ocupar_a_fila():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1, max_limit=1, queue_size=1, queue_timeout_seconds=0.05)
+    release = asyncio.Event()
+    order = []
+
+    async def run(name: str, background: bool):
+        async with limiter.admit(background=background):
+            order.append(name)
+            await release.wait()
+
+    first = asyncio.create_task(run("primeira", False))
+    await asyncio.sleep(0)
+    background = [asyncio.create_task(run(f"lote {n}", True)) for n in range(3)]
+    await asyncio.sleep(0.1)
+    # Passou do queue_timeout e a fila (tamanho 1) ainda aceita uma síncrona.
+    assert not any(task.done() for task in background) and limiter.queue_depth == 3
+    synchronous = asyncio.create_task(run("síncrona", False))
+    await asyncio.sleep(0)
+    assert limiter.queue_depth == 4
+
+    release.set()
+    await asyncio.gather(first, synchronous, *background)
+    assert sorted(order) == sorted(["primeira", "síncrona", "lote 0", "lote 1", "lote 2"])
+    assert limiter.in_flight == 0 and limiter.queue_depth == 0
@@ -0,0 +1,56 @@
+# ---------------------------------------------------------------------------
+# tests/test_batch.py
+# Testes unitários da execução de lotes do endpoint /v1/create_crew/batch.
+# ---------------------------------------------------------------------------
+import asyncio
+
+import pytest
+
+from app.batch import iter_batch_results
+
+
+@pytest.mark.asyncio
+async def test_itens_da_mesma_sessao_em_ordem_e_concorrencia_limitada():
+    """Sessões diferentes rodam em paralelo até o limite; a mesma sessão roda na ordem enviada."""
+    items = [("s1", "a"), ("s2", "b"), ("s1", "c"), ("s3", "d"), ("s1", "e")]
+    running, max_running, executed = 0, 0, []
+
+    async def run_item(item):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        executed.append(item)
+        if item[1] == "d":
+            raise ValueError("crew inválido")
+        return item[1].upper()
+
+    outcomes = [outcome async for outcome in iter_batch_results(items, lambda item: item[0], run_item, concurrency=2)]
+
+    assert max_running == 2
+    assert sorted(outcome.index for outcome in outcomes) == [0, 1, 2, 3, 4]
+    assert [item for item in executed if item[0] == "s1"] == [("s1", "a"), ("s1", "c"), ("s1", "e")]
+    failed = [outcome for outcome in outcomes if outcome.error is not None]
+    assert [outcome.index for outcome in failed] == [3] and isinstance(failed[0].error, ValueError)
+    assert {outcome.index: outcome.result for outcome in outcomes if outcome.error is None}[4] == "E"
+
+
+@pytest.mark.asyncio
+async def test_fechar_o_gerador_cancela_itens_em_andamento():
+    """Se o cliente desconecta, os itens ainda em execução são cancelados."""
+    cancelled = []
+
+    async def run_item(item):
+        try:
+            await asyncio.sleep(0 if item == 0 else 10)
+        except asyncio.CancelledError:
+            cancelled.append(item)
+            raise
+        return item
+
+    outcomes = iter_batch_results([0, 1, 2], lambda item: item, run_item, concurrency=3)
+    first = await outcomes.__anext__()
+    await outcomes.aclose()
+    assert first.index == 0
+    assert sorted(cancelled) == [1, 2]
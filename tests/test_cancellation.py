@@ -0,0 +1,89 @@
+# ---------------------------------------------------------------------------
+# tests/test_cancellation.py
+# Testes unitários do cancelamento por desconexão do cliente e por prazo.
+# ---------------------------------------------------------------------------
+import asyncio
+
+import pytest
+from crewai.utilities.events import LLMCallStartedEvent, crewai_event_bus
+from starlette.requests import Request
+
+from app.cancellation import (
+    ClientDisconnected,
+    RequestDeadlineExceeded,
+    crew_requests_cancelled_total,
+    parse_request_deadline,
+    run_until_disconnect_or_deadline,
+)
+from crew.run_cancellation import CrewRunCancelled, RunCancellation, crew_cancelled_calls_skipped_total
+
+
+def _request(disconnect_after: float = 3600.0) -> Request:
+    async def receive():
+        await asyncio.sleep(disconnect_after)
+        return {"type": "http.disconnect"}
+
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": []}, receive)
+
+
+def _cancelled(reason: str) -> float:
+    return dict(crew_requests_cancelled_total.samples()).get((reason,), 0)
+
+
+@pytest.mark.asyncio
+async def test_prazo_expirado_cancela_a_execucao():
+    started, cancelled = asyncio.Event(), asyncio.Event()
+
+    async def work():
+        started.set()
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    before = _cancelled("deadline_exceeded")
+    with pytest.raises(RequestDeadlineExceeded):
+        await run_until_disconnect_or_deadline(_request(), work(), deadline_seconds=0.05)
+    assert started.is_set() and cancelled.is_set()
+    assert _cancelled("deadline_exceeded") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_desconexao_com_requisicoes_aguardando_mantem_a_execucao():
+    """Com keep_running() verdadeiro (retentativas aguardando a mesma chave), a execução segue."""
+    finished = asyncio.Event()
+
+    async def work():
+        await asyncio.sleep(0.1)
+        finished.set()
+
+    with pytest.raises(ClientDisconnected):
+        await run_until_disconnect_or_deadline(_request(disconnect_after=0.01), work(), None, keep_running=lambda: True)
+    await asyncio.wait_for(finished.wait(), timeout=1)
+
+
+def test_prazo_do_header_limitado_pela_configuracao():
+    assert parse_request_deadline(None, 0) is None
+    assert parse_request_deadline("30", 0) == 30
+    assert parse_request_deadline("30", 10) == 10
+    for invalid in ("abc", "0", "-1", "inf"):
+        with pytest.raises(ValueError):
+            parse_request_deadline(invalid, 0)
+
+
+@pytest.mark.asyncio
+async def test_kickoff_cancelado_para_na_proxima_chamada_ao_llm():
+    """A thread do kickoff (contexto copiado por asyncio.to_thread) é interrompida pelo event bus."""
+    cancellation = RunCancellation("t_cancel")
+
+    def kickoff():
+        crewai_event_bus.emit(None, LLMCallStartedEvent(messages="primeira"))
+        cancellation.cancel()
+        crewai_event_bus.emit(None, LLMCallStartedEvent(messages="segunda"))
+        return "não chega aqui"
+
+    with cancellation.bind():
+        with pytest.raises(CrewRunCancelled):
+            await asyncio.to_thread(kickoff)
+    assert dict(crew_cancelled_calls_skipped_total.samples())[("t_cancel", "llm_call")] == 1
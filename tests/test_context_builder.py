@@ -0,0 +1,57 @@
+# ---------------------------------------------------------------------------
+# tests/test_context_builder.py
+# Testes unitários da montagem do contexto Zep com orçamento de tokens.
+# ---------------------------------------------------------------------------
+from datetime import datetime
+
+from crew.context_builder import (
+    ContextBudget,
+    ContextBuilder,
+    GraphFact,
+    GraphSearchResult,
+    HistoryTurn,
+    ZepContext,
+    estimate_tokens,
+)
+
+
+def _fact(text: str, invalid_at: str = None) -> GraphFact:
+    return GraphFact(
+        fact=text, relation="RELACAO", source_node_uuid="uuid-origem", target_node_uuid="uuid-destino",
+        valid_at="2024-05-01T12:00:00Z", invalid_at=invalid_at,
+    )
+
+
+def _context(facts, turns) -> ZepContext:
+    graph = GraphSearchResult(query="oi", scope="edges", reranker="rrf", limit=5, facts=tuple(facts))
+    history = tuple(
+        HistoryTurn(role="User", content=content, created_at=datetime(2024, 5, 1, 9, minute)) for minute, content in enumerate(turns)
+    )
+    return ZepContext(graph=graph, history=history, history_limit=10)
+
+
+def test_modo_compacto_omite_uuids_e_remove_fatos_repetidos():
+    """O modo compacto não deve levar UUIDs ao prompt nem repetir o mesmo fato."""
+    zep_context = _context([_fact("Usuário mora em Recife"), _fact("usuário mora em recife"), _fact("Usuário gosta de café")], ["oi"])
+    rendered = ContextBuilder(ContextBudget(max_tokens=0, render_mode="compact")).build(zep_context)
+
+    assert "uuid-origem" not in rendered
+    assert rendered.count("mora em Recife") == 1
+    assert "- Usuário gosta de café (desde 2024-05-01)" in rendered
+    assert len(rendered) < len(zep_context.render())
+
+
+def test_orcamento_prioriza_fatos_validos_e_turnos_mais_recentes():
+    """Com orçamento curto, os turnos mais antigos saem primeiro e fatos invalidados vão para o fim."""
+    facts = [_fact("Fato antigo já invalidado", invalid_at="2024-06-01T00:00:00Z"), _fact("Fato atual")]
+    turns = [f"mensagem número {index} " + "x" * 100 for index in range(10)]
+    budget = ContextBudget(max_tokens=200, graph_share=0.3, render_mode="compact")
+    rendered = ContextBuilder(budget).build(_context(facts, turns))
+
+    assert estimate_tokens(rendered) <= budget.max_tokens
+    # Fatos invalidados vão para o fim da fila do grafo.
+    assert rendered.index("Fato atual") < rendered.index("Fato antigo")
+    assert "mensagem número 9" in rendered
+    assert "mensagem número 0" not in rendered
+    # Os turnos mantidos continuam em ordem cronológica.
+    assert rendered.index("mensagem número 8") < rendered.index("mensagem número 9")
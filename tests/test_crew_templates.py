@@ -0,0 +1,29 @@
+# ---------------------------------------------------------------------------
+# tests/test_crew_templates.py
+# Testes unitários das cópias por requisição do template compilado do crew.
+# ---------------------------------------------------------------------------
+from crew.crew_templates import crew_templates
+
+
+def test_copias_concorrentes_nao_compartilham_llm_nem_ferramentas():
+    """stream e o contador de uso das ferramentas são de cada cópia; o template fica intacto."""
+    template = crew_templates.compile("basic")
+    template_agent = template.agents[0]
+    template_stream = getattr(template_agent.llm, "stream", False)
+
+    streaming = crew_templates.instantiate("basic", stream=True)
+    plain = crew_templates.instantiate("basic")
+    streaming_agent, plain_agent = streaming.agents[0], plain.agents[0]
+
+    assert streaming_agent.llm is not plain_agent.llm
+    assert streaming_agent.llm.stream is True
+    assert getattr(plain_agent.llm, "stream", False) == template_stream
+    assert getattr(template_agent.llm, "stream", False) == template_stream
+
+    assert streaming_agent.tools and plain_agent.tools
+    assert streaming_agent.tools is not plain_agent.tools
+    for streaming_tool, plain_tool, template_tool in zip(streaming_agent.tools, plain_agent.tools, template_agent.tools):
+        assert streaming_tool is not plain_tool and streaming_tool is not template_tool
+        streaming_tool.current_usage_count += 1
+        assert plain_tool.current_usage_count == 0
+        assert template_tool.current_usage_count == 0
@@ -0,0 +1,129 @@
+# ---------------------------------------------------------------------------
+# tests/test_fair_scheduler.py
+# Testes unitários da divisão justa entre tenants no controle de admissão.
+# ---------------------------------------------------------------------------
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import app.routes.agents as agents_routes
+from app.admission import AdaptiveConcurrencyLimiter, AdmissionRejectedError
+from app.batch import iter_batch_results
+from app.fair_scheduler import FairShareQueue
+from app.routes.agents import CreateCrewRequest
+
+
+def _limiter(limit: int, **tenant_options) -> AdaptiveConcurrencyLimiter:
+    return AdaptiveConcurrencyLimiter(
+        initial_limit=limit, min_limit=limit, max_limit=limit, queue_size=100, queue_timeout_seconds=5.0,
+        tenant_queue=FairShareQueue(**tenant_options),
+    )
+
+
+async def _collect(outcomes) -> list:
+    return [outcome async for outcome in outcomes]
+
+
+@pytest.mark.asyncio
+async def test_tenant_ruidoso_nao_deixa_os_demais_esperando_a_fila_toda():
+    limiter = _limiter(1)
+    order = []
+    release = asyncio.Event()
+
+    async def run(tenant: str):
+        async with limiter.admit(tenant):
+            order.append(tenant)
+            await release.wait()
+
+    tasks = [asyncio.create_task(run("ruidoso")) for _ in range(6)]
+    await asyncio.sleep(0)
+    tasks += [asyncio.create_task(run("outro")) for _ in range(2)]
+    await asyncio.sleep(0)
+    assert limiter.tenants.tenant_stats()["ruidoso"]["queued"] == 5
+    release.set()
+    await asyncio.gather(*tasks)
+
+    assert order[:4].count("outro") == 2
+    assert len(limiter.tenants.tenant_stats()) == 0
+
+
+@pytest.mark.asyncio
+async def test_limite_de_concorrencia_por_tenant():
+    limiter = _limiter(4, max_concurrency_per_tenant=1, max_queued_per_tenant=1)
+    release = asyncio.Event()
+
+    async def run(tenant: str):
+        async with limiter.admit(tenant):
+            await release.wait()
+
+    first = asyncio.create_task(run("a"))
+    queued = asyncio.create_task(run("a"))
+    other = asyncio.create_task(run("b"))
+    await asyncio.sleep(0.01)
+    assert limiter.in_flight == 2 and limiter.tenants.tenant_stats()["a"]["queued"] == 1
+
+    with pytest.raises(AdmissionRejectedError) as rejected:
+        await run("a")
+    assert rejected.value.reason == "tenant_queue_full" and rejected.value.status_code == 429
+
+    release.set()
+    await asyncio.gather(first, queued, other)
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_limite_de_taxa_por_tenant():
+    limiter = _limiter(4, rate_per_second=0.5, rate_burst=1)
+    async with limiter.admit("a"):
+        pass
+    async with limiter.admit("b"):
+        pass
+
+    with pytest.raises(AdmissionRejectedError) as rejected:
+        async with limiter.admit("a"):
+            pass
+    assert rejected.value.reason == "tenant_rate_limited" and rejected.value.retry_after_seconds == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_de_um_tenant_nao_atrasa_a_chamada_sincrona_de_outro(monkeypatch):
+    """Itens de batch passam pelo mesmo controle de admissão, mas não tomam a vez nem a fila da chamada síncrona."""
+    limiter = _limiter(1)
+    limiter.queue_size = 1
+    order = []
+
+    async def execute_crew(user_id, **kwargs):
+        order.append(user_id)
+        await asyncio.sleep(0.01)
+        return user_id
+
+    async def load_crew_executor():
+        return SimpleNamespace(execute_crew=execute_crew)
+
+    monkeypatch.setattr(agents_routes, "admission_limiter", limiter)
+    monkeypatch.setattr(agents_routes, "load_crew_executor", load_crew_executor)
+    monkeypatch.setattr(agents_routes.api_settings, "admission_enabled", True)
+
+    def request(user_id: str, session_id: str) -> CreateCrewRequest:
+        return CreateCrewRequest(crew_name="basic", message="oi", user_id=user_id, session_id=session_id)
+
+    batch_items = [request("lote", f"s{n}") for n in range(8)]
+    outcomes = iter_batch_results(
+        batch_items, lambda item: item.session_id, lambda item: agents_routes.run_crew_request(item, background=True), concurrency=8
+    )
+    batch = asyncio.create_task(asyncio.wait_for(_collect(outcomes), timeout=5))
+    await asyncio.sleep(0.001)
+    assert limiter.queue_depth == 7
+
+    assert await agents_routes.run_crew_request(request("outro", "s-outro")) == "outro"
+    assert order.index("outro") == 1
+    assert all(outcome.error is None for outcome in await batch)
+
+
+def test_metricas_por_tenant_so_tem_label_proprio_para_tenants_configurados():
+    queue = FairShareQueue(weights={"vip": 2.0})
+    for tenant in ("vip", "a", "b"):
+        queue.started(tenant)
+
+    assert dict(queue.samples("in_flight")) == {("vip",): 1, ("other",): 2}
@@ -0,0 +1,37 @@
+# ---------------------------------------------------------------------------
+# tests/test_graph_search_cache.py
+# Testes unitários do cache da busca no grafo Zep.
+# ---------------------------------------------------------------------------
+import asyncio
+
+import pytest
+
+from crew.graph_search_cache import GraphSearchCache, normalize_query
+
+
+def test_normalize_query_ignora_variacoes_triviais():
+    """Caixa, pontuação e espaços extras não devem gerar chaves diferentes."""
+    assert normalize_query("  Qual o status do meu PEDIDO? ") == normalize_query("qual o status  do meu pedido")
+
+
+@pytest.mark.asyncio
+async def test_buscas_concorrentes_identicas_compartilham_uma_chamada():
+    """Buscas idênticas concorrentes devem resultar em uma única chamada à Zep."""
+    cache = GraphSearchCache(max_size=10, ttl_seconds=60, stale_after_write_seconds=5)
+    calls = 0
+
+    async def search():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "contexto"
+
+    results = await asyncio.gather(*[
+        cache.get_or_search("user_1", "Oi!", "edges", "rrf", 5, search) for _ in range(5)
+    ])
+    assert results == ["contexto"] * 5
+    assert calls == 1
+
+    # Uma nova busca após a primeira deve vir do cache.
+    assert await cache.get_or_search("user_1", "oi", "edges", "rrf", 5, search) == "contexto"
+    assert calls == 1
@@ -0,0 +1,67 @@
+# ---------------------------------------------------------------------------
+# tests/test_idempotency.py
+# Testes unitários das chaves de idempotência de /v1/create_crew/.
+# ---------------------------------------------------------------------------
+import asyncio
+
+import pytest
+
+from app.idempotency import (
+    IdempotencyKeyConflictError,
+    IdempotencyManager,
+    InMemoryIdempotencyStore,
+    SQLiteIdempotencyStore,
+    request_fingerprint,
+)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("store_kind", ["memory", "sqlite"])
+async def test_retentativas_se_juntam_a_execucao_e_depois_recebem_replay(store_kind, tmp_path):
+    """Retentativas concorrentes compartilham a execução; as posteriores recebem a resposta armazenada."""
+    if store_kind == "sqlite":
+        store_factory = lambda: SQLiteIdempotencyStore(str(tmp_path / "idempotency.sqlite3"), max_entries=10)
+    else:
+        store_factory = lambda: InMemoryIdempotencyStore(max_entries=10, ttl_seconds=60)
+    manager = IdempotencyManager(store_factory=store_factory, ttl_seconds=60)
+    await manager.start()
+    runs = 0
+
+    async def run_crew():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.01)
+        return {"status": "success", "result": {"raw": "resposta"}}
+
+    fingerprint = request_fingerprint({"message": "oi", "session_id": "s1"})
+    concurrent = await asyncio.gather(*[manager.run("chave", fingerprint, run_crew) for _ in range(3)])
+    assert runs == 1
+    assert [replayed for _, replayed in concurrent].count(False) == 1
+
+    body, replayed = await manager.run("chave", fingerprint, run_crew)
+    assert replayed and body["result"]["raw"] == "resposta"
+    assert runs == 1
+
+    with pytest.raises(IdempotencyKeyConflictError):
+        await manager.run("chave", request_fingerprint({"message": "outra", "session_id": "s1"}), run_crew)
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_falhas_nao_sao_armazenadas():
+    """Após um erro, a retentativa com a mesma chave deve executar novamente."""
+    manager = IdempotencyManager(store_factory=lambda: InMemoryIdempotencyStore(max_entries=10, ttl_seconds=60), ttl_seconds=60)
+    await manager.start()
+    attempts = 0
+
+    async def flaky():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise RuntimeError("LLM indisponível")
+        return {"status": "success"}
+
+    with pytest.raises(RuntimeError):
+        await manager.run("chave", "fp", flaky)
+    assert await manager.run("chave", "fp", flaky) == ({"status": "success"}, False)
+    await manager.stop()
@@ -0,0 +1,165 @@
+# ---------------------------------------------------------------------------
+# tests/test_jobs.py
+# Testes unitários da fila de jobs assíncronos (backpressure, cancelamento,
+# jobs interrompidos por shutdown ou reinício).
+# ---------------------------------------------------------------------------
+import asyncio
+
+import pytest
+from crewai.crews.crew_output import CrewOutput
+from crewai.tasks.task_output import TaskOutput
+from crewai.types.usage_metrics import UsageMetrics
+
+import app.routes.jobs as jobs_routes
+from app.jobs import InMemoryJobStore, JobManager, JobQueueFullError, JobRecord, SQLiteJobStore
+from app.routes.agents import CreateCrewRequest, CreateCrewResponse
+
+
+async def _wait_status(manager: JobManager, job_id: str, status: str) -> JobRecord:
+    for _ in range(200):
+        job = await manager.get(job_id)
+        if job.status == status:
+            return job
+        await asyncio.sleep(0.005)
+    raise AssertionError(f"job {job_id} não chegou a '{status}' (está '{job.status}')")
+
+
+def _manager(runner, workers: int = 1, max_queue_depth: int = 1, store_factory=None) -> JobManager:
+    return JobManager(
+        store_factory=store_factory or (lambda: InMemoryJobStore(ttl_seconds=60)),
+        runner=runner, workers=workers, max_queue_depth=max_queue_depth,
+    )
+
+
+@pytest.mark.asyncio
+async def test_fila_cheia_retorna_429_com_retry_after(monkeypatch):
+    release = asyncio.Event()
+
+    async def runner(request):
+        await release.wait()
+        return {"ok": True}
+
+    manager = _manager(runner)
+    await manager.start()
+    running = await manager.submit({"n": 1})
+    await _wait_status(manager, running.job_id, "running")
+    await manager.submit({"n": 2})
+    with pytest.raises(JobQueueFullError):
+        await manager.submit({"n": 3})
+
+    monkeypatch.setattr(jobs_routes, "job_manager", manager)
+    request = CreateCrewRequest(crew_name="basic", message="oi", user_id="u", session_id="s")
+    response = await jobs_routes.submit_job_endpoint(request)
+    assert response.status_code == 429 and int(response.headers["Retry-After"]) >= 1
+
+    release.set()
+    assert (await _wait_status(manager, running.job_id, "succeeded")).result == {"ok": True}
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_cancelamento_de_job_em_execucao_e_na_fila():
+    started, cancelled, executed = asyncio.Event(), asyncio.Event(), []
+
+    async def runner(request):
+        executed.append(request["n"])
+        started.set()
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    manager = _manager(runner, max_queue_depth=2)
+    await manager.start()
+    running = await manager.submit({"n": 1})
+    queued = await manager.submit({"n": 2})
+    await started.wait()
+
+    assert (await manager.cancel(queued.job_id)).status == "cancelled"
+    assert (await manager.cancel(running.job_id)).status == "cancelled"
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    await asyncio.sleep(0.01)
+    assert executed == [1]
+    assert (await manager.get(running.job_id)).status == "cancelled"
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_cancelamento_de_job_de_outro_worker_nao_acumula_ids(tmp_path):
+    """Só jobs na fila deste processo entram em _cancelled_job_ids; stop sem start não falha."""
+    await _manager(None).stop()
+
+    path = str(tmp_path / "jobs.sqlite3")
+    release = asyncio.Event()
+
+    async def runner(request):
+        await release.wait()
+        return {"ok": True}
+
+    owner = _manager(runner, max_queue_depth=2, store_factory=lambda: SQLiteJobStore(path, ttl_seconds=60))
+    other = _manager(runner, store_factory=lambda: SQLiteJobStore(path, ttl_seconds=60))
+    await owner.start()
+    await other.start()
+    running = await owner.submit({"n": 1})
+    queued = await owner.submit({"n": 2})
+    await _wait_status(owner, running.job_id, "running")
+
+    assert (await other.cancel(queued.job_id)).status == "cancelled"
+    assert other._cancelled_job_ids == set()
+
+    release.set()
+    await _wait_status(owner, running.job_id, "succeeded")
+    await owner._queue.join()
+    assert (await owner.get(queued.job_id)).status == "cancelled"
+    assert owner._queued_job_ids == set() and owner._cancelled_job_ids == set()
+    await other.stop()
+    await owner.stop()
+
+
+@pytest.mark.asyncio
+async def test_jobs_interrompidos_no_shutdown_e_orfaos_no_startup(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    started = asyncio.Event()
+
+    async def runner(request):
+        started.set()
+        await asyncio.sleep(3600)
+
+    manager = _manager(runner, max_queue_depth=5, store_factory=lambda: SQLiteJobStore(path, ttl_seconds=60))
+    await manager.start()
+    running = await manager.submit({"n": 1})
+    queued = await manager.submit({"n": 2})
+    await started.wait()
+    await asyncio.wait_for(manager.stop(), timeout=5)
+
+    store = SQLiteJobStore(path, ttl_seconds=60)
+    for job_id in (running.job_id, queued.job_id):
+        job = await store.get(job_id)
+        assert job.status == "failed" and job.error["error_type"] == "interrupted"
+    # Processo morto sem shutdown: o job fica "running" até o próximo startup.
+    await store.save(JobRecord(job_id="orfao", status="running", request={}, worker_pid=2 ** 22 + 1))
+    await store.close()
+
+    restarted = _manager(runner, store_factory=lambda: SQLiteJobStore(path, ttl_seconds=60))
+    await restarted.start()
+    orphan = await restarted.get("orfao")
+    assert orphan.status == "failed" and orphan.error["error_type"] == "interrupted"
+    await restarted.stop()
+
+
+@pytest.mark.asyncio
+async def test_resultado_do_job_tem_o_formato_do_endpoint_sincrono(monkeypatch):
+    """O resultado gravado pelo job é um CreateCrewResponse, como o de /create_crew/."""
+    task = TaskOutput(description="tarefa", raw="Olá!", agent="agente", expected_output="saudação")
+
+    async def fake_run_crew_request(request, background=False):
+        assert background
+        return CrewOutput(raw=task.raw, tasks_output=[task], token_usage=UsageMetrics(total_tokens=7))
+
+    monkeypatch.setattr(jobs_routes, "run_crew_request", fake_run_crew_request)
+    request = CreateCrewRequest(crew_name="basic", message="oi", user_id="u", session_id="s")
+    result = await jobs_routes._run_crew_job(request.model_dump())
+    response = CreateCrewResponse(**result)
+    assert response.status == "success"
+    assert result["result"]["raw"] == "Olá!" and result["result"]["token_usage"]["total_tokens"] == 7
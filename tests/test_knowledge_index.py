@@ -0,0 +1,55 @@
+# ---------------------------------------------------------------------------
+# tests/test_knowledge_index.py
+# Testes unitários da recuperação local (trechos, índice BM25 em mmap).
+# ---------------------------------------------------------------------------
+from crew.knowledge_index import KNOWLEDGE_CONTEXT_EMPTY, chunk_markdown, load_knowledge_index, render_knowledge_context
+
+DOC = """# Agents
+
+## Memory
+
+Agents can keep short-term memory between tasks.
+
+## Tools
+
+```python
+# Not a heading
+agent = Agent(tools=[search])
+```
+
+Tools let agents search the web. Set max_iter to limit tool loops.
+"""
+
+
+def test_trechos_seguem_as_secoes_e_ignoram_titulos_em_codigo():
+    chunks = chunk_markdown(DOC, "doc.mdx", max_chunk_chars=1000)
+
+    assert [chunk.section for chunk in chunks] == ["Agents > Memory", "Agents > Tools"]
+    assert "# Not a heading" in chunks[1].text
+
+
+def test_busca_bm25_e_reconstrucao_quando_a_fonte_muda(tmp_path):
+    source = tmp_path / "doc.mdx"
+    source.write_text(DOC, encoding="utf-8")
+    index_dir = str(tmp_path / "index")
+
+    index = load_knowledge_index([str(source)], index_dir, max_chunk_chars=1000)
+    results = index.search("Como limitar o max_iter das ferramentas (tools)?", top_k=2)
+    assert results[0].section == "Agents > Tools"
+    assert index.search("previsão do tempo", top_k=2) == []
+    assert load_knowledge_index([str(source)], index_dir, max_chunk_chars=1000) is index
+
+    source.write_text(DOC + "\n## Flows\n\nFlows orchestrate crews with state.\n", encoding="utf-8")
+    rebuilt = load_knowledge_index([str(source)], index_dir, max_chunk_chars=1000)
+    assert rebuilt is not index and rebuilt.documents == 3
+    assert rebuilt.search("flows state", top_k=1)[0].section == "Agents > Flows"
+
+
+def test_contexto_respeita_o_orcamento(tmp_path):
+    source = tmp_path / "doc.mdx"
+    source.write_text(DOC, encoding="utf-8")
+    snippets = load_knowledge_index([str(source)], str(tmp_path / "index"), 1000).search("agents memory tools", top_k=2)
+
+    assert render_knowledge_context([], max_tokens=600) == KNOWLEDGE_CONTEXT_EMPTY
+    assert render_knowledge_context(snippets, max_tokens=40).count("- [doc.mdx >") == 1
+    assert render_knowledge_context(snippets, max_tokens=0).count("- [doc.mdx >") == 2
@@ -0,0 +1,81 @@
+# ---------------------------------------------------------------------------
+# tests/test_llm_cache.py
+# Testes unitários do cache de completions do LLM (store e CachedLLM).
+# ---------------------------------------------------------------------------
+import copy
+import time
+
+from crewai.llms.base_llm import BaseLLM
+
+from crew.cached_llm import CachedLLM
+from crew.llm_cache import CachedCompletion, InMemoryCompletionStore, SQLiteCompletionStore, llm_cache_requests_total
+
+
+class CountingLLM(BaseLLM):
+    def __init__(self, answer: str):
+        super().__init__(model="fake/model", temperature=0.0)
+        self.answer = answer
+        self.calls = 0
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        self.calls += 1
+        return self.answer
+
+
+def _outcomes(crew_name: str) -> dict:
+    return {labels[1]: value for labels, value in llm_cache_requests_total.samples() if labels[0] == crew_name}
+
+
+def test_prompt_identico_e_servido_do_cache():
+    """A segunda chamada com as mesmas mensagens e parâmetros não chega ao LLM."""
+    inner = CountingLLM("Thought: ok\nFinal Answer: Olá!")
+    llm = CachedLLM(inner, crew_name="t_hit", ttl_seconds=60, store=InMemoryCompletionStore(100))
+    messages = [{"role": "user", "content": "Oi"}]
+
+    assert llm.call(messages) == llm.call(messages) == inner.answer
+    assert inner.calls == 1
+    inner.temperature = 0.7
+    llm.call(messages)
+    assert inner.calls == 2
+    assert _outcomes("t_hit") == {"miss": 2, "hit": 1}
+
+
+def test_chamadas_com_ferramentas_nao_sao_cacheadas():
+    """Resposta que pede ferramenta não é gravada; prompt com resultado de ferramenta é ignorado."""
+    inner = CountingLLM("Thought: preciso buscar\nAction: Search\nAction Input: {}")
+    llm = CachedLLM(inner, crew_name="t_tools", ttl_seconds=60, store=InMemoryCompletionStore(100))
+    messages = [{"role": "user", "content": "Notícias de hoje?"}]
+    llm.call(messages)
+    llm.call(messages)
+
+    observed = messages + [{"role": "assistant", "content": "Action: Search\nObservation: resultado"}]
+    inner.answer = "Final Answer: pronto"
+    llm.call(observed)
+    llm.call(observed)
+
+    assert inner.calls == 4
+    assert _outcomes("t_tools") == {"miss": 2, "bypass": 2}
+
+
+def test_copia_por_requisicao_nao_altera_o_llm_do_template():
+    """Agent.copy faz copy.copy do LLM e ajusta stop/stream na cópia."""
+    inner = CountingLLM("Final Answer: x")
+    template_llm = CachedLLM(inner, crew_name="t_copy", ttl_seconds=60, store=InMemoryCompletionStore(100))
+    request_llm = copy.copy(template_llm)
+    request_llm.stop = ["\nObservation:"]
+
+    assert request_llm.stop == ["\nObservation:"] and template_llm.stop == [] and inner.stop == []
+    assert isinstance(request_llm, BaseLLM) and request_llm.model == "fake/model"
+
+
+def test_sqlite_store_respeita_ttl_e_limite_de_entradas(tmp_path):
+    store = SQLiteCompletionStore(str(tmp_path / "llm_cache.sqlite3"), max_entries=2)
+    store.put("a", CachedCompletion(text="A", tokens=10), ttl_seconds=60)
+    store.put("expira", CachedCompletion(text="E", tokens=1), ttl_seconds=0.01)
+    time.sleep(0.02)
+    store.put("b", CachedCompletion(text="B", tokens=20), ttl_seconds=60)
+    store.put("c", CachedCompletion(text="C", tokens=30), ttl_seconds=60)
+
+    assert store.get("expira") is None and store.get("a") is None
+    assert store.get("c") == CachedCompletion(text="C", tokens=30)
+    store.close()
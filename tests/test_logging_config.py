@@ -0,0 +1,73 @@
+# ---------------------------------------------------------------------------
+# tests/test_logging_config.py
+# Testes unitários do logging em fila (formato JSON, amostragem e descarte).
+# ---------------------------------------------------------------------------
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+
+import app.logging_config as logging_config
+from app.logging_config import JsonFormatter, NonBlockingQueueHandler, SamplingFilter, log_records_dropped_total
+
+
+def _record(name: str, level: int, msg: str, *args, **attrs) -> logging.LogRecord:
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(attrs)
+    return record
+
+
+def test_json_formatter_inclui_campos_extra_e_excecao():
+    """Campos passados em extra= viram chaves do JSON; a exceção é formatada."""
+    try:
+        raise RuntimeError("falhou")
+    except RuntimeError:
+        record = logging.LogRecord("crew.x", logging.ERROR, __file__, 1, "crew %s", ("basic",), exc_info=sys.exc_info())
+    record.session_id = "s1"
+
+    payload = json.loads(JsonFormatter().format(record))
+
+    assert payload["level"] == "ERROR" and payload["logger"] == "crew.x"
+    assert payload["message"] == "crew basic" and payload["session_id"] == "s1"
+    assert "RuntimeError: falhou" in payload["exception"]
+
+
+def test_amostragem_usa_o_prefixo_mais_especifico_e_nao_descarta_avisos():
+    """Só DEBUG/INFO são amostrados; loggers filhos herdam a taxa do pai."""
+    sampling = SamplingFilter({"uvicorn.access": 0.0, "crew": 0.0, "crew.zep_context": 1.0}, rng=random.Random(1))
+
+    assert not sampling.filter(_record("uvicorn.access", logging.INFO, "GET /"))
+    assert not sampling.filter(_record("crew.crew_executor", logging.INFO, "x"))
+    assert sampling.filter(_record("crew.zep_context", logging.INFO, "x"))
+    assert sampling.filter(_record("crew.crew_executor", logging.WARNING, "x"))
+    assert sampling.filter(_record("app.main", logging.INFO, "x"))
+
+
+def test_fila_cheia_descarta_sem_bloquear():
+    """Com a fila cheia o registro é descartado e contado; a mensagem é resolvida antes de enfileirar."""
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    dropped_before = dict(log_records_dropped_total.samples()).get(("queue_full",), 0)
+    args = {"n": 1}
+
+    handler.handle(_record("app", logging.INFO, "primeiro %(n)s", args))
+    args["n"] = 2
+    handler.handle(_record("app", logging.INFO, "segundo"))
+
+    assert handler.queue.get_nowait().msg == "primeiro 1"
+    assert dict(log_records_dropped_total.samples())[("queue_full",)] == dropped_before + 1
+
+
+def test_stop_logging_ignora_stream_ja_fechado(monkeypatch, tmp_path):
+    """No atexit o stream de saída pode já estar fechado; o flush não deve levantar exceção."""
+    stream = open(tmp_path / "saida.log", "w", encoding="utf-8")
+    output_handler = logging.StreamHandler(stream)
+    listener = logging.handlers.QueueListener(queue.Queue(), output_handler)
+    listener.start()
+    stream.close()
+    monkeypatch.setattr(logging_config, "_listener", listener)
+    monkeypatch.setattr(logging_config, "_output_handlers", [output_handler])
+
+    logging_config.stop_logging()
+    assert logging_config._listener is None
@@ -0,0 +1,60 @@
+# ---------------------------------------------------------------------------
+# tests/test_metrics.py
+# Testes unitários do registro de métricas e da exposição no formato Prometheus.
+# ---------------------------------------------------------------------------
+import os
+
+from crew.metrics import MetricsRegistry, MultiprocessMetrics, render_prometheus_text
+
+
+def test_exposicao_prometheus_de_histograma_contador_e_callback():
+    """Histogramas devem sair com buckets cumulativos, +Inf, _sum e _count; labels escapados."""
+    registry = MetricsRegistry()
+    histogram = registry.histogram("etapa_seconds", "Duração da etapa.", ("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="zep")
+    histogram.observe(0.5, stage="zep")
+    histogram.observe(5.0, stage="zep")
+    registry.counter("requisicoes_total", "Requisições.", ("crew_name",)).inc(crew_name='basic "v2"')
+    registry.callback("fila_profundidade", "Itens na fila.", "gauge", (), lambda: [((), 3)])
+
+    text = render_prometheus_text(registry)
+
+    assert "# TYPE etapa_seconds histogram" in text
+    assert 'etapa_seconds_bucket{stage="zep",le="0.1"} 1' in text
+    assert 'etapa_seconds_bucket{stage="zep",le="1.0"} 2' in text
+    assert 'etapa_seconds_bucket{stage="zep",le="+Inf"} 3' in text
+    assert 'etapa_seconds_count{stage="zep"} 3' in text
+    assert 'requisicoes_total{crew_name="basic \\"v2\\""} 1.0' in text
+    assert "fila_profundidade 3.0" in text
+
+
+def _worker_registry(requests: int, in_flight: int, latencies) -> MetricsRegistry:
+    registry = MetricsRegistry()
+    registry.counter("requisicoes_total", "Requisições.").inc(requests)
+    registry.gauge("em_andamento", "Em andamento.").set(in_flight)
+    histogram = registry.histogram("latencia_seconds", "Latência.", buckets=(0.1, 1.0))
+    for latency in latencies:
+        histogram.observe(latency)
+    return registry
+
+
+def test_metricas_agregadas_entre_workers(tmp_path):
+    """Contadores e histogramas somam todos os workers (inclusive os que saíram); gauges, só os vivos."""
+    # Worker que já saiu (pid inexistente), com snapshot gravado antes de sair.
+    MultiprocessMetrics(_worker_registry(5, 7, [0.5]), str(tmp_path), pid=2 ** 22 + 1).write()
+
+    # Este worker herdou 2 requisições do mestre no fork: descontadas a partir de start().
+    registry = _worker_registry(2, 0, [])
+    local = MultiprocessMetrics(registry, str(tmp_path), pid=os.getpid())
+    local._baseline = {("requisicoes_total", ()): 2.0}
+    registry.counter("requisicoes_total", "Requisições.").inc(3)
+    registry.gauge("em_andamento", "Em andamento.").set(1)
+    registry.histogram("latencia_seconds", "Latência.").observe(0.05)
+
+    text = local.render()
+
+    assert "requisicoes_total 8.0" in text
+    assert "em_andamento 1.0" in text
+    assert 'latencia_seconds_bucket{le="0.1"} 1' in text
+    assert 'latencia_seconds_bucket{le="1.0"} 2' in text
+    assert "latencia_seconds_count 2" in text
@@ -0,0 +1,97 @@
+# ---------------------------------------------------------------------------
+# tests/test_prefork_server.py
+# Teste do servidor pre-fork: workers compartilham o socket e são
+# substituídos quando morrem.
+# ---------------------------------------------------------------------------
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+_SERVER_SCRIPT = """
+import sys
+from app.server import PreforkServer
+
+async def app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    import os
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": str(os.getpid()).encode()})
+
+server = PreforkServer(app, host="127.0.0.1", port=0, workers=2, graceful_timeout_seconds=5, log_level="warning")
+server.bind()
+print(server.address[1], flush=True)
+sys.exit(server.run())
+"""
+
+
+def _worker_pids(client: httpx.Client, attempts: int = 40) -> set:
+    # Connection: close força uma conexão nova por requisição, distribuída entre os workers.
+    return {client.get("/", headers={"Connection": "close"}).text for _ in range(attempts)}
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requer os.fork")
+def test_worker_que_morre_e_substituido_e_sigterm_encerra_todos():
+    """Um worker morto é substituído por outro pid e o SIGTERM no mestre encerra tudo."""
+    master = subprocess.Popen([sys.executable, "-c", _SERVER_SCRIPT], stdout=subprocess.PIPE, text=True, cwd=os.getcwd())
+    try:
+        port = int(master.stdout.readline())
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            deadline = time.monotonic() + 10
+            while True:
+                try:
+                    client.get("/")
+                    break
+                except httpx.TransportError:
+                    assert time.monotonic() < deadline
+                    time.sleep(0.1)
+
+            killed_pid = int(client.get("/").text)
+            os.kill(killed_pid, signal.SIGKILL)
+            deadline = time.monotonic() + 10
+            while True:
+                try:
+                    pids = _worker_pids(client)
+                    if str(killed_pid) not in pids and len(pids) == 2:
+                        break
+                except httpx.TransportError:
+                    pass
+                assert time.monotonic() < deadline, "worker morto não foi substituído"
+                time.sleep(0.2)
+
+        master.send_signal(signal.SIGTERM)
+        assert master.wait(timeout=15) == 0
+    finally:
+        if master.poll() is None:
+            master.kill()
+
+
+def test_configure_workers_compartilha_estado_entre_workers_sem_valor_explicito(monkeypatch):
+    from app.server import configure_workers
+    from app.settings import api_settings
+
+    adjusted = {"zep_write_behind_enabled", "session_history_cache_max_bytes", "job_store", "idempotency_store"}
+    for name in ("server_workers", "session_lock_dir", "metrics_multiprocess_dir", *adjusted):
+        monkeypatch.setattr(api_settings, name, getattr(api_settings, name))
+    monkeypatch.setattr(api_settings, "job_store", "memory")
+    monkeypatch.setattr(api_settings, "idempotency_store", "memory")
+    monkeypatch.setattr(api_settings, "__pydantic_fields_set__", set(api_settings.model_fields_set) - adjusted)
+    monkeypatch.setattr(api_settings, "session_lock_dir", "")
+    monkeypatch.setattr(api_settings, "metrics_multiprocess_dir", "")
+
+    temporary_dirs = configure_workers(2)
+    try:
+        # Write-behind e cache de histórico continuam ligados: o lock entre processos os mantém corretos.
+        assert api_settings.session_history_cache_max_bytes > 0
+        assert api_settings.zep_write_behind_enabled is True
+        assert api_settings.job_store == "sqlite" and api_settings.idempotency_store == "sqlite"
+        assert set(temporary_dirs) == {api_settings.session_lock_dir, api_settings.metrics_multiprocess_dir}
+    finally:
+        for directory in temporary_dirs:
+            shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,80 @@
+# ---------------------------------------------------------------------------
+# tests/test_responses.py
+# Testes unitários da projeção, serialização e compressão da resposta de /v1/create_crew/.
+# ---------------------------------------------------------------------------
+import gzip
+import json
+import threading
+
+import pytest
+from crewai.crews.crew_output import CrewOutput
+from crewai.tasks.task_output import TaskOutput
+from crewai.types.usage_metrics import UsageMetrics
+from fastapi.encoders import jsonable_encoder
+
+import app.responses as responses
+from app.responses import choose_encoding, crew_result_to_dict, json_response, parse_fields
+from app.settings import api_settings
+
+
+def _crew_output() -> CrewOutput:
+    task = TaskOutput(description="tarefa", raw="Olá! " * 400, agent="agente", expected_output="saudação")
+    return CrewOutput(raw=task.raw, tasks_output=[task], token_usage=UsageMetrics(total_tokens=42))
+
+
+def test_projecao_de_campos():
+    output = _crew_output()
+
+    assert crew_result_to_dict(output) == jsonable_encoder(output)
+    assert crew_result_to_dict(output, parse_fields("token_usage, raw")) == {
+        "token_usage": output.token_usage.model_dump(), "raw": output.raw,
+    }
+    with pytest.raises(ValueError):
+        parse_fields("raw,segredo")
+
+
+def test_negociacao_de_codificacao():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, identity") is None
+    assert choose_encoding("*") in ("br", "gzip")
+    assert choose_encoding(None) is None
+
+
+@pytest.mark.asyncio
+async def test_corpo_grande_e_comprimido_se_o_cliente_aceitar():
+    body = {"status": "success", "result": crew_result_to_dict(_crew_output(), ("raw",))}
+
+    compressed = await json_response(body, "gzip")
+    assert compressed.headers["content-encoding"] == "gzip" and compressed.headers["vary"] == "Accept-Encoding"
+    assert json.loads(gzip.decompress(compressed.body)) == body
+    assert "content-encoding" not in (await json_response(body, None)).headers
+    assert "content-encoding" not in (await json_response({"status": "success"}, "gzip")).headers
+
+
+@pytest.mark.asyncio
+async def test_corpo_acima_do_limite_e_comprimido_fora_do_event_loop(monkeypatch):
+    """A partir de response_compression_offload_min_bytes a compressão roda em uma thread."""
+    body = {"status": "success", "result": crew_result_to_dict(_crew_output(), ("raw",))}
+    loop_thread = threading.get_ident()
+    compress_threads = []
+    original_compress = responses._compress
+
+    def tracking_compress(data, encoding):
+        compress_threads.append(threading.get_ident())
+        return original_compress(data, encoding)
+
+    monkeypatch.setattr(responses, "_compress", tracking_compress)
+    monkeypatch.setattr(api_settings, "response_compression_offload_min_bytes", 10 ** 9)
+    await json_response(body, "gzip")
+    monkeypatch.setattr(api_settings, "response_compression_offload_min_bytes", 1024)
+    offloaded = await json_response(body, "gzip")
+
+    assert compress_threads[0] == loop_thread and compress_threads[1] != loop_thread
+    assert json.loads(gzip.decompress(offloaded.body)) == body
+
+
+def test_openapi_documenta_o_modelo_da_resposta_de_create_crew():
+    from app.main import app
+
+    response_200 = app.openapi()["paths"]["/v1/create_crew/"]["post"]["responses"]["200"]
+    assert response_200["content"]["application/json"]["schema"] == {"$ref": "#/components/schemas/CreateCrewResponse"}
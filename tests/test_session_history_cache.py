@@ -0,0 +1,56 @@
+# ---------------------------------------------------------------------------
+# tests/test_session_history_cache.py
+# Testes unitários do cache write-through de histórico por sessão.
+# ---------------------------------------------------------------------------
+from crew.context_builder import HistoryTurn
+from crew.session_history_cache import SessionHistoryCache
+
+
+def _turn(content: str, role: str = "User") -> HistoryTurn:
+    return HistoryTurn(role=role, content=content, created_at=None, raw_timestamp=None)
+
+
+def test_historico_completo_atende_qualquer_limite_e_append_mantem_a_ordem():
+    """Sessão com menos turnos que o pedido está completa; appends entram no fim."""
+    cache = SessionHistoryCache(max_turns=10, max_bytes=1024 * 1024, ttl_seconds=60)
+    assert cache.get("s1", 5) is None
+
+    cache.fill("s1", [_turn("a"), _turn("b", "Ai assistant")], requested_limit=5)
+    cache.append("s1", _turn("c"))
+    cache.append("outra", _turn("ignorada"))
+
+    assert [turn.content for turn in cache.get("s1", 2)] == ["b", "c"]
+    assert [turn.content for turn in cache.get("s1", 8)] == ["a", "b", "c"]
+    assert len(cache) == 1 and cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_historico_parcial_so_atende_limites_que_cobre():
+    """Se a Zep devolveu exatamente o limite, pode haver turnos mais antigos: limite maior é miss."""
+    cache = SessionHistoryCache(max_turns=3, max_bytes=1024 * 1024, ttl_seconds=60)
+    cache.fill("s1", [_turn("a"), _turn("b")], requested_limit=2)
+    assert cache.get("s1", 3) is None
+
+    cache.fill("s2", [_turn("a"), _turn("b")], requested_limit=5)
+    cache.append("s2", _turn("c"))
+    cache.append("s2", _turn("d"))  # ring buffer cheio: descarta "a" e deixa de estar completo
+
+    assert [turn.content for turn in cache.get("s2", 3)] == ["b", "c", "d"]
+    assert cache.get("s2", 4) is None
+
+
+def test_lru_por_memoria_total_e_ttl():
+    """Excedido max_bytes, a sessão menos usada sai primeiro; entradas expiradas são miss."""
+    now = [0.0]
+    cache = SessionHistoryCache(max_turns=10, max_bytes=1500, ttl_seconds=30, clock=lambda: now[0])
+    cache.fill("s1", [_turn("x" * 100)], requested_limit=5)
+    cache.fill("s2", [_turn("y" * 100)], requested_limit=5)
+    cache.get("s1", 5)
+    cache.fill("s3", [_turn("z" * 100)], requested_limit=5)
+
+    assert cache.get("s2", 5) is None
+    assert cache.get("s1", 5) is not None and cache.get("s3", 5) is not None
+    assert cache.stats()["evictions"] == 1 and cache.size_bytes <= 1500
+
+    now[0] = 31.0
+    assert cache.get("s1", 5) is None
+    assert len(cache) == 1
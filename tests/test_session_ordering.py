@@ -0,0 +1,150 @@
+# ---------------------------------------------------------------------------
+# tests/test_session_ordering.py
+# Testes unitários da ordenação por sessão: serialização, limite de espera
+# (429), agrupamento de mensagens e lock entre processos.
+# ---------------------------------------------------------------------------
+import asyncio
+
+import pytest
+
+from app.batch import BatchItemOutcome
+from app.routes.agents import CreateCrewRequest, _batch_item_line
+from crew.context_builder import HistoryTurn
+from crew.session_history_cache import SessionHistoryCache
+from crew.session_ordering import SessionBusyError, SessionCoalescer, SessionLocks
+
+
+async def _turn(locks: SessionLocks, session_id: str, name: str, log: list, seconds: float = 0.02) -> None:
+    async with locks.acquire(session_id):
+        log.append(("início", name))
+        await asyncio.sleep(seconds)
+        log.append(("fim", name))
+
+
+@pytest.mark.asyncio
+async def test_turnos_da_mesma_sessao_em_sequencia_e_sessoes_diferentes_em_paralelo():
+    locks, log = SessionLocks(max_waiters=8), []
+
+    await asyncio.gather(_turn(locks, "s1", "a", log), _turn(locks, "s1", "b", log), _turn(locks, "s2", "c", log))
+
+    same_session = [event for event in log if event[1] in ("a", "b")]
+    assert same_session == [("início", "a"), ("fim", "a"), ("início", "b"), ("fim", "b")]
+    assert log.index(("início", "c")) < log.index(("fim", "a"))
+    assert len(locks) == 0
+
+
+@pytest.mark.asyncio
+async def test_excesso_de_espera_na_sessao_e_rejeitado_com_429():
+    locks, log = SessionLocks(max_waiters=1), []
+    running = asyncio.create_task(_turn(locks, "s1", "a", log, seconds=0.05))
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(_turn(locks, "s1", "b", log))
+    await asyncio.sleep(0)
+
+    with pytest.raises(SessionBusyError) as busy:
+        await _turn(locks, "s1", "c", log)
+    await asyncio.gather(running, waiting)
+
+    request = CreateCrewRequest(crew_name="basic", message="c", user_id="u", session_id="s1")
+    line = _batch_item_line(BatchItemOutcome(index=2, item=request, error=busy.value))
+    assert line["status_code"] == 429 and line["error_type"] == "SessionBusyError"
+
+
+@pytest.mark.asyncio
+async def test_mensagens_pendentes_sao_agrupadas_em_uma_execucao():
+    locks = SessionLocks(max_waiters=8)
+    coalescer = SessionCoalescer(locks)
+    runs = []
+
+    async def run(message: str) -> str:
+        runs.append(message)
+        await asyncio.sleep(0.02)
+        return message.upper()
+
+    first = asyncio.create_task(coalescer.submit("s1", "s1", "um", run))
+    await asyncio.sleep(0)
+    results = await asyncio.gather(first, *[coalescer.submit("s1", "s1", message, run) for message in ("dois", "três")])
+
+    assert runs == ["um", "dois\ntrês"]
+    assert results == ["UM", "DOIS\nTRÊS", "DOIS\nTRÊS"]
+
+
+@pytest.mark.asyncio
+async def test_mensagens_com_parametros_diferentes_nao_sao_agrupadas_e_mantem_a_ordem():
+    """Só o último lote aberto, com a mesma batch_key, aceita mensagens; as demais rodam em ordem."""
+    locks = SessionLocks(max_waiters=8)
+    coalescer = SessionCoalescer(locks)
+    runs = []
+
+    def run_with(params: str):
+        async def run(message: str) -> str:
+            runs.append((params, message))
+            await asyncio.sleep(0.02)
+            return message
+        return run
+
+    first = asyncio.create_task(coalescer.submit("s1", ("s1", 10), "um", run_with("limite 10")))
+    await asyncio.sleep(0)
+    await asyncio.gather(
+        first,
+        coalescer.submit("s1", ("s1", 10), "dois", run_with("limite 10")),
+        coalescer.submit("s1", ("s1", 50), "três", run_with("limite 50")),
+        coalescer.submit("s1", ("s1", 10), "quatro", run_with("limite 10")),
+        coalescer.submit("s1", ("s1", 10), "cinco", run_with("limite 10")),
+    )
+
+    assert runs == [("limite 10", "um"), ("limite 10", "dois"), ("limite 50", "três"), ("limite 10", "quatro\ncinco")]
+
+
+@pytest.mark.asyncio
+async def test_lock_entre_processos_serializa_instancias_com_o_mesmo_diretorio(tmp_path):
+    """Dois SessionLocks com o mesmo lock_dir se comportam como dois workers do servidor pre-fork."""
+    worker_a = SessionLocks(max_waiters=8, lock_dir=str(tmp_path))
+    worker_b = SessionLocks(max_waiters=8, lock_dir=str(tmp_path))
+    log = []
+
+    await asyncio.gather(_turn(worker_a, "s1", "a", log), _turn(worker_b, "s1", "b", log))
+
+    assert [kind for kind, _ in log] == ["início", "fim", "início", "fim"]
+
+
+@pytest.mark.asyncio
+async def test_lock_so_e_liberado_depois_das_escritas_pendentes(tmp_path):
+    """Com release_barrier, o próximo turno (de qualquer worker) espera as escritas do anterior."""
+    written = asyncio.Event()
+    log = []
+
+    async def pending_writes():
+        await asyncio.sleep(0.05)
+        log.append("escrita do turno a")
+        written.set()
+
+    worker_a = SessionLocks(max_waiters=8, lock_dir=str(tmp_path), release_barrier=lambda session_id: pending_writes())
+    worker_b = SessionLocks(max_waiters=8, lock_dir=str(tmp_path))
+
+    await _turn(worker_a, "s1", "a", log, seconds=0)
+    # O turno "a" terminou (a resposta já saiu), mas o lock segue preso até a escrita.
+    assert not written.is_set()
+    await _turn(worker_b, "s1", "b", log, seconds=0)
+
+    assert log == [("início", "a"), ("fim", "a"), "escrita do turno a", ("início", "b"), ("fim", "b")]
+    assert len(worker_a) == 0
+
+
+@pytest.mark.asyncio
+async def test_geracao_do_lock_indica_escrita_de_outro_worker(tmp_path):
+    history_cache = SessionHistoryCache(max_turns=10, max_bytes=1024 * 1024, ttl_seconds=900)
+    worker_a = SessionLocks(
+        max_waiters=8, lock_dir=str(tmp_path),
+        on_file_lock=history_cache.observe_generation, on_file_unlock=history_cache.set_generation,
+    )
+    worker_b = SessionLocks(max_waiters=8, lock_dir=str(tmp_path))
+
+    async with worker_a.acquire("s1"):
+        history_cache.fill("s1", [HistoryTurn(role="User", content="oi", created_at=None)], requested_limit=5)
+    async with worker_a.acquire("s1"):
+        assert history_cache.get("s1", 5) is not None  # nenhum outro worker escreveu
+    async with worker_b.acquire("s1"):
+        pass
+    async with worker_a.acquire("s1"):
+        assert history_cache.get("s1", 5) is None  # o worker b passou pela sessão: o cache foi descartado
@@ -0,0 +1,125 @@
+# ---------------------------------------------------------------------------
+# tests/test_stream.py
+# Testes do endpoint SSE /v1/create_crew/stream com os backends falsos de
+# benchmarks/fakes.py (AsyncZep em memória e LLM stub).
+# ---------------------------------------------------------------------------
+import asyncio
+import json
+import uuid
+
+import httpx
+import pytest
+from starlette.requests import Request
+
+import app.main as app_main
+import app.routes.agents as agents_routes
+from app.admission import AdaptiveConcurrencyLimiter
+from app.routes.agents import CreateCrewRequest, create_crew_stream_endpoint
+from benchmarks.fakes import FakeAsyncZep, FakeLatency, FakeLLM
+from crew.crew_templates import crew_templates
+from crew.zep_client import set_zep_client
+
+HEADERS = {"Authorization": "Bearer token-de-teste"}
+
+
+@pytest.fixture
+def fake_backends(monkeypatch):
+    monkeypatch.setattr(app_main, "BEARER_TOKEN", "token-de-teste")
+    fake_zep = FakeAsyncZep(latency=FakeLatency(0.0, 0.0))
+    set_zep_client(fake_zep)
+    fake_llm = FakeLLM(FakeLatency(0.0, 0.0), answer="Resposta do stream.")
+    for template_agent in crew_templates.compile("basic").agents:
+        template_agent.llm = fake_llm
+    yield fake_zep, fake_llm
+    set_zep_client(None)
+
+
+def _payload(message: str = "Olá, tudo bem?") -> dict:
+    return {"crew_name": "basic", "message": message, "user_id": "u-stream", "session_id": f"s-{uuid.uuid4().hex}"}
+
+
+def _parse_sse(text: str) -> list:
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+async def _post_stream(payload: dict) -> httpx.Response:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app_main.app), base_url="http://teste", timeout=30) as client:
+        return await client.post("/v1/create_crew/stream", json=payload, headers=HEADERS)
+
+
+@pytest.mark.asyncio
+async def test_eventos_sse_do_contexto_ao_resultado(fake_backends):
+    fake_zep, _ = fake_backends
+    response = await _post_stream(_payload())
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(response.text)
+    names = [name for name, _ in events]
+    assert names[0] == "context_ready" and names[-1] == "result"
+    assert events[0][1]["zep_context_len"] > 0
+    assert events[-1][1]["raw"] == "Resposta do stream."
+    # Mensagem do usuário e resposta do assistente gravadas (sem fila write-behind fora do lifespan).
+    assert fake_zep.calls["memory.add"] == 2
+
+
+@pytest.mark.asyncio
+async def test_falha_do_crew_vira_evento_error(fake_backends):
+    _, fake_llm = fake_backends
+    fake_llm.latency = FakeLatency(0.0, 0.0, failure_rate=1.0)
+    response = await _post_stream(_payload())
+
+    assert response.status_code == 200
+    name, data = _parse_sse(response.text)[-1]
+    assert name == "error" and data["error_type"] == "FakeLLMError"
+
+
+@pytest.mark.asyncio
+async def test_crew_invalido_retorna_400_antes_do_stream(fake_backends):
+    response = await _post_stream({**_payload(), "crew_name": "inexistente"})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_desconexao_interrompe_o_stream_sem_gravar_a_resposta(fake_backends):
+    fake_zep, fake_llm = fake_backends
+    fake_llm.latency = FakeLatency(0.5, 0.0)
+    disconnected = False
+
+    async def receive():
+        if disconnected:
+            return {"type": "http.disconnect"}
+        await asyncio.sleep(3600)
+
+    http_request = Request({"type": "http", "method": "POST", "path": "/v1/create_crew/stream", "headers": []}, receive)
+    response = await create_crew_stream_endpoint(CreateCrewRequest(**_payload()), http_request)
+
+    chunks = []
+    async for chunk in response.body_iterator:
+        chunks.append(chunk)
+        disconnected = True
+
+    assert len(chunks) == 1 and chunks[0].startswith("event: context_ready")
+    # Só a mensagem do usuário: o kickoff foi abandonado e a resposta não vai para a Zep.
+    await asyncio.sleep(0.6)
+    assert fake_zep.calls["memory.add"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_sem_vaga_de_admissao_retorna_503(fake_backends, monkeypatch):
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1, max_limit=1, queue_size=0)
+    monkeypatch.setattr(agents_routes, "admission_limiter", limiter)
+    monkeypatch.setattr(agents_routes.api_settings, "admission_enabled", True)
+
+    async with limiter.admit("outro"):
+        response = await _post_stream(_payload())
+    assert response.status_code == 503 and "Retry-After" in response.headers
+
+    response = await _post_stream(_payload())
+    assert response.status_code == 200 and limiter.in_flight == 0
@@ -0,0 +1,71 @@
+# ---------------------------------------------------------------------------
+# tests/test_tool_cache.py
+# Testes unitários do cache das ferramentas dos crews.
+# ---------------------------------------------------------------------------
+import threading
+import time
+
+import pytest
+from crewai.tools import BaseTool
+
+from crew.tool_cache import TokenBucket, ToolRateLimitError, cached_tool, tool_calls_total
+
+
+class SlowSearchTool(BaseTool):
+    name: str = "Busca de teste"
+    description: str = "Busca simulada."
+    calls: int = 0
+    fail: bool = False
+
+    def _run(self, search_query: str) -> str:
+        self.calls += 1
+        time.sleep(0.05)
+        if self.fail:
+            raise RuntimeError("provedor indisponível")
+        return f"resultados para {search_query}"
+
+
+def _outcomes(tool_name: str) -> dict:
+    return {labels[1]: value for labels, value in tool_calls_total.samples() if labels[0] == tool_name}
+
+
+def test_consultas_equivalentes_e_concorrentes_compartilham_uma_chamada():
+    """Consultas que só diferem em caixa/espaços usam o cache; concorrentes idênticas, uma única execução."""
+    inner = SlowSearchTool(name="busca_concorrente")
+    tool = cached_tool(inner, ttl_seconds=60, rate_limit_per_second=0)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(tool.run(search_query="Notícia X"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert tool.run(search_query="  notícia   x ") == "resultados para Notícia X"
+    assert inner.calls == 1 and len(results) == 5
+    assert _outcomes("busca_concorrente") == {"miss": 1, "shared": 4, "hit": 1}
+
+
+def test_erros_nao_sao_cacheados():
+    inner = SlowSearchTool(name="busca_com_erro", fail=True)
+    tool = cached_tool(inner, ttl_seconds=60, rate_limit_per_second=0)
+    with pytest.raises(RuntimeError):
+        tool.run(search_query="x")
+    inner.fail = False
+
+    assert tool.run(search_query="x") == "resultados para x"
+    assert inner.calls == 2
+
+
+def test_token_bucket_espera_e_recusa_acima_da_espera_maxima():
+    """Após o burst, cada chamada espera 1/rate; se a espera passar do máximo, falha sem esperar."""
+    now, sleeps = [0.0], []
+    bucket = TokenBucket(rate_per_second=2.0, burst=2, clock=lambda: now[0], sleep=sleeps.append)
+
+    assert bucket.acquire(max_wait_seconds=1.0) == 0.0
+    assert bucket.acquire(max_wait_seconds=1.0) == 0.0
+    assert bucket.acquire(max_wait_seconds=1.0) == pytest.approx(0.5)
+    with pytest.raises(ToolRateLimitError):
+        bucket.acquire(max_wait_seconds=0.9)
+    now[0] = 10.0
+    assert bucket.acquire(max_wait_seconds=0.0) == 0.0
+    assert sleeps == [pytest.approx(0.5)]
@@ -0,0 +1,45 @@
+# ---------------------------------------------------------------------------
+# tests/test_ttl_cache.py
+# Testes unitários do cache TTL/LRU usado para usuários e sessões Zep.
+# ---------------------------------------------------------------------------
+from crew.ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_cache_expira_entradas():
+    """Entradas expiradas devem ser tratadas como miss."""
+    clock = FakeClock()
+    cache = TTLCache(max_size=10, ttl_seconds=5, clock=clock)
+    cache.set("user_1", True)
+    assert "user_1" in cache
+    clock.now = 6
+    assert "user_1" not in cache
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_cache_despeja_lru():
+    """Ao exceder max_size, a entrada usada há mais tempo deve ser despejada."""
+    cache = TTLCache(max_size=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" passa a ser a mais recente
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_tamanho_zero_desabilita():
+    """max_size=0 desabilita o cache."""
+    cache = TTLCache(max_size=0, ttl_seconds=60)
+    cache.set("a", 1)
+    assert cache.get("a") is None
@@ -0,0 +1,36 @@
+# ---------------------------------------------------------------------------
+# tests/test_warmup.py
+# Testes unitários do warm-up do worker e do estado exposto em /ready.
+# ---------------------------------------------------------------------------
+import pytest
+
+import app.warmup as warmup
+from app.warmup import WarmupState, run_warmup
+
+
+@pytest.mark.asyncio
+async def test_falha_da_zep_vira_aviso_mas_falha_de_template_deixa_worker_nao_pronto(monkeypatch):
+    """Só as etapas obrigatórias (executor e templates) impedem o worker de ficar pronto."""
+    async def fake_load():
+        return None
+
+    async def zep_down():
+        raise RuntimeError("Zep indisponível")
+
+    monkeypatch.setattr(warmup, "load_crew_executor", fake_load)
+    monkeypatch.setattr(warmup, "_warm_zep_connection", zep_down)
+    monkeypatch.setattr(warmup.crew_templates, "compile_all", lambda: None)
+
+    state = await run_warmup(WarmupState())
+    assert state.ready
+    assert "zep_connection" in state.warnings
+    assert set(state.step_seconds) == {"import_crew_executor", "compile_crew_templates", "zep_connection"}
+
+    def broken_compile():
+        raise ValueError("agents.yaml inválido")
+
+    monkeypatch.setattr(warmup.crew_templates, "compile_all", broken_compile)
+    state = await run_warmup(WarmupState())
+    assert state.status == "failed" and not state.ready
+    assert "compile_crew_templates" in state.error
+    assert "zep_connection" not in state.step_seconds
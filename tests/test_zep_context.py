@@ -0,0 +1,107 @@
+# ---------------------------------------------------------------------------
+# tests/test_zep_context.py
+# Testes da montagem do contexto Zep com deadline: leituras lentas são
+# descartadas, mas a criação da sessão e a mensagem do usuário não.
+# ---------------------------------------------------------------------------
+import asyncio
+import uuid
+
+import pytest
+from zep_cloud.errors import NotFoundError
+
+import crew.zep_context as zep_context
+
+
+class _SlowZep:
+    """Zep falsa em que a criação da sessão demora mais que o deadline do contexto."""
+
+    def __init__(self, add_session_seconds: float = 0.0, fail_memory_add: bool = False):
+        self.add_session_seconds = add_session_seconds
+        self.fail_memory_add = fail_memory_add
+        self.written = []
+        self.user = self
+        self.memory = self
+        self.graph = self
+
+    async def get(self, user_id):
+        return None
+
+    async def get_session(self, session_id):
+        raise NotFoundError(body=None)
+
+    async def add_session(self, session_id, user_id):
+        await asyncio.sleep(self.add_session_seconds)
+
+    async def add(self, session_id, messages):
+        if self.fail_memory_add:
+            raise RuntimeError("Zep indisponível")
+        self.written.extend(message.content for message in messages)
+
+    async def get_session_messages(self, session_id, limit):
+        return None
+
+    async def search(self, **kwargs):
+        return None
+
+
+async def _assemble(zep, message: str = "olá", session_id: str = ""):
+    return await zep_context.assemble_zep_context(
+        zep, f"u-{uuid.uuid4().hex}", session_id or f"s-{uuid.uuid4().hex}", message, 5, "edges", "rrf", 5,
+    )
+
+
+def _failed_write() -> "asyncio.Future[bool]":
+    future = asyncio.get_running_loop().create_future()
+    future.set_exception(RuntimeError("Zep indisponível"))
+    return future
+
+
+def _succeeded_write() -> "asyncio.Future[bool]":
+    future = asyncio.get_running_loop().create_future()
+    future.set_result(True)
+    return future
+
+
+@pytest.fixture
+def short_deadline(monkeypatch):
+    monkeypatch.setattr(zep_context.api_settings, "zep_context_deadline_seconds", 0.05)
+    monkeypatch.setattr(zep_context.api_settings, "zep_write_behind_enabled", False)
+
+
+@pytest.mark.asyncio
+async def test_sessao_lenta_nao_descarta_a_mensagem_do_usuario(short_deadline):
+    zep = _SlowZep(add_session_seconds=0.2)
+
+    context = await asyncio.wait_for(_assemble(zep, session_id="s-lenta"), timeout=0.15)
+    assert context.history is None and zep.written == []
+    # O lock da sessão espera essas escritas mesmo que o turno termine antes (crew_executor._session_release_barrier).
+    assert zep_context.pending_user_turn_writes("s-lenta")
+
+    # O contexto seguiu sem histórico; a sessão e a mensagem terminam em segundo plano.
+    assert await zep_context.user_message_persisted(context)
+    assert zep.written == ["olá"]
+    assert zep_context.pending_user_turn_writes("s-lenta") == []
+
+
+@pytest.mark.asyncio
+async def test_falha_na_mensagem_do_usuario_impede_gravar_a_resposta(short_deadline, monkeypatch):
+    from crew import crew_executor
+
+    written_replies = []
+
+    async def write_assistant_message(*args):
+        written_replies.append(args)
+
+    monkeypatch.setattr(crew_executor, "_write_assistant_message", write_assistant_message)
+    zep = _SlowZep(fail_memory_add=True)
+
+    with pytest.raises(RuntimeError):
+        await _assemble(zep)
+    context = zep_context.ZepContext(graph=None, history=None, history_limit=5, user_message_saved=_failed_write())
+    await crew_executor._save_assistant_message("basic", "u", "s", "resposta", context)
+    assert written_replies == []
+
+    context.user_message_saved = _succeeded_write()
+    await crew_executor._save_assistant_message("basic", "u", "s", "resposta", context)
+    assert len(written_replies) == 1
+
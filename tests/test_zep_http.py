@@ -0,0 +1,63 @@
+# ---------------------------------------------------------------------------
+# tests/test_zep_http.py
+# Testes unitários do transporte HTTP do cliente Zep (timeouts e retentativas).
+# ---------------------------------------------------------------------------
+import httpx
+import pytest
+from zep_cloud.client import AsyncZep
+from zep_cloud.core.api_error import ApiError
+
+from crew.zep_http import ZepRetryPolicy, ZepTransport
+
+
+def _zep_with(handler) -> AsyncZep:
+    transport = ZepTransport(
+        httpx.MockTransport(handler),
+        timeout=httpx.Timeout(10.0, connect=3.0),
+        read_timeouts={"graph.search": 5.0},
+        retry_policy=ZepRetryPolicy(max_retries=2, base_seconds=0.001),
+    )
+    return AsyncZep(api_key="chave-de-teste", httpx_client=httpx.AsyncClient(transport=transport))
+
+
+@pytest.mark.asyncio
+async def test_leituras_sao_repetidas_com_timeout_da_operacao_e_escritas_nao():
+    """graph.search é repetido após 503 com o timeout de leitura próprio; memory.add falha na primeira."""
+    attempts = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        attempts[path] = attempts.get(path, 0) + 1
+        if path.endswith("/graph/search"):
+            assert request.extensions["timeout"]["read"] == 5.0
+            assert request.extensions["timeout"]["connect"] == 3.0
+            if attempts[path] < 3:
+                return httpx.Response(503, json={"message": "indisponível"})
+            return httpx.Response(200, json={"edges": [], "nodes": []})
+        assert request.extensions["timeout"]["read"] == 10.0
+        return httpx.Response(503, json={"message": "indisponível"})
+
+    zep = _zep_with(handler)
+    results = await zep.graph.search(query="oi", user_id="u1", scope="edges")
+    assert results.edges == []
+    assert attempts["/api/v2/graph/search"] == 3
+
+    with pytest.raises(ApiError):
+        await zep.memory.add("s1", messages=[])
+    assert attempts["/api/v2/sessions/s1/memory"] == 1
+
+
+@pytest.mark.asyncio
+async def test_leitura_desiste_apos_max_retries():
+    """Após max_retries, o último erro de rede chega a quem chamou."""
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        raise httpx.ConnectError("conexão recusada", request=request)
+
+    zep = _zep_with(handler)
+    with pytest.raises(httpx.ConnectError):
+        await zep.user.get("u1")
+    assert calls == 3
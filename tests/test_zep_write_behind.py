@@ -0,0 +1,147 @@
+# ---------------------------------------------------------------------------
+# tests/test_zep_write_behind.py
+# Testes unitários da fila write-behind das escritas na Zep.
+# ---------------------------------------------------------------------------
+import asyncio
+
+import httpx
+import pytest
+from zep_cloud.errors import InternalServerError
+from zep_cloud.types import Message as ZepMessage
+
+import crew.zep_context as zep_context
+from crew.context_builder import HistoryTurn
+from crew.session_history_cache import SessionHistoryCache
+from crew.zep_write_behind import ZepWriteBehindQueue
+
+
+class _FakeMemory:
+    def __init__(self, failures: int = 0, error_factory=lambda: InternalServerError(body=None)):
+        self.failures = failures
+        self.error_factory = error_factory
+        self.attempts = 0
+        self.calls = []
+
+    async def add(self, session_id, messages):
+        self.attempts += 1
+        if self.failures:
+            self.failures -= 1
+            raise self.error_factory()
+        self.calls.append((session_id, [message.content for message in messages]))
+
+
+class _FakeZep:
+    def __init__(self, failures: int = 0, error_factory=lambda: InternalServerError(body=None)):
+        self.memory = _FakeMemory(failures, error_factory)
+
+
+def _message(content: str) -> ZepMessage:
+    return ZepMessage(role="AI Assistant", role_type="assistant", content=content)
+
+
+@pytest.mark.asyncio
+async def test_mensagens_da_sessao_sao_gravadas_em_lotes_e_em_ordem():
+    """Mensagens pendentes da mesma sessão devem ir em chamadas memory.add com vários itens, na ordem."""
+    zep = _FakeZep()
+    written_users = []
+    queue = ZepWriteBehindQueue(
+        batch_size=2, flush_interval_seconds=60, max_pending=100, max_retries=0,
+        retry_base_seconds=0.01, on_written=written_users.append,
+    )
+    queue.start()
+    for content in ("a", "b", "c"):
+        assert queue.enqueue(zep, "sessao_1", _message(content), user_id="user_1")
+
+    await queue.flush_session("sessao_1")
+    assert zep.memory.calls == [("sessao_1", ["a", "b"]), ("sessao_1", ["c"])]
+    assert written_users == ["user_1"]
+    assert queue.pending_count("sessao_1") == 0
+    await queue.stop(timeout=1)
+
+    # Parada: novas mensagens não são aceitas e quem chamou grava diretamente.
+    assert not queue.enqueue(zep, "sessao_1", _message("d"))
+
+
+@pytest.mark.asyncio
+async def test_falhas_temporarias_sao_repetidas_e_stop_faz_flush():
+    """Erros 5xx devem ser repetidos com backoff e o shutdown deve gravar o que estiver pendente."""
+    zep = _FakeZep(failures=2)
+    queue = ZepWriteBehindQueue(
+        batch_size=10, flush_interval_seconds=60, max_pending=100, max_retries=3, retry_base_seconds=0.01,
+    )
+    queue.start()
+    assert queue.enqueue(zep, "sessao_1", _message("resposta"))
+
+    await queue.stop(timeout=5)
+    assert zep.memory.calls == [("sessao_1", ["resposta"])]
+
+
+@pytest.mark.asyncio
+async def test_timeout_ambiguo_nao_e_repetido_mas_falha_de_conexao_e():
+    """memory.add não é idempotente: timeout de leitura descarta o lote; erro de conexão (não enviado) repete."""
+    dropped = []
+    read_timeout = _FakeZep(failures=1, error_factory=lambda: httpx.ReadTimeout("sem resposta"))
+    queue = ZepWriteBehindQueue(
+        batch_size=10, flush_interval_seconds=60, max_pending=100, max_retries=3,
+        retry_base_seconds=0.01, on_dropped=dropped.append,
+    )
+    queue.start()
+    assert queue.enqueue(read_timeout, "sessao_1", _message("resposta"))
+    await queue.flush_session("sessao_1")
+    assert read_timeout.memory.attempts == 1 and read_timeout.memory.calls == []
+    assert dropped == ["sessao_1"]
+
+    connect_error = _FakeZep(failures=1, error_factory=lambda: httpx.ConnectError("recusada"))
+    assert queue.enqueue(connect_error, "sessao_2", _message("resposta"))
+    await queue.stop(timeout=5)
+    assert connect_error.memory.calls == [("sessao_2", ["resposta"])]
+
+
+@pytest.mark.asyncio
+async def test_mensagem_do_usuario_entra_atras_da_resposta_pendente(monkeypatch):
+    """Com a resposta do turno anterior ainda na fila (Zep lenta), a próxima mensagem não passa na frente."""
+    zep = _FakeZep(failures=1)
+    queue = ZepWriteBehindQueue(
+        batch_size=10, flush_interval_seconds=60, max_pending=1, max_retries=3, retry_base_seconds=0.05,
+    )
+    monkeypatch.setattr(zep_context, "zep_write_behind", queue)
+    queue.start()
+    assert queue.enqueue(zep, "sessao_1", _message("resposta 1"))
+    flushing = asyncio.create_task(queue.flush_session("sessao_1"))
+    await asyncio.sleep(0.01)
+
+    # Fila cheia (max_pending=1) e lote em retentativa: a mensagem ainda entra atrás dele.
+    assert await zep_context._add_user_message(zep, "user_1", "sessao_1", "pergunta 2")
+    await flushing
+    await queue.stop(timeout=5)
+    assert [content for _, contents in zep.memory.calls for content in contents] == ["resposta 1", "pergunta 2"]
+
+
+@pytest.mark.asyncio
+async def test_acerto_do_cache_de_historico_nao_inverte_a_ordem_das_escritas(monkeypatch):
+    """Sem flush no acerto do cache, a mensagem do usuário ainda é gravada depois da resposta pendente."""
+    zep = _FakeZep()
+    queue = ZepWriteBehindQueue(
+        batch_size=10, flush_interval_seconds=60, max_pending=100, max_retries=0, retry_base_seconds=0.01,
+    )
+    cache = SessionHistoryCache(max_turns=50, max_bytes=1024 * 1024, ttl_seconds=60)
+    cache.fill("sessao_1", [HistoryTurn(role="AI Assistant", content="resposta 1", created_at=None)], requested_limit=1)
+
+    async def session_ready(*args):
+        return True
+
+    async def no_graph(*args):
+        return None
+
+    monkeypatch.setattr(zep_context, "zep_write_behind", queue)
+    monkeypatch.setattr(zep_context, "session_history_cache", cache)
+    monkeypatch.setattr(zep_context, "_ensure_user_and_session", session_ready)
+    monkeypatch.setattr(zep_context, "_search_graph", no_graph)
+    monkeypatch.setattr(zep_context.api_settings, "zep_write_behind_enabled", True)
+    queue.start()
+    assert queue.enqueue(zep, "sessao_1", _message("resposta 1"))
+
+    context = await zep_context.assemble_zep_context(zep, "user_1", "sessao_1", "pergunta 2", 1, "edges", "rrf", 5)
+    await queue.stop(timeout=5)
+    assert [turn.content for turn in context.history] == ["resposta 1"]
+    assert [content for _, contents in zep.memory.calls for content in contents] == ["resposta 1", "pergunta 2"]